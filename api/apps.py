@@ -1,6 +1,18 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
 
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+
+        # URL gambar dari storage lokal hanya bisa dibuka saat DEBUG (lihat backend/urls.py)
+        if not settings.DEBUG and settings.IMAGE_UPLOAD["storage"].endswith(".LocalImageStorage"):
+            raise ImproperlyConfigured(
+                "IMAGE_UPLOAD storage lokal tidak bisa dipakai dengan DEBUG=False: "
+                "set CLOUD_NAME/CLOUD_API_KEY/CLOUD_API_SECRET atau IMAGE_STORAGE"
+            )
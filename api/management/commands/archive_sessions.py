@@ -0,0 +1,74 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.utils import timezone
+
+from api.models import ChatSession
+from api.utils.archive import archive_session, default_codec, zstandard
+
+
+class Command(BaseCommand):
+    help = (
+        "Tandai sesi chat yang idle sebagai 'paused' (atau 'completed' jika sudah sampai langkah completion) "
+        "lalu pindahkan pesannya ke satu baris arsip terkompresi per sesi. "
+        "Pesan dipulihkan otomatis saat sesi dibuka lagi."
+    )
+
+    def add_arguments(self, parser):
+        config = settings.CHAT_ARCHIVE
+        parser.add_argument("--idle-days", type=float, default=config["idle_days"],
+                            help="Sesi tanpa aktivitas selama N hari dianggap idle")
+        parser.add_argument("--codec", choices=["gzip", "zstd"], default=config["codec"] or default_codec(),
+                            help="Kompresi arsip (default zstd jika paket zstandard terpasang)")
+        parser.add_argument("--chunk-size", type=int, default=config["chunk_size"],
+                            help="Jumlah pesan yang dihapus per transaksi")
+        parser.add_argument("--limit", type=int, help="Proses paling banyak N sesi")
+        parser.add_argument("--dry-run", action="store_true", help="Tampilkan sesi yang akan diarsipkan saja")
+
+    def handle(self, *args, **options):
+        if options["codec"] == "zstd" and zstandard is None:
+            raise CommandError("Codec zstd membutuhkan paket zstandard (pip install zstandard)")
+
+        cutoff = timezone.now() - timedelta(days=options["idle_days"])
+        sessions = (
+            ChatSession.objects.filter(updated_at__lt=cutoff)
+            .annotate(hot_messages=Count("messages"))
+            .filter(hot_messages__gt=0)
+            .order_by("updated_at")
+        )
+        if options["limit"]:
+            sessions = sessions[:options["limit"]]
+        sessions = list(sessions)
+
+        self.stdout.write(f"{len(sessions)} sesi idle sejak sebelum {cutoff:%Y-%m-%d %H:%M}")
+        if options["dry_run"]:
+            for session in sessions:
+                self.stdout.write(f"  {session.session_id}: {session.hot_messages} pesan, langkah {session.current_step}")
+            return
+
+        archived_sessions = archived_messages = 0
+        for session in sessions:
+            new_status = "completed" if session.current_step == "completion" else "paused"
+            fields = {"status": new_status}
+            if new_status == "completed" and not session.completed_at:
+                fields["completed_at"] = session.updated_at
+            # Tandai dulu, baru arsipkan: sesi non-aktif selalu dipulihkan saat dibuka lagi.
+            # updated_at ikut difilter: sesi yang aktif lagi sejak query di atas dilewati
+            if not ChatSession.objects.filter(pk=session.pk, updated_at__lt=cutoff).update(**fields):
+                continue
+            session.status = new_status
+
+            try:
+                moved = archive_session(session, codec=options["codec"], chunk_size=options["chunk_size"])
+            except Exception as e:
+                self.stderr.write(f"❌ {session.session_id}: {e}")
+                continue
+
+            archived_sessions += 1
+            archived_messages += moved
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {archived_messages} pesan dari {archived_sessions} sesi dipindahkan ke arsip ({options['codec']})"
+        ))
@@ -0,0 +1,175 @@
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.models import CachedAnswer
+from api.utils.answer_cache import answer_cache_key, normalize_question
+
+PARAPHRASE_PROMPT = """Tuliskan {n} parafrase berbeda dari pertanyaan siswa berikut dalam bahasa Indonesia sehari-hari.
+Pertahankan maknanya. Tulis satu parafrase per baris tanpa nomor atau tanda baca tambahan.
+
+PERTANYAAN: {question}
+
+PARAFRASE:"""
+
+
+class RateLimiter:
+    """Batasi jumlah panggilan LLM per detik di semua thread worker"""
+
+    def __init__(self, per_second):
+        self.interval = 1.0 / per_second if per_second > 0 else 0.0
+        self.lock = threading.Lock()
+        self.next_at = time.monotonic()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_at)
+            self.next_at = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def row_fingerprint(row, model_name, paraphrases):
+    """Hash isi baris + konfigurasi; berubah => jawaban baris ini dihitung ulang"""
+    parts = [row.get(col, "") for col in ("question", "answer", "keywords", "context", "topic", "category")]
+    parts += [model_name, str(paraphrases)]
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+class Command(BaseCommand):
+    help = (
+        "Hitung offline jawaban /api/ask/ untuk setiap pertanyaan di data/data.csv (plus parafrase) "
+        "dan simpan ke cache jawaban. Incremental dan bisa dilanjutkan: baris yang tidak berubah dilewati."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--csv", help="Path CSV knowledge base (default: CSV_PATH di api.views)")
+        parser.add_argument("--paraphrases", type=int, default=2, help="Jumlah parafrase per pertanyaan")
+        parser.add_argument("--workers", type=int, default=4, help="Jumlah panggilan LLM paralel")
+        parser.add_argument("--rate", type=float, default=1.0, help="Maksimum panggilan LLM per detik")
+        parser.add_argument("--limit", type=int, help="Proses paling banyak N baris yang berubah")
+        parser.add_argument("--force", action="store_true", help="Hitung ulang semua baris")
+        parser.add_argument("--dry-run", action="store_true", help="Tampilkan baris yang akan diproses saja")
+
+    def handle(self, *args, **options):
+        from api import views
+
+        csv_path = options["csv"] or views.CSV_PATH
+        paraphrases = max(0, options["paraphrases"])
+        df = pd.read_csv(csv_path, dtype=str).fillna("")
+        rows, seen = [], {}
+        for _, row in df.iterrows():
+            if not (row.get("id") and row.get("question")):
+                continue
+            # Satu cache key hanya bisa dimiliki satu baris; duplikatnya akan selalu terlihat "berubah"
+            normalized = normalize_question(row["question"])
+            if normalized in seen:
+                self.stdout.write(f"⚠️ {row['id']}: pertanyaan sama dengan {seen[normalized]}, dilewati")
+                continue
+            seen[normalized] = row["id"]
+            rows.append(row)
+
+        model_name = f"{views.LLM_BACKEND}:{views.MODEL_NAME}"
+        existing = dict(
+            CachedAnswer.objects.filter(is_paraphrase=False).values_list("source_id", "source_fingerprint")
+        )
+
+        pending = []
+        for row in rows:
+            fingerprint = row_fingerprint(row, model_name, paraphrases)
+            if options["force"] or existing.get(row["id"]) != fingerprint:
+                pending.append((row, fingerprint))
+
+        # Baris yang sudah dihapus dari CSV tidak boleh tetap dilayani dari cache
+        current_ids = {row["id"] for row in rows}
+        stale = [source_id for source_id in existing if source_id not in current_ids]
+        if stale and not options["dry_run"]:
+            deleted, _ = CachedAnswer.objects.filter(source_id__in=stale).delete()
+            self.stdout.write(f"🧹 Removed {deleted} cached answers for {len(stale)} deleted rows")
+
+        self.stdout.write(f"📄 {len(rows)} rows, {len(rows) - len(pending)} up to date, {len(pending)} to compute")
+        if options["limit"]:
+            pending = pending[:options["limit"]]
+        if options["dry_run"] or not pending:
+            for row, _ in pending:
+                self.stdout.write(f"   - {row['id']}: {row['question']}")
+            return
+
+        views.initialize_all_systems()
+        if not views.gemini_model:
+            raise CommandError("LLM tidak tersedia; cek GEMINI_API_KEY atau LLM_BACKEND")
+
+        limiter = RateLimiter(options["rate"])
+        done = failed = 0
+        started = time.monotonic()
+
+        with ThreadPoolExecutor(max_workers=max(1, options["workers"])) as pool:
+            futures = {
+                pool.submit(self.compute_row, views, limiter, row, paraphrases): (row, fingerprint)
+                for row, fingerprint in pending
+            }
+            for future in as_completed(futures):
+                row, fingerprint = futures[future]
+                try:
+                    answers = future.result()
+                except Exception as e:
+                    failed += 1
+                    self.stderr.write(f"❌ {row['id']}: {e}")
+                    continue
+
+                # Simpan per baris supaya run yang terputus bisa dilanjutkan
+                self.store_row(row, fingerprint, model_name, answers)
+                done += 1
+                self.stdout.write(f"✅ [{done + failed}/{len(pending)}] {row['id']} ({len(answers)} answers)")
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f"Done: {done} rows cached, {failed} failed in {elapsed:.1f}s"))
+
+    def compute_row(self, views, limiter, row, paraphrases):
+        """Jalan di thread worker: parafrase + retrieval + jawaban untuk satu baris"""
+        questions = [row["question"]]
+        if paraphrases:
+            limiter.wait()
+            response = views.gemini_model.invoke(PARAPHRASE_PROMPT.format(n=paraphrases, question=row["question"]))
+            seen = {normalize_question(row["question"])}
+            for line in response.content.splitlines():
+                line = line.strip(" -*\t0123456789.")
+                if line and normalize_question(line) not in seen:
+                    seen.add(normalize_question(line))
+                    questions.append(line)
+                if len(questions) > paraphrases:
+                    break
+
+        answers = []
+        for question in questions:
+            full_prompt, _, _ = views.build_ask_prompt(question)
+            limiter.wait()
+            answer = views.gemini_model.invoke(full_prompt).content.strip()
+            answers.append((question, answer))
+        return answers
+
+    def store_row(self, row, fingerprint, model_name, answers):
+        with transaction.atomic():
+            CachedAnswer.objects.filter(source_id=row["id"]).delete()
+            entries = {}
+            for index, (question, answer) in enumerate(answers):
+                key = answer_cache_key(question)
+                entries.setdefault(key, CachedAnswer(
+                    cache_key=key,
+                    question=question,
+                    answer=answer,
+                    source_id=row["id"],
+                    source_fingerprint=fingerprint,
+                    is_paraphrase=index > 0,
+                    model_name=model_name,
+                ))
+            # Pertanyaan asli baris ini menang atas parafrase baris lain dengan key yang sama
+            CachedAnswer.objects.filter(cache_key=answer_cache_key(row["question"]), is_paraphrase=True).delete()
+            # Parafrase yang kebetulan sama dengan pertanyaan baris lain: pertahankan yang lama
+            CachedAnswer.objects.bulk_create(entries.values(), ignore_conflicts=True)
@@ -0,0 +1,52 @@
+import csv
+import random
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.utils.intent_classifier import LABELS, IntentClassifier
+
+
+class Command(BaseCommand):
+    help = "Latih classifier intent (navigation/smalltalk/faq/open_question) dan simpan bobotnya ke data/intent_model.json"
+
+    def add_arguments(self, parser):
+        data_dir = Path(settings.BASE_DIR) / "data"
+        parser.add_argument("--samples", default=str(data_dir / "intent_samples.csv"),
+                            help="CSV berlabel (kolom text,label)")
+        parser.add_argument("--faq-csv", default=str(data_dir / "data.csv"),
+                            help="Knowledge base; setiap kolom question dipakai sebagai contoh 'faq'")
+        parser.add_argument("--output", default=str(data_dir / "intent_model.json"))
+        parser.add_argument("--epochs", type=int, default=30)
+        parser.add_argument("--seed", type=int, default=13)
+
+    def handle(self, *args, **options):
+        samples = {}
+        with open(options["faq_csv"], newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                if row.get("question"):
+                    samples[row["question"]] = "faq"
+
+        # Label manual menang jika teks yang sama juga muncul sebagai FAQ
+        with open(options["samples"], newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                if row["label"] not in LABELS:
+                    self.stderr.write(f"Label tidak dikenal dilewati: {row['label']} ({row['text']})")
+                    continue
+                samples[row["text"]] = row["label"]
+
+        items = sorted(samples.items())
+        random.Random(options["seed"]).shuffle(items)
+        holdout = items[: len(items) // 5]
+        train = items[len(items) // 5:]
+
+        model = IntentClassifier.train(train, epochs=options["epochs"], seed=options["seed"])
+        correct = sum(1 for text, label in holdout if model.predict(text)[0] == label)
+        self.stdout.write(f"Holdout accuracy: {correct}/{len(holdout)} ({correct / max(1, len(holdout)):.1%})")
+
+        # Model final dilatih ulang dengan seluruh data
+        model = IntentClassifier.train(items, epochs=options["epochs"], seed=options["seed"])
+        counts = {label: sum(1 for _, l in items if l == label) for label in LABELS}
+        model.save(options["output"], meta={"samples": counts, "holdout_accuracy": round(correct / max(1, len(holdout)), 4)})
+        self.stdout.write(self.style.SUCCESS(f"✅ Model disimpan ke {options['output']} ({len(model.weights)} fitur)"))
@@ -0,0 +1,50 @@
+import time
+
+from django.db import connection
+
+from .utils.metrics import DB_QUERIES, HTTP_LATENCY, HTTP_REQUEST_SIZE, HTTP_RESPONSE_SIZE
+
+
+class QueryCounter:
+    """execute_wrapper yang menghitung query database selama satu request"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class PrometheusMetricsMiddleware:
+    """
+    Catat latensi, ukuran request/response dan jumlah query DB per view.
+
+    Label view memakai nama URL pattern (bukan path mentah) supaya
+    session_id/username di URL tidak membuat label baru untuk setiap user.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        request_size = int(request.META.get("CONTENT_LENGTH") or 0)
+        counter = QueryCounter()
+
+        with connection.execute_wrapper(counter):
+            response = self.get_response(request)
+
+        match = getattr(request, "resolver_match", None)
+        view = (match.url_name or match.view_name) if match else "unmatched"
+        if view == "metrics":
+            return response
+
+        HTTP_LATENCY.labels(view=view, method=request.method, status=str(response.status_code)).observe(
+            time.perf_counter() - started
+        )
+        HTTP_REQUEST_SIZE.labels(view=view).observe(request_size)
+        if not response.streaming:
+            HTTP_RESPONSE_SIZE.labels(view=view).observe(len(response.content))
+        DB_QUERIES.labels(view=view).observe(counter.count)
+        return response
@@ -0,0 +1,32 @@
+# Generated by Django 5.1.2 on 2026-10-19 18:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CachedAnswer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cache_key', models.CharField(max_length=64, unique=True)),
+                ('question', models.TextField()),
+                ('answer', models.TextField()),
+                ('source_id', models.CharField(max_length=50)),
+                ('source_fingerprint', models.CharField(max_length=64)),
+                ('is_paraphrase', models.BooleanField(default=False)),
+                ('model_name', models.CharField(max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'cached_answers',
+                'indexes': [models.Index(fields=['source_id'], name='cached_answ_source__558fd7_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.1.2 on 2026-10-19 19:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_cached_answer'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuotaBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=150, unique=True)),
+                ('tokens', models.FloatField()),
+                ('updated_at', models.FloatField()),
+            ],
+            options={
+                'db_table': 'quota_buckets',
+                'indexes': [models.Index(fields=['updated_at'], name='quota_bucke_updated_8f8268_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.1.2 on 2026-10-19 19:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_quota_bucket'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GraphCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('thread_id', models.CharField(max_length=100)),
+                ('checkpoint_ns', models.CharField(blank=True, default='', max_length=100)),
+                ('checkpoint_id', models.CharField(max_length=64)),
+                ('parent_checkpoint_id', models.CharField(blank=True, max_length=64, null=True)),
+                ('checkpoint_type', models.CharField(max_length=20)),
+                ('checkpoint', models.BinaryField()),
+                ('metadata_type', models.CharField(max_length=20)),
+                ('metadata', models.BinaryField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'graph_checkpoints',
+                'indexes': [models.Index(fields=['created_at'], name='graph_check_created_c3018e_idx')],
+                'unique_together': {('thread_id', 'checkpoint_ns', 'checkpoint_id')},
+            },
+        ),
+        migrations.CreateModel(
+            name='GraphCheckpointWrite',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('thread_id', models.CharField(max_length=100)),
+                ('checkpoint_ns', models.CharField(blank=True, default='', max_length=100)),
+                ('checkpoint_id', models.CharField(max_length=64)),
+                ('task_id', models.CharField(max_length=64)),
+                ('task_path', models.CharField(blank=True, default='', max_length=255)),
+                ('idx', models.IntegerField()),
+                ('channel', models.CharField(max_length=100)),
+                ('value_type', models.CharField(max_length=20)),
+                ('value', models.BinaryField()),
+            ],
+            options={
+                'db_table': 'graph_checkpoint_writes',
+                'unique_together': {('thread_id', 'checkpoint_ns', 'checkpoint_id', 'task_id', 'idx')},
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.1.2 on 2026-10-19 19:17
+
+from django.db import migrations, models
+
+
+def backfill_sequence(apps, schema_editor):
+    """Nomori pesan lama per sesi menurut (timestamp, id) dan isi counter sesinya"""
+    ChatSession = apps.get_model('api', 'ChatSession')
+    ChatMessage = apps.get_model('api', 'ChatMessage')
+
+    for session_pk in ChatSession.objects.values_list('pk', flat=True).iterator():
+        messages = list(
+            ChatMessage.objects.filter(session_id=session_pk).order_by('timestamp', 'id').only('id')
+        )
+        for seq, message in enumerate(messages, start=1):
+            message.sequence_order = seq
+        ChatMessage.objects.bulk_update(messages, ['sequence_order'], batch_size=500)
+        ChatSession.objects.filter(pk=session_pk).update(message_seq=len(messages))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_graph_checkpoint'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='chatmessage',
+            options={'ordering': ['sequence_order', 'id']},
+        ),
+        migrations.AddField(
+            model_name='chatsession',
+            name='message_seq',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_sequence, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.1.2 on 2026-10-19 19:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_message_sequence'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='activityprogress',
+            index=models.Index(fields=['session', 'last_accessed'], name='activity_pr_session_c00a0f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='useranswer',
+            index=models.Index(fields=['session', 'updated_at'], name='user_answer_session_cee74a_idx'),
+        ),
+    ]
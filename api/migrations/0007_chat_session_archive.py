@@ -0,0 +1,29 @@
+# Generated by Django 5.1.2 on 2026-10-19 19:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_sync_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChatSessionArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('codec', models.CharField(choices=[('gzip', 'gzip'), ('zstd', 'zstd')], max_length=10)),
+                ('payload', models.BinaryField()),
+                ('message_count', models.IntegerField(default=0)),
+                ('raw_size', models.IntegerField(default=0)),
+                ('archived_at', models.DateTimeField(auto_now=True)),
+                ('session', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='archive', to='api.chatsession')),
+            ],
+            options={
+                'db_table': 'chat_session_archives',
+            },
+        ),
+    ]
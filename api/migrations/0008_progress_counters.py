@@ -0,0 +1,41 @@
+# Generated by Django 5.1.2 on 2026-10-19 19:23
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    """Hitung sekali counter total_answers dan completed_activities dari data yang ada"""
+    UserProgress = apps.get_model('api', 'UserProgress')
+    UserAnswer = apps.get_model('api', 'UserAnswer')
+    ActivityProgress = apps.get_model('api', 'ActivityProgress')
+
+    answers = (
+        UserAnswer.objects.filter(session=OuterRef('session'), is_submitted=True)
+        .values('session').annotate(total=Count('id')).values('total')
+    )
+    completed = (
+        ActivityProgress.objects.filter(session=OuterRef('session'), status='completed')
+        .values('session').annotate(total=Count('id')).values('total')
+    )
+    UserProgress.objects.update(
+        total_answers=Coalesce(Subquery(answers), 0),
+        completed_activities=Coalesce(Subquery(completed), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_chat_session_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprogress',
+            name='completed_activities',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.2 on 2026-10-19 19:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_progress_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='useranswer',
+            name='draft_text',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='useranswer',
+            name='draft_updated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.1.2 on 2026-10-19 19:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_answer_drafts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageUpload',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('question_id', models.CharField(max_length=100)),
+                ('activity_id', models.CharField(max_length=50)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('ready', 'Ready'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('content_hash', models.CharField(max_length=64)),
+                ('original_name', models.CharField(blank=True, max_length=255)),
+                ('size_bytes', models.IntegerField(default=0)),
+                ('staged_path', models.CharField(blank=True, max_length=500)),
+                ('url', models.CharField(blank=True, max_length=500)),
+                ('thumbnail_url', models.CharField(blank=True, max_length=500)),
+                ('width', models.IntegerField(blank=True, null=True)),
+                ('height', models.IntegerField(blank=True, null=True)),
+                ('error', models.CharField(blank=True, max_length=500)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='image_uploads', to='api.chatsession')),
+            ],
+            options={
+                'db_table': 'image_uploads',
+                'indexes': [models.Index(fields=['session', 'question_id'], name='image_uploa_session_e842d5_idx'), models.Index(fields=['content_hash'], name='image_uploa_content_74e77b_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.1.2 on 2026-10-19 19:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_image_upload'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageOcrResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64, unique=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('done', 'Done'), ('failed', 'Failed'), ('skipped', 'Skipped')], default='pending', max_length=20)),
+                ('text', models.TextField(blank=True, default='')),
+                ('error', models.CharField(blank=True, max_length=500)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'image_ocr_results',
+            },
+        ),
+        migrations.AddField(
+            model_name='useranswer',
+            name='image_hash',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='useranswer',
+            name='ocr_text',
+            field=models.TextField(blank=True, default=''),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.2 on 2026-10-19 20:06
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_image_ocr'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imageocrresult',
+            name='queued_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
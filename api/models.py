@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
 from django.contrib.auth.hashers import make_password, check_password
 from django.utils import timezone
 import uuid
@@ -58,12 +59,32 @@ class ChatSession(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     completed_at = models.DateTimeField(null=True, blank=True)
     
+    # sequence_order terakhir yang sudah dibagikan ke ChatMessage sesi ini
+    message_seq = models.PositiveIntegerField(default=0)
+    
     class Meta:
         db_table = 'chat_sessions'
         ordering = ['-created_at']
     
     def __str__(self):
         return f"{self.user.username} - {self.session_id} - {self.current_step}"
+    
+    @classmethod
+    def allocate_sequence(cls, session_pk, count=1):
+        """
+        Pesan `count` nomor urut berikutnya untuk sesi ini.
+        
+        UPDATE dengan F() mengunci baris sesi sampai transaksi selesai, jadi
+        writer lain (thread/worker berbeda) menunggu dan tidak pernah
+        mendapat nomor yang sama.
+        
+        Returns:
+            Nomor urut pertama dari range [first, first + count)
+        """
+        with transaction.atomic():
+            cls.objects.filter(pk=session_pk).update(message_seq=F('message_seq') + count)
+            last = cls.objects.filter(pk=session_pk).values_list('message_seq', flat=True).get()
+        return last - count + 1
 
 class ChatMessage(models.Model):
     MESSAGE_TYPES = [
@@ -86,7 +107,7 @@ class ChatMessage(models.Model):
     
     class Meta:
         db_table = 'chat_messages'
-        ordering = ['timestamp', 'sequence_order']
+        ordering = ['sequence_order', 'id']
         indexes = [
             models.Index(fields=['session', 'activity_id']),
             models.Index(fields=['session', 'sequence_order']),
@@ -94,6 +115,16 @@ class ChatMessage(models.Model):
     
     def __str__(self):
         return f"{self.message_type} - {self.step_id} - {self.timestamp}"
+    
+    def save(self, *args, **kwargs):
+        # Pesan baru mendapat nomor urut per sesi (bulk_create dari antrean tulis
+        # membagikan nomornya sendiri lewat ChatSession.allocate_sequence)
+        if self._state.adding and not self.sequence_order:
+            with transaction.atomic():
+                self.sequence_order = ChatSession.allocate_sequence(self.session_id)
+                super().save(*args, **kwargs)
+            return
+        super().save(*args, **kwargs)
 
 class UserAnswer(models.Model):
     ANSWER_TYPES = [
@@ -120,12 +151,21 @@ class UserAnswer(models.Model):
     # Tambahan field untuk mendukung histori per kegiatan
     activity_id = models.CharField(max_length=50)
     
+    # Draft autosave (lihat api/utils/drafts.py); dikosongkan saat jawaban di-submit
+    draft_text = models.TextField(blank=True, default='')
+    draft_updated_at = models.DateTimeField(null=True, blank=True)
+    
+    # sha256 gambar jawaban terakhir dan teks hasil OCR-nya (lihat api/utils/ocr.py)
+    image_hash = models.CharField(max_length=64, blank=True, default='', db_index=True)
+    ocr_text = models.TextField(blank=True, default='')
+    
     class Meta:
         db_table = 'user_answers'
         ordering = ['created_at']
         unique_together = ['session', 'question_id']
         indexes = [
             models.Index(fields=['session', 'activity_id']),
+            models.Index(fields=['session', 'updated_at']),
         ]
     
     def __str__(self):
@@ -135,7 +175,9 @@ class UserProgress(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='progress')
     session = models.ForeignKey(ChatSession, on_delete=models.CASCADE, related_name='progress')
     current_kegiatan = models.CharField(max_length=50, default='kimia_hijau')
+    # Counter denormalisasi, dijaga dengan F() saat submit (tanpa COUNT ulang)
     total_answers = models.IntegerField(default=0)
+    completed_activities = models.IntegerField(default=0)
     completed_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -165,6 +207,9 @@ class ActivityProgress(models.Model):
         db_table = 'activity_progress'
         unique_together = ['session', 'activity_id']
         ordering = ['activity_id']
+        indexes = [
+            models.Index(fields=['session', 'last_accessed']),
+        ]
     
     def __str__(self):
         return f"{self.session.session_id} - {self.activity_id} - {self.status}"
@@ -181,4 +226,163 @@ class ChatFlowConfig(models.Model):
         db_table = 'chat_flow_config'
     
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return self.name
+
+# Cache jawaban /api/ask/ yang dihitung offline (python manage.py precompute_answers)
+class CachedAnswer(models.Model):
+    cache_key = models.CharField(max_length=64, unique=True)
+    question = models.TextField()
+    answer = models.TextField()
+    source_id = models.CharField(max_length=50)
+    source_fingerprint = models.CharField(max_length=64)
+    is_paraphrase = models.BooleanField(default=False)
+    model_name = models.CharField(max_length=100)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'cached_answers'
+        indexes = [
+            models.Index(fields=['source_id']),
+        ]
+    
+    def __str__(self):
+        return f"{self.source_id} - {self.question[:50]}"
+
+# State token bucket kuota endpoint LLM (dibagi semua worker gunicorn, lihat api/throttling.py)
+class QuotaBucket(models.Model):
+    key = models.CharField(max_length=150, unique=True)
+    tokens = models.FloatField()
+    # Epoch detik (float) agar refill bisa dihitung langsung di SQL
+    updated_at = models.FloatField()
+    
+    class Meta:
+        db_table = 'quota_buckets'
+        indexes = [
+            models.Index(fields=['updated_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.key} - {self.tokens:.2f}"
+
+# Checkpoint LangGraph per percakapan (lihat api/utils/checkpointer.py)
+class GraphCheckpoint(models.Model):
+    thread_id = models.CharField(max_length=100)
+    checkpoint_ns = models.CharField(max_length=100, blank=True, default='')
+    # uuid6 dari LangGraph: urut secara leksikografis dari lama ke baru
+    checkpoint_id = models.CharField(max_length=64)
+    parent_checkpoint_id = models.CharField(max_length=64, blank=True, null=True)
+    checkpoint_type = models.CharField(max_length=20)
+    checkpoint = models.BinaryField()
+    metadata_type = models.CharField(max_length=20)
+    metadata = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'graph_checkpoints'
+        unique_together = ['thread_id', 'checkpoint_ns', 'checkpoint_id']
+        indexes = [
+            models.Index(fields=['created_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.thread_id} - {self.checkpoint_id}"
+
+class GraphCheckpointWrite(models.Model):
+    thread_id = models.CharField(max_length=100)
+    checkpoint_ns = models.CharField(max_length=100, blank=True, default='')
+    checkpoint_id = models.CharField(max_length=64)
+    task_id = models.CharField(max_length=64)
+    task_path = models.CharField(max_length=255, blank=True, default='')
+    idx = models.IntegerField()
+    channel = models.CharField(max_length=100)
+    value_type = models.CharField(max_length=20)
+    value = models.BinaryField()
+    
+    class Meta:
+        db_table = 'graph_checkpoint_writes'
+        unique_together = ['thread_id', 'checkpoint_ns', 'checkpoint_id', 'task_id', 'idx']
+    
+    def __str__(self):
+        return f"{self.thread_id} - {self.checkpoint_id} - {self.channel}"
+
+# Pesan sesi yang sudah idle, dipadatkan jadi satu baris (python manage.py archive_sessions)
+class ChatSessionArchive(models.Model):
+    CODECS = [
+        ('gzip', 'gzip'),
+        ('zstd', 'zstd'),
+    ]
+    
+    session = models.OneToOneField(ChatSession, on_delete=models.CASCADE, related_name='archive')
+    codec = models.CharField(max_length=10, choices=CODECS)
+    # JSON list pesan (lihat api/utils/archive.py) yang sudah dikompresi
+    payload = models.BinaryField()
+    message_count = models.IntegerField(default=0)
+    raw_size = models.IntegerField(default=0)
+    archived_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'chat_session_archives'
+    
+    def __str__(self):
+        return f"{self.session.session_id} - {self.message_count} messages ({self.codec})"
+
+# Gambar jawaban (kegiatan dengan allow_image_upload), diproses di background (api/utils/images.py)
+class ImageUpload(models.Model):
+    STATUS = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('ready', 'Ready'),
+        ('failed', 'Failed'),
+    ]
+    
+    session = models.ForeignKey(ChatSession, on_delete=models.CASCADE, related_name='image_uploads')
+    question_id = models.CharField(max_length=100)
+    activity_id = models.CharField(max_length=50)
+    status = models.CharField(max_length=20, choices=STATUS, default='pending')
+    # sha256 isi file asli
+    content_hash = models.CharField(max_length=64)
+    original_name = models.CharField(max_length=255, blank=True)
+    size_bytes = models.IntegerField(default=0)
+    staged_path = models.CharField(max_length=500, blank=True)
+    url = models.CharField(max_length=500, blank=True)
+    thumbnail_url = models.CharField(max_length=500, blank=True)
+    width = models.IntegerField(null=True, blank=True)
+    height = models.IntegerField(null=True, blank=True)
+    error = models.CharField(max_length=500, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'image_uploads'
+        indexes = [
+            models.Index(fields=['session', 'question_id']),
+            models.Index(fields=['content_hash']),
+        ]
+    
+    def __str__(self):
+        return f"{self.session.session_id} - {self.question_id} - {self.status}"
+
+# Hasil OCR per isi gambar (content hash), supaya gambar yang sama tidak di-OCR dua kali
+class ImageOcrResult(models.Model):
+    STATUS = [
+        ('pending', 'Pending'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+        ('skipped', 'Skipped'),
+    ]
+    
+    content_hash = models.CharField(max_length=64, unique=True)
+    status = models.CharField(max_length=20, choices=STATUS, default='pending')
+    text = models.TextField(blank=True, default='')
+    error = models.CharField(max_length=500, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Kapan terakhir masuk antrean OCR; "pending" yang terlalu lama berarti worker-nya mati
+    queued_at = models.DateTimeField(default=timezone.now)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'image_ocr_results'
+    
+    def __str__(self):
+        return f"{self.content_hash[:16]} - {self.status}"
@@ -16,7 +16,7 @@ class FeedbackSerializer(serializers.ModelSerializer):
 class ChatMessageSerializer(serializers.ModelSerializer):
     class Meta:
         model = ChatMessage
-        fields = ['id', 'session', 'message_type', 'character', 'message_text', 'step_id', 'timestamp']
+        fields = ['id', 'session', 'message_type', 'character', 'message_text', 'step_id', 'sequence_order', 'timestamp']
 
 class UserAnswerSerializer(serializers.ModelSerializer):
     # Tambahkan field virtual untuk kompatibilitas
@@ -28,9 +28,10 @@ class UserAnswerSerializer(serializers.ModelSerializer):
             'id', 'session', 'question_id', 'storage_key', 
             'answer_text', 'answer_type', 'question_text', 
             'step_id', 'activity_id', 'image_url',
-            'is_submitted', 'submitted_at', 'created_at', 'updated_at'
+            'is_submitted', 'submitted_at', 'created_at', 'updated_at',
+            'draft_text', 'draft_updated_at', 'ocr_text'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'created_at', 'updated_at', 'ocr_text']
         
 class UserProgressSerializer(serializers.ModelSerializer):
     completion_percentage = serializers.SerializerMethodField()
@@ -0,0 +1,28 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import ActivityProgress, ChatMessage, UserAnswer
+from .utils.realtime import publish_messages, publish_progress
+from .utils.session_overview import invalidate_session_overview
+
+
+# Pesan hanya dihapus oleh arsip (yang meng-invalidate sendiri); tanpa receiver
+# post_delete, DELETE pesan tetap satu query tanpa memuat setiap baris
+@receiver(post_save, sender=ChatMessage)
+@receiver([post_save, post_delete], sender=UserAnswer)
+@receiver([post_save, post_delete], sender=ActivityProgress)
+def invalidate_overview_on_write(sender, instance, **kwargs):
+    """Overview sesi dihitung ulang setelah pesan, jawaban atau progress berubah"""
+    invalidate_session_overview(instance.session_id)
+
+
+@receiver(post_save, sender=ChatMessage)
+def push_saved_message(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: publish_messages([instance]))
+
+
+@receiver(post_save, sender=ActivityProgress)
+def push_progress(sender, instance, **kwargs):
+    transaction.on_commit(lambda: publish_progress(instance))
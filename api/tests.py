@@ -1,3 +1,1246 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from concurrent.futures import Future
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import DatabaseError, connection, transaction
+from django.db.models.query import QuerySet
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from asgiref.sync import sync_to_async
+from PIL import Image
+from prometheus_client import REGISTRY
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import throttling, views
+from .models import (
+    ActivityProgress, ChatMessage, ChatSession, ChatSessionArchive, GraphCheckpoint, GraphCheckpointWrite,
+    ImageOcrResult, ImageUpload, QuotaBucket, UserAnswer, UserProgress,
+)
+from .utils.chat_history import ChatHistoryCache
+from .utils.checkpointer import DatabaseCheckpointSaver
+from .utils.drafts import DraftBuffer
+from .utils.flow_router import FlowKeywordRouter
+from .utils.llm_backends import FakeChatModel
+from .utils.pagination import InvalidCursor, decode_sync_cursor, encode_sync_cursor, page_backward
+from .utils import images, ocr, realtime
+from .utils.archive import archive_session, restore_session
+from .utils.question_registry import QuestionRegistry
+from .utils.write_queue import ChatWriteQueue
+from .views import CHATBOT_FLOW, answer_locally
+from .websocket import chat_socket
+
+
+class AnswerLocallyTests(SimpleTestCase):
+    """Pesan materi harus sampai ke LLM; hanya smalltalk murni dan FAQ (hampir) persis yang dijawab lokal"""
+
+    def test_topic_questions_are_not_answered_locally(self):
+        for message in [
+            "prinsip 5",
+            "saya tidak mengerti prinsip ke 3",
+            "apa itu biopori?",
+            "belum paham tentang prinsip kimia hijau",
+        ]:
+            with self.subTest(message=message):
+                self.assertIsNone(answer_locally(message, "kegiatan_1"))
+
+    def test_faq_needs_near_exact_match(self):
+        local = answer_locally("Apa itu Mapag Hujan?", "kegiatan_1")
+        self.assertEqual(local["intent"], "faq")
+        self.assertGreaterEqual(local["similarity"], 0.9)
+
+    def test_plain_smalltalk_is_answered_locally(self):
+        for message in ["halo", "wkwk"]:
+            with self.subTest(message=message):
+                self.assertEqual(answer_locally(message, "kegiatan_1")["intent"], "smalltalk")
+
+
+class FlowKeywordRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.router = FlowKeywordRouter(CHATBOT_FLOW)
+
+    def test_explicit_navigation_works_from_any_step(self):
+        for message in ["mulai kegiatan 2", "kembali ke kegiatan 1"]:
+            with self.subTest(message=message):
+                self.assertIsNotNone(self.router.match(message, "kegiatan_5"))
+
+    def test_selesai_only_completes_from_its_own_step(self):
+        self.assertEqual(self.router.match("selesai", "kegiatan_7")["target_step"], "completion")
+        for step in ["intro", "kegiatan_1", "kegiatan_4"]:
+            with self.subTest(step=step):
+                self.assertIsNone(self.router.match("selesai", step))
+
+
+class QuestionRegistryTests(SimpleTestCase):
+    def setUp(self):
+        self.registry = QuestionRegistry(CHATBOT_FLOW)
+
+    def test_image_questions_do_not_require_text(self):
+        self.assertFalse(self.registry.get("q_kegiatan_6")["requires_text"])
+        self.assertTrue(self.registry.get("q_kegiatan_1")["requires_text"])
+
+    def test_clean_answer_strips_before_validating(self):
+        question = self.registry.get("q_kegiatan_4_2")
+        self.assertEqual(self.registry.clean_answer(question, "  jawaban\n"), ("jawaban", None))
+        self.assertEqual(self.registry.clean_answer(question, " " + "x" * 500 + " "), ("x" * 500, None))
+        self.assertEqual(
+            self.registry.clean_answer(self.registry.get("q_kegiatan_1"), None),
+            ("", "Jawaban untuk q_kegiatan_1 wajib diisi")
+        )
+
+    def test_lookup_is_scoped_to_activity(self):
+        self.assertEqual(self.registry.get("q_kegiatan_4_2")["activity_id"], "kegiatan_4")
+        self.assertIsNone(self.registry.get("q_kegiatan_4_2", "kegiatan_5"))
+        self.assertIsNone(self.registry.get("question_1700000000"))
+
+
+def create_session(username="siswa", session_id="s1"):
+    user = User.objects.create_user(username=username, password="rahasia")
+    return ChatSession.objects.create(user=user, session_id=session_id)
+
+
+class AllocateSequenceTests(TestCase):
+    def test_ranges_are_contiguous_and_disjoint(self):
+        session = create_session()
+        self.assertEqual(ChatSession.allocate_sequence(session.pk), 1)
+        self.assertEqual(ChatSession.allocate_sequence(session.pk, count=3), 2)
+        self.assertEqual(ChatSession.allocate_sequence(session.pk), 5)
+        session.refresh_from_db()
+        self.assertEqual(session.message_seq, 5)
+
+    def test_sequences_are_per_session(self):
+        first = create_session()
+        second = create_session("siswa2", "s2")
+        ChatSession.allocate_sequence(first.pk, count=10)
+        self.assertEqual(ChatSession.allocate_sequence(second.pk), 1)
+
+    def test_message_save_takes_next_sequence(self):
+        session = create_session()
+        ChatSession.allocate_sequence(session.pk, count=2)
+        message = ChatMessage.objects.create(session=session, message_type="user", message_text="halo", step_id="intro")
+        self.assertEqual(message.sequence_order, 3)
+
+
+@unittest.skipIf(connection.vendor == "sqlite", "SQLite mengunci seluruh database, bukan baris sesi")
+class AllocateSequenceConcurrencyTests(TransactionTestCase):
+    def test_parallel_writers_never_share_a_number(self):
+        session = create_session()
+        allocated, errors = [], []
+
+        def worker():
+            try:
+                for _ in range(20):
+                    first = ChatSession.allocate_sequence(session.pk, count=2)
+                    allocated.extend([first, first + 1])
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(sorted(allocated), list(range(1, 8 * 20 * 2 + 1)))
+
+
+class PageBackwardTests(TestCase):
+    def setUp(self):
+        self.session = create_session()
+        # Dua pesan dengan sequence_order sama: urutan ditentukan id
+        for sequence_order in [1, 2, 3, 3, 4, 5, 6]:
+            ChatMessage.objects.create(
+                session=self.session, message_type="user", message_text=str(sequence_order),
+                step_id="intro", sequence_order=sequence_order
+            )
+        self.queryset = ChatMessage.objects.filter(session=self.session)
+
+    def test_pages_cover_all_messages_once_in_order(self):
+        pages, cursor = [], None
+        while True:
+            rows, cursor = page_backward(self.queryset, cursor=cursor, page_size=3)
+            pages.insert(0, rows)
+            if cursor is None:
+                break
+        ids = [row.pk for rows in pages for row in rows]
+        self.assertEqual(ids, list(self.queryset.order_by("sequence_order", "id").values_list("pk", flat=True)))
+        self.assertEqual([len(rows) for rows in pages], [1, 3, 3])
+
+    def test_exact_page_has_no_next_cursor(self):
+        rows, cursor = page_backward(self.queryset, page_size=7)
+        self.assertEqual(len(rows), 7)
+        self.assertIsNone(cursor)
+
+    def test_invalid_cursor(self):
+        for cursor in ["bukan-cursor", "W10", "WyJhIiwxXQ"]:
+            with self.subTest(cursor=cursor), self.assertRaises(InvalidCursor):
+                page_backward(self.queryset, cursor=cursor)
+
+
+class SessionChangesTests(TestCase):
+    def setUp(self):
+        self.session = create_session()
+        self.client = APIClient()
+        self.client.force_authenticate(self.session.user)
+        self.url = f"/api/chat/session/{self.session.session_id}/changes/"
+        for text in ["a", "b", "c"]:
+            ChatMessage.objects.create(session=self.session, message_type="user", message_text=text, step_id="intro")
+        self.answer = UserAnswer.objects.create(
+            session=self.session, question_id="q_kegiatan_1", storage_key="answer:q_kegiatan_1",
+            answer_text="x", answer_type="essay", question_text="T", step_id="kegiatan_1", activity_id="kegiatan_1"
+        )
+
+    def changes(self, since=None):
+        response = self.client.get(self.url, {"since": since} if since else {})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_overlap_resends_recent_answers_but_not_messages(self):
+        before = time.time()
+        first = self.changes()
+        self.assertEqual(len(first["messages"]), 3)
+        last_seq, since = decode_sync_cursor(first["cursor"])
+        self.assertEqual(last_seq, 3)
+        self.assertAlmostEqual(since, before - views.SYNC_OVERLAP_SECONDS, delta=1)
+
+        # Jawaban yang berubah di dalam jendela overlap terkirim lagi
+        second = self.changes(first["cursor"])
+        self.assertEqual(second["messages"], [])
+        self.assertEqual([answer["question_id"] for answer in second["answers"]], ["q_kegiatan_1"])
+
+    def test_changes_older_than_cursor_are_skipped(self):
+        old = timezone.now() - timedelta(seconds=views.SYNC_OVERLAP_SECONDS + 60)
+        UserAnswer.objects.filter(pk=self.answer.pk).update(updated_at=old)
+        response = self.changes(encode_sync_cursor(3, time.time() - views.SYNC_OVERLAP_SECONDS))
+        self.assertEqual(response["answers"], [])
+
+    def test_has_more_keeps_time_bound(self):
+        since = time.time() - 3600
+        with mock.patch.object(views, "SYNC_MAX_MESSAGES", 2):
+            first = self.changes(encode_sync_cursor(0, since))
+            self.assertTrue(first["has_more"])
+            self.assertEqual(decode_sync_cursor(first["cursor"]), (2, round(since, 6)))
+            second = self.changes(first["cursor"])
+        self.assertFalse(second["has_more"])
+        self.assertEqual([message["message_text"] for message in second["messages"]], ["c"])
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get(self.url, {"since": "bukan-cursor"})
+        self.assertEqual(response.status_code, 400)
+
+
+@mock.patch.object(ChatWriteQueue, "_ensure_started", lambda self: None)
+class ChatWriteQueueTests(TestCase):
+    """Flush dijalankan sinkron di test; thread writer tidak dijalankan"""
+
+    def setUp(self):
+        self.session = create_session()
+        self.queue = ChatWriteQueue(batch_size=50, flush_interval=60)
+
+    def enqueue(self, text, session=None, message_type="user"):
+        return self.queue.enqueue_message(ChatMessage(
+            session=session or self.session, message_type=message_type, message_text=text, step_id="intro"
+        ))
+
+    def test_flush_keeps_enqueue_order_per_session(self):
+        other = create_session("siswa2", "s2")
+        ChatMessage.objects.create(session=self.session, message_type="bot", message_text="pembuka", step_id="intro")
+        for text, session in [("a", self.session), ("x", other), ("b", self.session), ("y", other), ("c", self.session)]:
+            self.enqueue(text, session)
+        self.queue.enqueue_session_update(self.session, current_step="kegiatan_1")
+        self.queue.enqueue_session_update(self.session, current_step="kegiatan_2")
+        self.queue.flush()
+
+        self.assertEqual(
+            list(ChatMessage.objects.filter(session=self.session).values_list("message_text", "sequence_order")),
+            [("pembuka", 1), ("a", 2), ("b", 3), ("c", 4)]
+        )
+        self.assertEqual(
+            list(ChatMessage.objects.filter(session=other).values_list("message_text", "sequence_order")),
+            [("x", 1), ("y", 2)]
+        )
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.current_step, "kegiatan_2")
+        self.assertFalse(self.queue.has_pending(self.session.pk))
+
+    def test_flush_session_makes_queued_messages_visible_to_history(self):
+        history = ChatHistoryCache()
+        self.enqueue("halo")
+        self.assertEqual(history.recent(self.session.pk), [])
+
+        # Urutan yang dipakai load_history: flush dulu, baru baca
+        self.queue.flush_session(self.session.pk)
+        self.enqueue("apa itu biopori?")
+        self.queue.flush_session(self.session.pk)
+        self.assertEqual(
+            [row[2] for row in history.recent(self.session.pk)],
+            ["halo", "apa itu biopori?"]
+        )
+
+    def test_flush_session_skips_other_sessions(self):
+        other = create_session("siswa2", "s2")
+        self.enqueue("halo", other)
+        self.queue.flush_session(self.session.pk)
+        self.assertTrue(self.queue.has_pending(other.pk))
+        self.assertFalse(ChatMessage.objects.filter(session=other).exists())
+
+    def test_write_now_lands_after_queued_messages(self):
+        self.enqueue("halo")
+        bot = self.queue.write_now(ChatMessage(
+            session=self.session, message_type="bot", message_text="hai", step_id="kegiatan_1"
+        ), current_step="kegiatan_1")
+        stored = ChatMessage.objects.get(pk=bot.pk)
+        self.assertEqual(stored.timestamp, bot.timestamp)
+        self.assertEqual(
+            list(ChatMessage.objects.filter(session=self.session).values_list("message_text", "sequence_order")),
+            [("halo", 1), ("hai", 2)]
+        )
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.current_step, "kegiatan_1")
+        self.assertFalse(self.queue.has_pending(self.session.pk))
+
+    @mock.patch("api.utils.write_queue.publish_messages")
+    def test_publish_waits_for_commit(self, publish_messages):
+        message = self.enqueue("halo")
+        with self.captureOnCommitCallbacks() as callbacks:
+            with transaction.atomic():
+                self.queue.flush()
+            publish_messages.assert_not_called()
+        self.assertEqual(len(callbacks), 1)
+        callbacks[0]()
+        publish_messages.assert_called_once_with([message])
+        self.assertIsNotNone(message.pk)
+
+    @mock.patch("api.signals.publish_messages")
+    @mock.patch("api.utils.write_queue.publish_messages")
+    def test_fallback_saves_are_published_after_commit(self, batch_publish, signal_publish):
+        message = self.enqueue("halo")
+        self.enqueue("sesi hilang", ChatSession(pk=999999, session_id="hilang"))
+        with self.captureOnCommitCallbacks() as callbacks:
+            with transaction.atomic():
+                self.queue.flush()
+            signal_publish.assert_not_called()
+        for callback in callbacks:
+            callback()
+        batch_publish.assert_not_called()
+        signal_publish.assert_called_once_with([message])
+        self.assertEqual(list(ChatMessage.objects.values_list("message_text", flat=True)), ["halo"])
+
+
+class SubmitAnswersBatchTests(TestCase):
+    url = "/api/chat/answer/submit-batch/"
+
+    def setUp(self):
+        self.session = create_session()
+        self.client = APIClient()
+        self.client.force_authenticate(self.session.user)
+
+    def submit(self, activity_id, answers):
+        return self.client.post(self.url, {
+            "session_id": self.session.session_id,
+            "activity_id": activity_id,
+            "answers": [{"question_id": question_id, "answer_text": text} for question_id, text in answers],
+        }, format="json")
+
+    def assert_rejected(self, response, *errors):
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["errors"], list(errors))
+        self.assertFalse(UserAnswer.objects.exists())
+
+    def test_unknown_question(self):
+        response = self.submit("kegiatan_4", [("q_kegiatan_4_1", "a"), ("q_kegiatan_4_2", "b"), ("q_kegiatan_1", "c")])
+        self.assert_rejected(response, "Pertanyaan q_kegiatan_1 bukan bagian dari kegiatan_4")
+
+    def test_duplicate_question(self):
+        response = self.submit("kegiatan_4", [("q_kegiatan_4_1", "a"), ("q_kegiatan_4_1", "b"), ("q_kegiatan_4_2", "c")])
+        self.assert_rejected(response, "Jawaban untuk q_kegiatan_4_1 dikirim lebih dari sekali")
+
+    def test_missing_required_question(self):
+        response = self.submit("kegiatan_4", [("q_kegiatan_4_1", "a")])
+        self.assert_rejected(response, "Jawaban untuk q_kegiatan_4_2 belum dikirim")
+
+    def test_empty_and_too_long_answers(self):
+        response = self.submit("kegiatan_4", [("q_kegiatan_4_1", "  "), ("q_kegiatan_4_2", "x" * 501)])
+        self.assert_rejected(
+            response,
+            "Jawaban untuk q_kegiatan_4_1 wajib diisi",
+            "Jawaban untuk q_kegiatan_4_2 melebihi 500 karakter",
+        )
+
+    def test_counters_count_each_question_and_activity_once(self):
+        response = self.submit("kegiatan_4", [("q_kegiatan_4_1", "a"), ("q_kegiatan_4_2", "b")])
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual([answer["action"] for answer in body["answers"]], ["created", "created"])
+        self.assertTrue(all(answer["id"] for answer in body["answers"]))
+        self.assertEqual(body["progress"], {
+            "total_answers": 2, "current_activity": "kegiatan_4", "completed_activities_count": 1
+        })
+
+        # Submit ulang: jawaban diperbarui, counter tidak bertambah
+        body = self.submit("kegiatan_4", [("q_kegiatan_4_1", "a2"), ("q_kegiatan_4_2", "b2")]).json()
+        self.assertEqual([answer["action"] for answer in body["answers"]], ["updated", "updated"])
+        self.assertEqual(body["progress"]["total_answers"], 2)
+        self.assertEqual(body["progress"]["completed_activities_count"], 1)
+
+        body = self.submit("kegiatan_7", [("q_kegiatan_7_1", "c"), ("q_kegiatan_7_2", "d")]).json()
+        self.assertEqual(body["progress"], {
+            "total_answers": 4, "current_activity": "kegiatan_7", "completed_activities_count": 2
+        })
+
+        progress = UserProgress.objects.get(session=self.session)
+        self.assertEqual(progress.total_answers, UserAnswer.objects.filter(session=self.session, is_submitted=True).count())
+        self.assertEqual(
+            progress.completed_activities,
+            ActivityProgress.objects.filter(session=self.session, status="completed").count()
+        )
+        self.assertEqual(
+            dict(UserAnswer.objects.filter(activity_id="kegiatan_4").values_list("question_id", "answer_text")),
+            {"q_kegiatan_4_1": "a2", "q_kegiatan_4_2": "b2"}
+        )
+
+    def test_single_and_batch_submit_store_the_same_text(self):
+        self.submit("kegiatan_4", [("q_kegiatan_4_1", "  jawaban \n"), ("q_kegiatan_4_2", "b")])
+        response = self.client.post("/api/chat/answer/submit/", {
+            "session_id": self.session.session_id,
+            "question_id": "q_kegiatan_1",
+            "answer_text": "  jawaban \n",
+        }, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            set(UserAnswer.objects.filter(question_id__in=["q_kegiatan_4_1", "q_kegiatan_1"]).values_list("answer_text", flat=True)),
+            {"jawaban"}
+        )
+
+        response = self.client.post("/api/chat/answer/submit/", {
+            "session_id": self.session.session_id,
+            "question_id": "q_kegiatan_1",
+            "answer_text": " \t ",
+        }, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["message"], "Jawaban untuk q_kegiatan_1 wajib diisi")
+
+
+class ChatHistoryCacheTests(TestCase):
+    def setUp(self):
+        self.session = create_session()
+        self.messages = [
+            ChatMessage.objects.create(session=self.session, message_type="user", message_text=str(i), step_id="intro")
+            for i in range(10)
+        ]
+
+    def test_reads_past_the_cached_window(self):
+        history = ChatHistoryCache(depth=4)
+        self.assertEqual(len(history.recent(self.session.pk)), 10)
+        rows = history.recent(self.session.pk, after_pk=self.messages[2].pk)
+        self.assertEqual([row[2] for row in rows], [str(i) for i in range(3, 10)])
+
+    def test_uses_window_when_it_reaches_after_pk(self):
+        history = ChatHistoryCache(depth=4)
+        history.recent(self.session.pk)
+        with self.assertNumQueries(1):
+            rows = history.recent(self.session.pk, after_pk=self.messages[7].pk)
+        self.assertEqual([row[2] for row in rows], ["8", "9"])
+
+
+@override_settings(LANGGRAPH_CHECKPOINTER={"backend": "memory"})
+class SummaryHysteresisTests(TransactionTestCase):
+    """Ringkasan dilipat per SUMMARY_FOLD_MESSAGES pesan, bukan setiap giliran"""
+
+    def setUp(self):
+        self.session = create_session()
+        self.model = FakeChatModel()
+        patches = [
+            mock.patch.object(views, "gemini_model", self.model),
+            mock.patch.object(views, "retriever", None),
+            mock.patch.object(views, "chat_write_queue", ChatWriteQueue(enabled=False)),
+            mock.patch.object(views, "chat_history", ChatHistoryCache(depth=views.chat_history.depth)),
+            mock.patch.object(views, "MAX_HISTORY_TURNS", 6),
+            mock.patch.object(views, "SUMMARY_FOLD_MESSAGES", 24),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.app = views.create_chatbot_graph()
+
+    def run_turns(self, count):
+        config = {"configurable": {"thread_id": self.session.session_id}}
+        with mock.patch.object(self.model, "invoke", wraps=self.model.invoke) as invoke:
+            for turn in range(count):
+                question = f"pertanyaan {turn}"
+                ChatMessage.objects.create(
+                    session=self.session, message_type="user", message_text=question, step_id="intro"
+                )
+                self.app.invoke({
+                    "session_id": self.session.session_id,
+                    "session_pk": self.session.pk,
+                    "user_id": str(self.session.user_id),
+                    "current_activity": "intro",
+                    "question": question,
+                }, config)
+        # Prompt ringkasan berupa string, prompt jawaban berupa PromptValue
+        summaries = sum(isinstance(call.args[0], str) for call in invoke.call_args_list)
+        return summaries, invoke.call_count - summaries, self.app.get_state(config).values
+
+    def test_summary_calls_per_turns(self):
+        # Jendela 11-12 pesan; lipatan saat 24 pesan di luar jendela: giliran 18 dan 30
+        summaries, answers, state = self.run_turns(40)
+        self.assertEqual(answers, 40)
+        self.assertEqual(summaries, 2)
+        folded = list(ChatMessage.objects.filter(session=self.session).order_by("sequence_order", "id"))
+        self.assertEqual(state["summarized_upto"], folded[47].pk)
+        self.assertEqual(state["messages"], [])
+
+    def test_turn_returns_stored_reply(self):
+        config = {"configurable": {"thread_id": self.session.session_id}}
+        ChatMessage.objects.create(session=self.session, message_type="user", message_text="apa itu biopori", step_id="intro")
+        result = self.app.invoke({
+            "session_id": self.session.session_id,
+            "session_pk": self.session.pk,
+            "user_id": str(self.session.user_id),
+            "current_activity": "intro",
+            "question": "apa itu biopori",
+        }, config)
+        reply = ChatMessage.objects.get(pk=result["response_id"])
+        self.assertEqual((reply.message_type, reply.message_text, reply.sequence_order), ("bot", result["response"], 2))
+        self.assertEqual(reply.timestamp, result["response_at"])
+
+    def test_short_sessions_are_not_summarized(self):
+        summaries, answers, state = self.run_turns(10)
+        self.assertEqual((summaries, answers), (0, 10))
+        self.assertNotIn("summarized_upto", state)
+
+
+class SendChatMessageTests(TestCase):
+    def setUp(self):
+        self.session = create_session()
+        self.client = APIClient()
+        self.client.force_authenticate(self.session.user)
+
+    @mock.patch.object(views, "chat_write_queue", ChatWriteQueue(batch_size=50, flush_interval=60))
+    @mock.patch.object(ChatWriteQueue, "_ensure_started", lambda self: None)
+    def test_local_reply_returns_stored_message(self):
+        for message_text in ["halo", "mulai kegiatan 1"]:
+            with self.subTest(message_text=message_text):
+                response = self.client.post("/api/chat/session/send/", {
+                    "session_id": self.session.session_id, "message_text": message_text, "activity_id": "intro"
+                }, format="json")
+                self.assertEqual(response.status_code, 200)
+                body = response.json()
+                # Pesan user dan balasan sudah commit sebelum respons dikirim
+                reply = ChatMessage.objects.get(pk=body["message_id"])
+                self.assertEqual(reply.message_text, body["response"])
+                self.assertEqual(reply.timestamp.isoformat().replace("+00:00", "Z"), body["timestamp"])
+                self.assertEqual(
+                    list(ChatMessage.objects.filter(session=self.session).values_list("message_type", flat=True))[-2:],
+                    ["user", "bot"]
+                )
+
+
+class ChatSocketTests(TransactionTestCase):
+    """Consumer /ws/chat/ dijalankan langsung terhadap InProcessBroker"""
+
+    def setUp(self):
+        self.session = create_session()
+        self.token = str(AccessToken.for_user(self.session.user))
+        self.broker = realtime.InProcessBroker(queue_size=8)
+        patch = mock.patch.object(realtime, "_broker", self.broker)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def connect(self, path=None, token=None):
+        """Mulai consumer; mengembalikan (inbox client -> server, outbox server -> client, task)"""
+        inbox, outbox = asyncio.Queue(), asyncio.Queue()
+        inbox.put_nowait({"type": "websocket.connect"})
+        scope = {
+            "type": "websocket",
+            "path": path or f"/ws/chat/{self.session.session_id}/",
+            "query_string": f"token={token or self.token}".encode(),
+        }
+        return inbox, outbox, asyncio.create_task(chat_socket(scope, inbox.get, outbox.put))
+
+    async def receive_json(self, outbox):
+        event = await asyncio.wait_for(outbox.get(), timeout=5)
+        return json.loads(event["text"])
+
+    def test_streams_token_message_and_progress_events(self):
+        message = ChatMessage.objects.create(session=self.session, message_type="bot", message_text="hai", step_id="intro")
+        progress = ActivityProgress.objects.create(session=self.session, activity_id="kegiatan_1", status="completed")
+        channel = realtime.session_channel(self.session.pk)
+
+        async def scenario():
+            inbox, outbox, task = self.connect()
+            self.assertEqual(await asyncio.wait_for(outbox.get(), timeout=5), {"type": "websocket.accept"})
+            self.assertTrue(realtime.session_has_listeners(self.session.pk))
+
+            realtime.publish_session_event(self.session.pk, "token", {"delta": "ha"})
+            await sync_to_async(realtime.publish_messages)([message])
+            await sync_to_async(realtime.publish_progress)(progress)
+            events = [await self.receive_json(outbox) for _ in range(3)]
+
+            inbox.put_nowait({"type": "websocket.receive", "text": "ping"})
+            pong = await asyncio.wait_for(outbox.get(), timeout=5)
+            inbox.put_nowait({"type": "websocket.disconnect"})
+            await asyncio.wait_for(task, timeout=5)
+            return events, pong
+
+        events, pong = asyncio.run(scenario())
+        self.assertEqual([event["type"] for event in events], ["token", "message", "progress"])
+        self.assertEqual(events[0]["data"], {"delta": "ha"})
+        self.assertEqual((events[1]["data"]["id"], events[1]["data"]["message_text"]), (message.pk, "hai"))
+        self.assertEqual(events[2]["data"]["activity_id"], "kegiatan_1")
+        self.assertEqual(pong["text"], "pong")
+        # Subscription dilepas saat koneksi ditutup
+        self.assertFalse(self.broker.wants(channel))
+
+    def test_rejects_bad_token_foreign_session_and_unknown_path(self):
+        other = create_session("siswa2", "s2")
+        cases = [
+            ({"token": "bukan-token"}, 4401),
+            ({"token": str(AccessToken.for_user(other.user))}, 4401),
+            ({"path": "/ws/lain/"}, 4404),
+        ]
+
+        async def scenario(kwargs):
+            _, outbox, task = self.connect(**kwargs)
+            await asyncio.wait_for(task, timeout=5)
+            return await outbox.get()
+
+        for kwargs, code in cases:
+            with self.subTest(**kwargs):
+                self.assertEqual(asyncio.run(scenario(kwargs)), {"type": "websocket.close", "code": code})
+        self.assertFalse(self.broker.wants(realtime.session_channel(self.session.pk)))
+
+
+@unittest.skipUnless(os.getenv("TEST_REDIS_URL"), "TEST_REDIS_URL tidak di-set")
+class RedisBrokerTests(SimpleTestCase):
+    def test_events_fan_out_between_brokers(self):
+        publisher = realtime.RedisBroker(url=os.environ["TEST_REDIS_URL"])
+        listener = realtime.RedisBroker(url=os.environ["TEST_REDIS_URL"], wants_ttl=0)
+
+        async def scenario():
+            subscription = listener.subscribe("session:test")
+            for _ in range(50):
+                if publisher.wants("session:test"):
+                    break
+                await asyncio.sleep(0.1)
+            publisher.publish("session:test", {"type": "token", "data": {"delta": "x"}})
+            try:
+                return await asyncio.wait_for(subscription.get(), timeout=5)
+            finally:
+                subscription.close()
+
+        self.assertEqual(asyncio.run(scenario()), {"type": "token", "data": {"delta": "x"}})
+
+
+class ArchiveSessionsTests(TestCase):
+    def setUp(self):
+        self.session = create_session()
+        for index in range(5):
+            ChatMessage.objects.create(
+                session=self.session, message_type="user" if index % 2 else "bot", message_text=f"pesan {index}",
+                step_id="intro", message_data={"index": index}
+            )
+        old = timezone.now() - timedelta(days=60)
+        for offset, message in enumerate(ChatMessage.objects.order_by("id")):
+            ChatMessage.objects.filter(pk=message.pk).update(timestamp=old + timedelta(minutes=offset))
+        ChatSession.objects.filter(pk=self.session.pk).update(updated_at=old + timedelta(hours=1))
+        self.original = self.snapshot()
+
+    def snapshot(self):
+        return list(ChatMessage.objects.filter(session=self.session).order_by("sequence_order", "id").values_list(
+            "id", "sequence_order", "timestamp", "message_text", "message_data"
+        ))
+
+    def archive(self, **options):
+        call_command("archive_sessions", idle_days=30, codec="gzip", stdout=io.StringIO(), stderr=io.StringIO(), **options)
+        self.session.refresh_from_db()
+
+    def test_round_trip_keeps_ids_order_and_timestamps(self):
+        self.archive()
+        self.assertEqual(self.session.status, "paused")
+        self.assertFalse(ChatMessage.objects.filter(session=self.session).exists())
+        self.assertEqual(ChatSessionArchive.objects.get(session=self.session).message_count, 5)
+
+        self.assertEqual(restore_session(self.session), 5)
+        self.assertEqual(self.snapshot(), self.original)
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.status, "active")
+        self.assertFalse(ChatSessionArchive.objects.filter(session=self.session).exists())
+
+    def test_rerun_after_interrupted_delete(self):
+        original_delete = QuerySet.delete
+        calls = []
+
+        def delete_then_crash(queryset):
+            calls.append(1)
+            if len(calls) > 1:
+                raise RuntimeError("proses terhenti")
+            return original_delete(queryset)
+
+        with mock.patch.object(QuerySet, "delete", delete_then_crash):
+            self.archive(chunk_size=2)
+        self.assertEqual(ChatMessage.objects.filter(session=self.session).count(), 3)
+        self.assertEqual(self.session.status, "paused")
+
+        self.archive(chunk_size=2)
+        self.assertFalse(ChatMessage.objects.filter(session=self.session).exists())
+        self.assertEqual(ChatSessionArchive.objects.get(session=self.session).message_count, 5)
+        restore_session(self.session)
+        self.assertEqual(self.snapshot(), self.original)
+
+    def test_reopened_session_is_not_archived(self):
+        # Sesi dibuka lagi setelah ditandai paused tetapi sebelum arsip ditulis
+        ChatSession.objects.filter(pk=self.session.pk).update(status="paused")
+        self.session.refresh_from_db()
+        restore_session(self.session)
+        self.assertEqual(self.session.status, "active")
+
+        self.assertEqual(archive_session(self.session, codec="gzip"), 0)
+        self.assertEqual(self.snapshot(), self.original)
+        self.assertFalse(ChatSessionArchive.objects.filter(session=self.session).exists())
+
+    def test_recently_touched_session_is_skipped(self):
+        ChatSession.objects.filter(pk=self.session.pk).update(updated_at=timezone.now())
+        self.archive()
+        self.assertEqual(self.session.status, "active")
+        self.assertEqual(self.snapshot(), self.original)
+
+
+@mock.patch.object(DraftBuffer, "_ensure_started", lambda self: None)
+class AnswerDraftTests(TestCase):
+    url = "/api/chat/answer/draft/"
+
+    def setUp(self):
+        self.session = create_session()
+        self.client = APIClient()
+        self.client.force_authenticate(self.session.user)
+        self.buffer = DraftBuffer(flush_interval=60)
+        patch = mock.patch.object(views, "draft_buffer", self.buffer)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def put(self, text, question_id="q_kegiatan_1"):
+        response = self.client.post(self.url, {
+            "session_id": self.session.session_id, "activity_id": "kegiatan_1",
+            "question_id": question_id, "draft_text": text,
+        }, format="json")
+        self.assertEqual(response.status_code, 200)
+
+    def drafts(self):
+        response = self.client.get(self.url, {"session_id": self.session.session_id, "activity_id": "kegiatan_1"})
+        return {draft["question_id"]: draft["draft_text"] for draft in response.json()["drafts"]}
+
+    def submit(self, text):
+        response = self.client.post("/api/chat/answer/submit/", {
+            "session_id": self.session.session_id, "activity_id": "kegiatan_1",
+            "answer_text": text, "question_data": {"id": "q_kegiatan_1"},
+        }, format="json")
+        self.assertEqual(response.status_code, 200)
+
+    def test_keystrokes_coalesce_into_one_write(self):
+        for text in ["a", "ai", "air"]:
+            self.put(text)
+        with self.assertNumQueries(2):
+            self.buffer.flush()
+        answer = UserAnswer.objects.get(session=self.session)
+        self.assertEqual((answer.draft_text, answer.is_submitted), ("air", False))
+        self.assertEqual(self.buffer.stats["received"], 3)
+        self.assertEqual(self.buffer.stats["flushed"], 1)
+
+    def test_pending_drafts_override_stored_ones(self):
+        self.put("lama")
+        self.buffer.flush()
+        self.put("baru")
+        self.assertEqual(self.drafts(), {"q_kegiatan_1": "baru"})
+        self.buffer.flush()
+        self.assertEqual(self.drafts(), {"q_kegiatan_1": "baru"})
+
+    def test_submit_discards_pending_draft(self):
+        self.put("setengah jadi")
+        self.submit("jawaban final")
+        self.assertEqual(self.buffer.pending(self.session.pk), {})
+        self.buffer.flush()
+        self.assertEqual(self.drafts(), {})
+        self.assertEqual(UserAnswer.objects.get(session=self.session).answer_text, "jawaban final")
+
+    def test_draft_from_another_worker_does_not_return_after_submit(self):
+        # Draft diketik di worker lain (buffer lain) sebelum submit, di-flush setelahnya
+        other_worker = DraftBuffer(flush_interval=60)
+        other_worker.put(self.session.pk, "q_kegiatan_1", "basi", activity_id="kegiatan_1",
+                         question_text="T", answer_type="essay", storage_key="answer:q_kegiatan_1")
+        self.submit("jawaban final")
+        with mock.patch.object(views, "draft_buffer", other_worker):
+            self.assertEqual(self.drafts(), {})
+        other_worker.flush()
+        answer = UserAnswer.objects.get(session=self.session)
+        self.assertEqual((answer.draft_text, answer.answer_text), ("", "jawaban final"))
+
+        # Draft yang diketik setelah submit tetap disimpan
+        self.put("revisi")
+        self.buffer.flush()
+        self.assertEqual(self.drafts(), {"q_kegiatan_1": "revisi"})
+
+
+class DatabaseCheckpointSaverTests(TestCase):
+    def setUp(self):
+        self.saver = DatabaseCheckpointSaver(keep_last=3)
+        self.config = {"configurable": {"thread_id": "t1", "checkpoint_ns": ""}}
+
+    def put(self, saver=None, thread_id="t1", parent=None, **values):
+        from langgraph.checkpoint.base import empty_checkpoint
+
+        checkpoint = empty_checkpoint()
+        checkpoint["channel_values"] = values
+        config = {"configurable": {"thread_id": thread_id, "checkpoint_ns": "", "checkpoint_id": parent}}
+        return (saver or self.saver).put(config, checkpoint, {"source": "loop", "step": len(values)}, {})
+
+    def test_put_and_get_tuple_round_trip(self):
+        first = self.put(summary="ringkasan 1")
+        second = self.put(parent=first["configurable"]["checkpoint_id"], summary="ringkasan 2", summarized_upto=7)
+
+        saved = self.saver.get_tuple(self.config)
+        self.assertEqual(saved.config, second)
+        self.assertEqual(saved.checkpoint["channel_values"], {"summary": "ringkasan 2", "summarized_upto": 7})
+        self.assertEqual(saved.metadata["step"], 2)
+        self.assertEqual(saved.parent_config["configurable"]["checkpoint_id"], first["configurable"]["checkpoint_id"])
+
+        older = self.saver.get_tuple(first)
+        self.assertEqual(older.checkpoint["channel_values"], {"summary": "ringkasan 1"})
+        self.assertIsNone(older.parent_config)
+
+        # Disimpan terkompres
+        row = GraphCheckpoint.objects.get(checkpoint_id=second["configurable"]["checkpoint_id"])
+        self.assertEqual(self.saver._load(row.checkpoint_type, row.checkpoint), saved.checkpoint)
+        self.assertIsNone(self.saver.get_tuple({"configurable": {"thread_id": "lain"}}))
+
+    def test_put_writes(self):
+        from langgraph.checkpoint.base import ERROR
+
+        config = self.put(summary="x")
+        self.saver.put_writes(config, [("messages", "a"), ("response", "b")], task_id="task-1")
+        # Write biasa tidak ditimpa, write error boleh
+        self.saver.put_writes(config, [("messages", "lain")], task_id="task-1")
+        self.saver.put_writes(config, [(ERROR, "gagal 1")], task_id="task-2")
+        self.saver.put_writes(config, [(ERROR, "gagal 2")], task_id="task-2")
+
+        expected = [("task-1", "messages", "a"), ("task-1", "response", "b"), ("task-2", ERROR, "gagal 2")]
+        self.assertEqual(sorted(self.saver.get_tuple(self.config).pending_writes), sorted(expected))
+        # Tanpa cache (worker lain / setelah restart) hasilnya sama
+        fresh = DatabaseCheckpointSaver(keep_last=3)
+        self.assertEqual(sorted(fresh.get_tuple(self.config).pending_writes), sorted(expected))
+
+    def test_list(self):
+        configs = [self.put(summary=str(index)) for index in range(3)]
+        self.put(thread_id="t2", summary="lain")
+
+        listed = [item.config for item in self.saver.list(self.config)]
+        self.assertEqual(listed, configs[::-1])
+        self.assertEqual([item.config for item in self.saver.list(self.config, before=configs[2], limit=1)], [configs[1]])
+        self.assertEqual(len(list(self.saver.list(None))), 4)
+        self.assertEqual(len(list(self.saver.list(self.config, filter={"source": "loop"}))), 3)
+        self.assertEqual(list(self.saver.list(self.config, filter={"source": "input"})), [])
+
+    def test_keeps_only_last_checkpoints_and_their_writes(self):
+        configs = []
+        for index in range(5):
+            configs.append(self.put(summary=str(index)))
+            self.saver.put_writes(configs[-1], [("messages", index)], task_id="task")
+
+        kept = [config["configurable"]["checkpoint_id"] for config in configs[2:]]
+        self.assertEqual(sorted(GraphCheckpoint.objects.values_list("checkpoint_id", flat=True)), sorted(kept))
+        self.assertEqual(sorted(set(GraphCheckpointWrite.objects.values_list("checkpoint_id", flat=True))), sorted(kept))
+        self.assertIsNone(self.saver.get_tuple(configs[0]))
+
+    def test_cache_follows_writes_from_other_workers(self):
+        other_worker = DatabaseCheckpointSaver(keep_last=3)
+        self.put(summary="lama")
+        self.assertEqual(self.saver.threads_in_memory, 1)
+        newer = self.put(saver=other_worker, summary="baru")
+        self.assertEqual(self.saver.get_tuple(self.config).config, newer)
+
+    def test_lru_evicts_least_recently_used_thread(self):
+        saver = DatabaseCheckpointSaver(keep_last=3, cache_size=2)
+        for thread_id in ["t1", "t2"]:
+            self.put(saver=saver, thread_id=thread_id)
+        saver.get_tuple(self.config)
+        self.put(saver=saver, thread_id="t3")
+        self.assertEqual([key[0] for key in saver._cache], ["t1", "t3"])
+
+    def test_prune_idle(self):
+        self.put(summary="lama")
+        self.put(thread_id="t2", summary="aktif")
+        GraphCheckpoint.objects.filter(thread_id="t1").update(created_at=timezone.now() - timedelta(days=30))
+        self.assertEqual(self.saver.prune_idle(), 1)
+        self.assertIsNone(self.saver.get_tuple(self.config))
+        self.assertIsNotNone(self.saver.get_tuple({"configurable": {"thread_id": "t2"}}))
+        self.assertEqual(self.saver.threads_in_memory, 1)
+
+
+class CheckpointResumeTests(TransactionTestCase):
+    """Checkpoint ditulis LangGraph dari thread pool-nya sendiri, jadi data harus benar-benar commit"""
+
+    def test_graph_resumes_after_restart(self):
+        from typing import TypedDict
+
+        from langgraph.graph import END, START, StateGraph
+
+        class State(TypedDict):
+            count: int
+
+        def build(saver):
+            graph = StateGraph(State)
+            graph.add_node("increment", lambda state: {"count": state.get("count", 0) + 1})
+            graph.add_edge(START, "increment")
+            graph.add_edge("increment", END)
+            return graph.compile(checkpointer=saver)
+
+        config = {"configurable": {"thread_id": "graph"}}
+        saver = DatabaseCheckpointSaver(keep_last=3)
+        build(saver).invoke({}, config)
+        build(saver).invoke({}, config)
+        # Proses baru: cache kosong, state dibaca dari DB
+        self.assertEqual(build(DatabaseCheckpointSaver(keep_last=3)).invoke({}, config), {"count": 3})
+        self.assertLessEqual(GraphCheckpoint.objects.filter(thread_id="graph").count(), 3)
+
+
+def quota(user=(5, 0.001), ip=(5, 0.001), global_=(100, 0.001)):
+    def limits(burst, rate):
+        return {"burst": burst, "rate": rate}
+    return {"enabled": True, "user": limits(*user), "ip": limits(*ip), "global": limits(*global_)}
+
+
+class LLMQuotaTests(TestCase):
+    def setUp(self):
+        self.now = 1_000_000.0
+        clock = mock.patch.object(throttling, "time")
+        clock.start().time.side_effect = lambda: self.now
+        self.addCleanup(clock.stop)
+        store = mock.patch.object(throttling, "bucket_store", throttling.TokenBucketStore())
+        self.store = store.start()
+        self.addCleanup(store.stop)
+        self.factory = RequestFactory()
+
+    def request(self, user=None, ip="10.0.0.1"):
+        request = self.factory.post("/api/chat/send/", REMOTE_ADDR=ip)
+        request.user = user or AnonymousUser()
+        return request
+
+    def tokens(self, key):
+        return QuotaBucket.objects.get(key=key).tokens
+
+    def decisions(self, scope, result):
+        return REGISTRY.get_sample_value(
+            "ecombot_llm_quota_requests_total", {"scope": scope, "result": result}
+        ) or 0
+
+    def test_bucket_refills_over_time(self):
+        for _ in range(2):
+            self.assertEqual(self.store.consume("k", burst=2, rate=1), (True, 0.0))
+        allowed, retry_after = self.store.consume("k", burst=2, rate=1)
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(retry_after, 1.0)
+
+        self.now += 0.5
+        self.assertFalse(self.store.consume("k", burst=2, rate=1)[0])
+        self.now += 0.5
+        self.assertTrue(self.store.consume("k", burst=2, rate=1)[0])
+        # Refill tidak melebihi burst meski lama tidak dipakai
+        self.now += 3600
+        self.assertTrue(self.store.consume("k", burst=2, rate=1)[0])
+        self.assertAlmostEqual(self.tokens("k"), 1.0)
+
+    def test_denied_client_is_rejected_without_queries(self):
+        self.store.consume("k", burst=1, rate=1)
+        self.assertFalse(self.store.consume("k", burst=1, rate=1)[0])
+        with self.assertNumQueries(0):
+            self.assertFalse(self.store.consume("k", burst=1, rate=1)[0])
+
+    @override_settings(LLM_QUOTA=quota(user=(1, 0.001)))
+    def test_user_bucket_is_per_user(self):
+        first = User.objects.create_user(username="siswa1", password="rahasia")
+        second = User.objects.create_user(username="siswa2", password="rahasia")
+        self.assertIsNone(throttling.check_llm_quota(self.request(first)))
+
+        response = throttling.check_llm_quota(self.request(first))
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "1000")
+        # Satu kelas di belakang NAT berbagi IP, tapi bucket-nya per user
+        self.assertIsNone(throttling.check_llm_quota(self.request(second)))
+        self.assertFalse(QuotaBucket.objects.filter(key__startswith="llm:ip:").exists())
+
+    @override_settings(LLM_QUOTA=quota(ip=(1, 0.001)))
+    def test_ip_bucket_is_only_for_anonymous_requests(self):
+        self.assertIsNone(throttling.check_llm_quota(self.request(ip="10.0.0.1")))
+        self.assertEqual(throttling.check_llm_quota(self.request(ip="10.0.0.1")).status_code, 429)
+        self.assertIsNone(throttling.check_llm_quota(self.request(ip="10.0.0.2")))
+
+        user = User.objects.create_user(username="siswa", password="rahasia")
+        self.assertIsNone(throttling.check_llm_quota(self.request(user, ip="10.0.0.1")))
+
+    @override_settings(LLM_QUOTA=quota(global_=(2, 0.001)))
+    def test_global_bucket_is_shared(self):
+        denied_before = self.decisions("global", "denied")
+        self.assertIsNone(throttling.check_llm_quota(self.request(ip="10.0.0.1")))
+        self.assertIsNone(throttling.check_llm_quota(self.request(ip="10.0.0.2")))
+        self.assertEqual(throttling.check_llm_quota(self.request(ip="10.0.0.3")).status_code, 429)
+        self.assertEqual(self.decisions("global", "denied"), denied_before + 1)
+
+    @override_settings(LLM_QUOTA=quota(user=(5, 0.001), global_=(1, 0.001)))
+    def test_partial_denial_does_not_charge_earlier_buckets(self):
+        user = User.objects.create_user(username="siswa", password="rahasia")
+        user_key = f"llm:user:{user.pk}"
+        allowed_before = self.decisions("user", "allowed")
+        self.assertIsNone(throttling.check_llm_quota(self.request(user)))
+        self.assertAlmostEqual(self.tokens(user_key), 4.0)
+
+        for _ in range(3):
+            self.assertEqual(throttling.check_llm_quota(self.request(user)).status_code, 429)
+        self.assertAlmostEqual(self.tokens(user_key), 4.0)
+        self.assertEqual(self.decisions("user", "allowed"), allowed_before + 1)
+
+    @override_settings(LLM_QUOTA=quota(user=(1, 0.001)))
+    def test_fails_open_when_bucket_store_errors(self):
+        user = User.objects.create_user(username="siswa", password="rahasia")
+        with mock.patch.object(self.store, "consume", side_effect=DatabaseError("quota_buckets hilang")):
+            for _ in range(3):
+                self.assertIsNone(throttling.check_llm_quota(self.request(user)))
+
+
+def jpeg_bytes(size=(40, 20), exif=None):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, "red").save(buffer, "JPEG", **({"exif": exif.tobytes()} if exif else {}))
+    return buffer.getvalue()
+
+
+class MemoryImageStorage:
+    def __init__(self):
+        self.files = {}
+
+    def save(self, name, data):
+        self.files[name] = data
+        return f"https://cdn.test/{name}"
+
+
+class ImageUploadTests(TestCase):
+    def setUp(self):
+        self.session = create_session()
+        self.staging_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.staging_dir, True)
+        upload_settings = override_settings(IMAGE_UPLOAD={**settings.IMAGE_UPLOAD, "staging_dir": self.staging_dir})
+        upload_settings.enable()
+        self.addCleanup(upload_settings.disable)
+        self.storage = MemoryImageStorage()
+        for patcher in (
+            mock.patch.object(images, "_storage", self.storage),
+            mock.patch.object(ocr, "ocr_pipeline"),
+            mock.patch.object(realtime, "publish_session_event"),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def create_upload(self, data, question_id="q_kegiatan_5", activity_id="kegiatan_5"):
+        upload = ImageUpload.objects.create(
+            session=self.session, question_id=question_id, activity_id=activity_id, content_hash="a" * 64
+        )
+        upload.staged_path = os.path.join(self.staging_dir, f"{upload.id}.upload")
+        with open(upload.staged_path, "wb") as f:
+            f.write(data)
+        upload.save(update_fields=["staged_path"])
+        return upload
+
+    def process(self, upload):
+        images.process_upload(upload.id)
+        self.assertFalse(os.path.exists(upload.staged_path))
+        upload.refresh_from_db()
+        return upload
+
+    def test_variants_are_stored_without_exif(self):
+        exif = Image.Exif()
+        exif[0x0110] = "Kamera Siswa"
+        exif[0x0112] = 6  # Orientation: putar 90 derajat
+        upload = self.process(self.create_upload(jpeg_bytes(exif=exif)))
+
+        self.assertEqual(upload.status, "ready")
+        self.assertEqual((upload.width, upload.height), (20, 40))
+        self.assertEqual(len(self.storage.files), 2)
+        for data in self.storage.files.values():
+            with Image.open(io.BytesIO(data)) as image:
+                self.assertEqual(image.size, (20, 40))
+                self.assertEqual(dict(image.getexif()), {})
+
+        answer = UserAnswer.objects.get(session=self.session, question_id="q_kegiatan_5")
+        self.assertEqual(answer.image_url, upload.url)
+        self.assertEqual(answer.image_hash, "a" * 64)
+        large = self.storage.files[f"s1/q_kegiatan_5-{'a' * 16}.jpg"]
+        ocr.ocr_pipeline.request.assert_called_once_with("a" * 64, large)
+        realtime.publish_session_event.assert_called_once()
+
+    def test_invalid_image_is_rejected(self):
+        upload = self.process(self.create_upload(b"bukan gambar"))
+        self.assertEqual(upload.status, "failed")
+        self.assertEqual(self.storage.files, {})
+        self.assertFalse(UserAnswer.objects.exists())
+
+    def test_oversized_image_is_rejected_before_decoding(self):
+        upload = self.create_upload(jpeg_bytes(size=(200, 100)))
+        with override_settings(IMAGE_UPLOAD={**settings.IMAGE_UPLOAD, "max_pixels": 100 * 100}):
+            with mock.patch.object(Image.Image, "load") as load:
+                upload = self.process(upload)
+        load.assert_not_called()
+        self.assertEqual(upload.status, "failed")
+        self.assertIn("batas piksel", upload.error)
+        self.assertEqual(self.storage.files, {})
+
+    def test_unknown_question_fails_upload(self):
+        upload = self.process(self.create_upload(jpeg_bytes(), question_id="q_hilang"))
+        self.assertEqual(upload.status, "failed")
+        self.assertIn("q_hilang", upload.error)
+        self.assertFalse(UserAnswer.objects.exists())
+
+    def test_full_queue_returns_503_and_drops_upload(self):
+        client = APIClient()
+        client.force_authenticate(self.session.user)
+        with mock.patch.object(images.image_pipeline, "max_pending", 0):
+            response = client.post("/api/chat/answer/image/", {
+                "session_id": self.session.session_id,
+                "activity_id": "kegiatan_5",
+                "question_id": "q_kegiatan_5",
+                "image": SimpleUploadedFile("foto.jpg", jpeg_bytes(), content_type="image/jpeg"),
+            }, format="multipart")
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "5")
+        self.assertFalse(ImageUpload.objects.exists())
+        self.assertEqual(os.listdir(self.staging_dir), [])
+
+
+class InlineExecutor:
+    """Pengganti process pool: extract_text dijalankan langsung di thread test"""
+
+    def submit(self, fn, *args):
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+class OcrPipelineTests(TestCase):
+    content_hash = "b" * 64
+
+    def setUp(self):
+        self.pipeline = ocr.OcrPipeline(max_pending=4, stale_after=600)
+        self.pipeline._available = True
+        self.pipeline._executor = InlineExecutor()
+        self.extract = mock.patch.object(ocr, "extract_text", return_value="jawaban siswa").start()
+        mock.patch.object(ocr, "close_old_connections").start()
+        self.addCleanup(mock.patch.stopall)
+
+        session = create_session()
+        self.answer = UserAnswer.objects.create(
+            session=session, question_id="q_kegiatan_5", answer_text="", image_hash=self.content_hash
+        )
+
+    def result(self):
+        return ImageOcrResult.objects.get(content_hash=self.content_hash)
+
+    def test_same_image_is_read_once(self):
+        self.assertEqual(self.pipeline.request(self.content_hash, b"jpeg"), "pending")
+        self.assertEqual(self.result().status, "done")
+        self.answer.refresh_from_db()
+        self.assertEqual(self.answer.ocr_text, "jawaban siswa")
+
+        other = UserAnswer.objects.create(
+            session=self.answer.session, question_id="q_kegiatan_6", answer_text="", image_hash=self.content_hash
+        )
+        self.assertEqual(self.pipeline.request(self.content_hash, b"jpeg"), "done")
+        self.extract.assert_called_once_with(b"jpeg", "ind+eng", 30)
+        other.refresh_from_db()
+        self.assertEqual(other.ocr_text, "jawaban siswa")
+        self.assertEqual(ocr.cached_ocr_text(self.content_hash), "jawaban siswa")
+
+    def test_fresh_pending_row_is_left_to_its_worker(self):
+        ImageOcrResult.objects.create(content_hash=self.content_hash, status="pending")
+        self.assertEqual(self.pipeline.request(self.content_hash, b"jpeg"), "pending")
+        self.extract.assert_not_called()
+        self.assertEqual(self.result().status, "pending")
+
+    def test_stale_pending_row_is_retried(self):
+        ImageOcrResult.objects.create(
+            content_hash=self.content_hash, status="pending", queued_at=timezone.now() - timedelta(hours=1)
+        )
+        self.pipeline.request(self.content_hash, b"jpeg")
+        self.extract.assert_called_once()
+        self.assertEqual(self.result().status, "done")
+
+    def test_full_queue_skips_until_uploaded_again(self):
+        self.pipeline.max_pending = 0
+        self.assertEqual(self.pipeline.request(self.content_hash, b"jpeg"), "skipped")
+        self.extract.assert_not_called()
+
+        self.pipeline.max_pending = 4
+        self.pipeline.request(self.content_hash, b"jpeg")
+        self.assertEqual(self.result().status, "done")
+
+    def test_failed_image_is_not_retried(self):
+        self.extract.side_effect = RuntimeError("tesseract timeout")
+        self.pipeline.request(self.content_hash, b"jpeg")
+        self.assertEqual(self.result().status, "failed")
+        self.assertEqual(self.pipeline.request(self.content_hash, b"jpeg"), "failed")
+        self.assertEqual(self.extract.call_count, 1)
+        self.assertEqual(self.pipeline._pending, 0)
+
+
+class HealthProbeTests(SimpleTestCase):
+    def setUp(self):
+        self.model = mock.Mock()
+        for patcher in (
+            mock.patch.object(views, "gemini_model", self.model),
+            mock.patch.object(views, "retriever", None),
+            mock.patch.dict(views.system_state, {"systems": {}, "healthy": False, "last_probe": None}),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_probe_does_not_call_llm_by_default(self):
+        views.probe_systems()
+        self.model.invoke.assert_not_called()
+        self.assertEqual(views.system_state["systems"]["gemini_model"], "✅ Ready")
+
+    def test_llm_probe_can_be_enabled(self):
+        with mock.patch.object(views, "HEALTH_PROBE_LLM", True):
+            views.probe_systems()
+        self.model.invoke.assert_called_once_with("Test")
+
+
+class LoadTestPercentileTests(SimpleTestCase):
+    def test_nearest_rank(self):
+        from load_test import percentile
+
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 95), 95)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile(values, 100), 100)
+        self.assertEqual(percentile(values, 0), 1)
+        self.assertEqual(percentile([1, 2, 3, 4], 50), 2)
+        self.assertEqual(percentile([7], 99), 7)
+        self.assertEqual(percentile([], 50), 0.0)
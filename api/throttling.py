@@ -0,0 +1,193 @@
+import logging
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection, transaction
+from rest_framework import status
+from rest_framework.exceptions import Throttled
+from rest_framework.response import Response
+from rest_framework.throttling import BaseThrottle
+
+from .models import QuotaBucket
+from .utils.metrics import LLM_QUOTA_DECISIONS
+
+logger = logging.getLogger(__name__)
+
+# Bucket yang tidak disentuh selama ini pasti sudah penuh lagi dan aman dihapus
+STALE_BUCKET_SECONDS = 3600
+CLEANUP_INTERVAL = 600
+
+
+class TokenBucketStore:
+    """
+    Token bucket yang state-nya disimpan di tabel quota_buckets.
+
+    Setiap pengambilan token adalah satu UPDATE bersyarat (refill + kurangi
+    token hanya jika cukup), jadi atomik di semua worker tanpa lock. Klien
+    yang ditolak diingat di memori proses sampai token berikutnya tersedia,
+    sehingga spam ditolak tanpa query database sama sekali.
+
+    UPDATE ditulis sebagai SQL mentah: kompilasi ekspresi ORM yang sama
+    memakan ~0.5 ms per panggilan, lebih lama dari query-nya sendiri.
+    """
+
+    def __init__(self):
+        self._denied_until = {}
+        self._lock = threading.Lock()
+        self._last_cleanup = 0.0
+        self._consume_sql = None
+
+    def _get_consume_sql(self):
+        if self._consume_sql is None:
+            quote = connection.ops.quote_name
+            # CASE alih-alih LEAST/MIN agar sama di SQLite, PostgreSQL dan MySQL
+            refilled = (
+                f"(CASE WHEN {quote('tokens')} + (%s - {quote('updated_at')}) * %s > %s "
+                f"THEN %s ELSE {quote('tokens')} + (%s - {quote('updated_at')}) * %s END)"
+            )
+            self._consume_sql = (
+                f"UPDATE {quote(QuotaBucket._meta.db_table)} "
+                f"SET {quote('tokens')} = {refilled} - %s, {quote('updated_at')} = %s "
+                f"WHERE {quote('key')} = %s AND {refilled} >= %s"
+            )
+        return self._consume_sql
+
+    def consume(self, key, burst, rate, cost=1.0):
+        """
+        Ambil `cost` token dari bucket `key`.
+
+        Returns:
+            Tuple (allowed, retry_after_detik)
+        """
+        now = time.time()
+        denied_until = self._denied_until.get(key)
+        if denied_until:
+            if denied_until > now:
+                return False, denied_until - now
+            self._denied_until.pop(key, None)
+
+        burst, rate, cost = float(burst), float(rate), float(cost)
+        refill_params = [now, rate, burst, burst, now, rate]
+        with connection.cursor() as cursor:
+            cursor.execute(self._get_consume_sql(), refill_params + [cost, now, key] + refill_params + [cost])
+            updated = cursor.rowcount
+        if updated:
+            self._maybe_cleanup(now)
+            return True, 0.0
+
+        bucket, created = QuotaBucket.objects.get_or_create(
+            key=key, defaults={"tokens": burst - cost, "updated_at": now}
+        )
+        if created:
+            return True, 0.0
+
+        available = min(burst, bucket.tokens + (now - bucket.updated_at) * rate)
+        if available >= cost:
+            # Kalah balapan dengan worker lain saat row baru dibuat; coba sekali lagi
+            return self.consume(key, burst, rate, cost)
+
+        retry_after = (cost - available) / rate if rate > 0 else STALE_BUCKET_SECONDS
+        with self._lock:
+            self._denied_until[key] = now + retry_after
+        return False, retry_after
+
+    def _maybe_cleanup(self, now):
+        if now - self._last_cleanup < CLEANUP_INTERVAL:
+            return
+        self._last_cleanup = now
+        with self._lock:
+            self._denied_until = {k: v for k, v in self._denied_until.items() if v > now}
+        deleted, _ = QuotaBucket.objects.filter(updated_at__lt=now - STALE_BUCKET_SECONDS).delete()
+        if deleted:
+            logger.info(f"🧹 Removed {deleted} idle quota buckets")
+
+
+bucket_store = TokenBucketStore()
+
+# Counter per scope untuk /health: {'user': {'allowed': n, 'denied': n}, ...}
+# Hanya worker ini; total semua worker ada di metric ecombot_llm_quota_requests_total
+quota_stats = {scope: {"allowed": 0, "denied": 0} for scope in ("user", "ip", "global")}
+_stats_lock = threading.Lock()
+
+
+def _count(scope, outcome):
+    with _stats_lock:
+        quota_stats[scope][outcome] += 1
+    LLM_QUOTA_DECISIONS.labels(scope=scope, result=outcome).inc()
+
+
+class LLMQuotaThrottle(BaseThrottle):
+    """
+    Kuota token bucket untuk endpoint yang memanggil LLM.
+
+    User yang login memakai bucket per user; bucket per IP hanya untuk
+    request anonim, karena satu kelas di belakang NAT sekolah berbagi satu IP.
+    IP diambil dari X-Forwarded-For sesuai REST_FRAMEWORK["NUM_PROXIES"].
+    Bucket global selalu dicek. Token hanya terpakai jika semua bucket lolos.
+    Burst dan kecepatan refill (token/detik) diatur di settings.LLM_QUOTA.
+    Jika tabel kuota tidak bisa diakses, request tetap dilayani (fail-open).
+
+    View yang bisa menjawab tanpa LLM memanggil check_llm_quota() sendiri
+    tepat sebelum LLM dipakai, bukan lewat throttle_classes.
+    """
+
+    scope_name = "llm"
+
+    def __init__(self):
+        self.retry_after = None
+
+    def get_buckets(self, request):
+        quota = settings.LLM_QUOTA
+        buckets = []
+        if request.user and request.user.is_authenticated:
+            buckets.append(("user", f"{self.scope_name}:user:{request.user.pk}", quota["user"]))
+        else:
+            buckets.append(("ip", f"{self.scope_name}:ip:{self.get_ident(request)}", quota["ip"]))
+        buckets.append(("global", f"{self.scope_name}:global", quota["global"]))
+        return buckets
+
+    def allow_request(self, request, view):
+        if not settings.LLM_QUOTA.get("enabled", True):
+            return True
+
+        try:
+            buckets = self.get_buckets(request)
+            # Satu commit untuk semua bucket, bukan satu commit per UPDATE
+            with transaction.atomic():
+                for scope, key, limits in buckets:
+                    allowed, retry_after = bucket_store.consume(key, limits["burst"], limits["rate"])
+                    if not allowed:
+                        # Token yang sudah diambil dari bucket sebelumnya dikembalikan
+                        transaction.set_rollback(True)
+                        _count(scope, "denied")
+                        self.retry_after = retry_after
+                        logger.warning(f"🚦 LLM quota exceeded ({scope}) for {key}, retry in {retry_after:.1f}s")
+                        return False
+            for scope, _, _ in buckets:
+                _count(scope, "allowed")
+        except Exception as e:
+            logger.error(f"❌ Quota check failed, allowing request: {e}")
+        return True
+
+    def wait(self):
+        # DRF mengubah nilai ini menjadi header Retry-After pada respons 429
+        return self.retry_after
+
+
+def check_llm_quota(request):
+    """
+    Cek kuota LLM dari dalam view, setelah jalur lokal (flow router,
+    intent/FAQ, answer cache) tidak bisa menjawab.
+
+    Returns:
+        Response 429 (format sama dengan throttle DRF) atau None jika boleh lanjut
+    """
+    throttle = LLMQuotaThrottle()
+    if throttle.allow_request(request, None):
+        return None
+    wait = throttle.wait()
+    response = Response({"detail": Throttled(wait).detail}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+    response["Retry-After"] = str(math.ceil(wait))
+    return response
@@ -26,9 +26,14 @@ urlpatterns = [
     path('chat/session/send/', views.send_chat_message, name='send_chat_message'),
     path('chat/session/<str:session_id>/activity/<str:activity_id>/', views.get_activity_history, name='get_activity_history'),
     path('chat/session/<str:session_id>/overview/', views.get_session_overview, name='get_session_overview'),
+    path('chat/session/<str:session_id>/changes/', views.get_session_changes, name='get_session_changes'),
     
     # Activity Management
     path('chat/answer/submit/', views.submit_activity_answer, name='submit_activity_answer'),
+    path('chat/answer/submit-batch/', views.submit_activity_answers_batch, name='submit_activity_answers_batch'),
+    path('chat/answer/draft/', views.answer_draft, name='answer_draft'),
+    path('chat/answer/image/', views.upload_answer_image, name='upload_answer_image'),
+    path('chat/answer/image/<int:upload_id>/', views.get_answer_image, name='get_answer_image'),
     path('chat/activity/complete/', views.complete_activity, name='complete_activity'),
     # path('chat/flow/', views.get_chat_flow, name='get_chat_flow'),
     path('chat/session/<str:session_id>/overview/', views.get_session_overview, name='get_session_overview'),
@@ -39,6 +44,11 @@ urlpatterns = [
     
     # Health check
     path('health/', views.health_check, name='health_check'),
+    path('health/live/', views.health_live, name='health_live'),
+    path('health/ready/', views.health_ready, name='health_ready'),
+    
+    # Prometheus metrics
+    path('metrics/', views.metrics, name='metrics'),
     
     # RAG System Debug
     path('debug-rag-status/', views.debug_rag_status, name='debug_rag_status'),
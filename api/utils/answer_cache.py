@@ -0,0 +1,25 @@
+import hashlib
+import re
+
+from api.models import CachedAnswer
+
+_NON_WORD = re.compile(r"[^\w\s]+")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_question(text):
+    """Lowercase, buang tanda baca dan spasi berlebih agar variasi penulisan kena cache yang sama"""
+    return _SPACES.sub(" ", _NON_WORD.sub(" ", text.lower())).strip()
+
+
+def answer_cache_key(question):
+    """Key cache jawaban; dipakai sama persis oleh jalur online dan precompute_answers"""
+    return hashlib.sha256(normalize_question(question).encode("utf-8")).hexdigest()
+
+
+def lookup_cached_answer(question):
+    """
+    Returns:
+        CachedAnswer untuk pertanyaan ini, atau None jika belum di-precompute
+    """
+    return CachedAnswer.objects.filter(cache_key=answer_cache_key(question)).first()
@@ -0,0 +1,134 @@
+import gzip
+import json
+import logging
+
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+from .session_overview import invalidate_session_overview
+
+try:
+    import zstandard
+except ImportError:  # zstd opsional, gzip selalu tersedia
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_FIELDS = (
+    "id", "message_type", "character", "message_text", "step_id",
+    "activity_id", "sequence_order", "timestamp", "message_data",
+)
+
+
+def default_codec():
+    return "zstd" if zstandard else "gzip"
+
+
+def pack_messages(rows, codec):
+    """Serialisasi + kompres list dict pesan; mengembalikan (payload, ukuran JSON mentah)"""
+    raw = json.dumps(rows, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+    if codec == "zstd":
+        if zstandard is None:
+            raise ValueError("Codec zstd membutuhkan paket zstandard")
+        return zstandard.ZstdCompressor(level=10).compress(raw), len(raw)
+    return gzip.compress(raw, compresslevel=6), len(raw)
+
+
+def unpack_messages(codec, payload):
+    payload = bytes(payload)
+    if codec == "zstd":
+        if zstandard is None:
+            raise ValueError("Arsip zstd tidak bisa dibaca tanpa paket zstandard")
+        raw = zstandard.ZstdDecompressor().decompress(payload)
+    else:
+        raw = gzip.decompress(payload)
+    return json.loads(raw)
+
+
+def archive_session(session, codec=None, chunk_size=500):
+    """
+    Pindahkan semua ChatMessage sesi ke satu baris ChatSessionArchive.
+
+    Sesi harus sudah ditandai non-aktif (paused/completed) oleh pemanggil,
+    sehingga sesi yang dibuka lagi selalu melewati restore_session. Arsip
+    ditulis dulu, baru baris panas dihapus per chunk (transaksi pendek).
+    Jika proses terhenti di tengah, menjalankan ulang aman: pesan yang sudah
+    ada di arsip digabung per id. Jika sesi dipulihkan di tengah jalan,
+    penghapusan berhenti.
+
+    Returns:
+        Jumlah pesan yang dipindahkan dari tabel chat_messages
+    """
+    from api.models import ChatMessage, ChatSession, ChatSessionArchive
+
+    hot = list(
+        ChatMessage.objects.filter(session=session).order_by("sequence_order", "id").values(*ARCHIVE_FIELDS)
+    )
+    if not hot:
+        return 0
+
+    with transaction.atomic():
+        # Lock sesi yang sama dengan restore_session: sesi yang sudah aktif lagi tidak diarsipkan
+        if not list(ChatSession.objects.select_for_update().filter(pk=session.pk).exclude(status="active").values_list("pk")):
+            return 0
+        archive = ChatSessionArchive.objects.select_for_update().filter(session=session).first()
+        rows = {row["id"]: row for row in unpack_messages(archive.codec, archive.payload)} if archive else {}
+        rows.update({row["id"]: row for row in hot})
+        ordered = sorted(rows.values(), key=lambda row: (row["sequence_order"], row["id"]))
+
+        codec = codec or default_codec()
+        payload, raw_size = pack_messages(ordered, codec)
+        ChatSessionArchive.objects.update_or_create(
+            session=session,
+            defaults={"codec": codec, "payload": payload, "message_count": len(ordered), "raw_size": raw_size},
+        )
+
+    ids = [row["id"] for row in hot]
+    moved = 0
+    for start in range(0, len(ids), chunk_size):
+        with transaction.atomic():
+            if not list(ChatSessionArchive.objects.select_for_update().filter(session=session).values_list("pk")):
+                # Sudah dipulihkan oleh request lain; baris yang tersisa tetap di tabel panas
+                break
+            moved += ChatMessage.objects.filter(id__in=ids[start:start + chunk_size]).delete()[0]
+    invalidate_session_overview(session.pk)
+    return moved
+
+
+def restore_session(session):
+    """
+    Kembalikan pesan dari arsip ke chat_messages (id dan sequence_order asli).
+
+    Dipanggil saat sesi non-aktif dibuka lagi; sesi 'paused' kembali
+    'active', juga jika arsipnya belum sempat ditulis.
+
+    Returns:
+        Jumlah pesan yang dipulihkan
+    """
+    from api.models import ChatMessage, ChatSession, ChatSessionArchive
+
+    with transaction.atomic():
+        list(ChatSession.objects.select_for_update().filter(pk=session.pk).values_list("pk"))
+        archive = ChatSessionArchive.objects.select_for_update().filter(session=session).first()
+        if archive is None:
+            if session.status == "paused":
+                ChatSession.objects.filter(pk=session.pk, status="paused").update(status="active")
+                session.status = "active"
+            return 0
+
+        rows = unpack_messages(archive.codec, archive.payload)
+        messages = [ChatMessage(session=session, **row) for row in rows]
+        ChatMessage.objects.bulk_create(messages, batch_size=500, ignore_conflicts=True)
+        # auto_now_add menimpa timestamp saat insert; kembalikan nilai aslinya
+        for message, row in zip(messages, rows):
+            message.timestamp = parse_datetime(row["timestamp"])
+        ChatMessage.objects.bulk_update(messages, ["timestamp"], batch_size=500)
+        archive.delete()
+
+        if session.status == "paused":
+            ChatSession.objects.filter(pk=session.pk).update(status="active")
+            session.status = "active"
+
+    invalidate_session_overview(session.pk)
+    logger.info(f"📦 Restored {len(messages)} archived messages for {session.session_id}")
+    return len(messages)
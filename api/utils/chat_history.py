@@ -0,0 +1,101 @@
+import threading
+import time
+from collections import OrderedDict
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+HISTORY_FIELDS = ("id", "message_type", "message_text", "sequence_order")
+
+
+class ChatHistoryCache:
+    """
+    Jendela pesan terbaru per sesi, dibangun ulang dari tabel chat_messages.
+
+    ChatMessage adalah satu-satunya sumber histori percakapan; cache ini
+    hanya menyimpan `depth` pesan terakhir setiap sesi di memori worker.
+    Cache miss dibaca dengan satu query pada index (session, sequence_order);
+    cache hit hanya mengambil pesan dengan sequence_order di atas yang sudah
+    di-cache, sehingga pesan yang ditulis worker lain tetap ikut terbaca.
+    """
+
+    def __init__(self, depth=24, size=512, ttl=1800):
+        self.depth = depth
+        self.size = size
+        self.ttl = ttl
+        # session pk -> {'rows': [(id, message_type, message_text, sequence_order), ...],
+        #                'complete': jendela berisi seluruh pesan sesi, 'touched': monotonic}
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def recent(self, session_pk, after_pk=0, limit=None):
+        """
+        Pesan sesi dengan pk di atas after_pk (pesan yang belum diringkas).
+
+        Jika jendela cache tidak menjangkau mundur sampai after_pk, pesan dibaca
+        langsung dari DB supaya tidak ada pesan yang hilang dari histori.
+
+        Returns:
+            List tuple (id, message_type, message_text, sequence_order) urut dari lama ke baru
+        """
+        from api.models import ChatMessage
+
+        messages = ChatMessage.objects.filter(session_id=session_pk)
+        with self._lock:
+            entry = self._entries.get(session_pk)
+            if entry and time.monotonic() - entry["touched"] > self.ttl:
+                entry = None
+
+        if entry is None:
+            rows = list(
+                messages.order_by("-sequence_order", "-id").values_list(*HISTORY_FIELDS)[:self.depth]
+            )[::-1]
+            complete = len(rows) < self.depth
+        else:
+            last_seq = entry["rows"][-1][3] if entry["rows"] else 0
+            newer = list(
+                messages.filter(sequence_order__gt=last_seq).order_by("sequence_order", "id").values_list(*HISTORY_FIELDS)
+            )
+            rows = entry["rows"] + newer
+            complete = entry["complete"] and len(rows) <= self.depth
+            rows = rows[-self.depth:]
+
+        with self._lock:
+            self._entries[session_pk] = {"rows": rows, "complete": complete, "touched": time.monotonic()}
+            self._entries.move_to_end(session_pk)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+        if complete or (rows and rows[0][0] <= after_pk):
+            rows = [row for row in rows if row[0] > after_pk]
+        else:
+            rows = list(
+                messages.filter(pk__gt=after_pk).order_by("sequence_order", "id").values_list(*HISTORY_FIELDS)
+            )
+        return rows[-limit:] if limit else rows
+
+    def invalidate(self, session_pk):
+        with self._lock:
+            self._entries.pop(session_pk, None)
+
+
+def to_langchain_messages(rows, max_chars=1500):
+    """
+    Ubah baris ChatMessage menjadi pesan LangChain (id = 'msg-<pk>').
+
+    Pesan system dilewati; pesan yang sangat panjang (misal materi kegiatan)
+    dipotong agar prompt tidak membengkak.
+    """
+    messages = []
+    for pk, message_type, text, *_ in rows:
+        if len(text) > max_chars:
+            text = text[:max_chars] + " ..."
+        if message_type == "user":
+            messages.append(HumanMessage(content=text, id=f"msg-{pk}"))
+        elif message_type == "bot":
+            messages.append(AIMessage(content=text, id=f"msg-{pk}"))
+    return messages
+
+
+def message_pk(message):
+    """Kebalikan dari to_langchain_messages: 'msg-42' -> 42"""
+    return int(message.id.split("-", 1)[1])
@@ -0,0 +1,353 @@
+import logging
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+
+logger = logging.getLogger(__name__)
+
+PRUNE_IDLE_INTERVAL = 600
+
+
+class DatabaseCheckpointSaver(BaseCheckpointSaver):
+    """
+    Checkpointer LangGraph yang disimpan di database Django.
+
+    Berbeda dengan MemorySaver, state percakapan dibagi semua worker
+    gunicorn dan tetap ada setelah restart. Agar tetap kecil:
+
+    - setiap checkpoint diserialisasi lalu dikompres zlib,
+    - hanya `keep_last` checkpoint terbaru per thread yang disimpan,
+    - thread yang tidak aktif lebih dari `idle_ttl` detik dihapus.
+
+    Checkpoint terbaru thread yang sering dipakai disimpan di LRU per worker
+    (`cache_size` thread, dibuang setelah `cache_ttl` detik tidak dipakai).
+    Sebelum dipakai, id-nya dicocokkan dengan id terbaru di DB, sehingga
+    cache tidak basi ketika giliran sebelumnya diproses worker lain.
+    """
+
+    def __init__(self, keep_last=3, cache_size=256, cache_ttl=1800, idle_ttl=7 * 24 * 3600, serde=None):
+        super().__init__(serde=serde)
+        self.keep_last = max(1, int(keep_last))
+        self.cache_size = max(0, int(cache_size))
+        self.cache_ttl = cache_ttl
+        self.idle_ttl = idle_ttl
+        # (thread_id, checkpoint_ns) -> dict berisi checkpoint terbaru dalam bentuk serial
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._last_idle_prune = 0.0
+
+    # ----- serialisasi -----
+
+    def _dump(self, value):
+        type_, data = self.serde.dumps_typed(value)
+        return type_, zlib.compress(data)
+
+    def _load(self, type_, data):
+        return self.serde.loads_typed((type_, zlib.decompress(bytes(data))))
+
+    # ----- LRU cache -----
+
+    @property
+    def threads_in_memory(self):
+        return len(self._cache)
+
+    def _cache_get(self, key):
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry["touched"] > self.cache_ttl:
+                del self._cache[key]
+                return None
+            entry["touched"] = time.monotonic()
+            self._cache.move_to_end(key)
+            return entry
+
+    def _cache_put(self, key, entry):
+        if not self.cache_size:
+            return
+        now = entry["touched"] = time.monotonic()
+        with self._lock:
+            self._cache[key] = entry
+            self._cache.move_to_end(key)
+            # Urutan OrderedDict = urutan terakhir dipakai, jadi yang kedaluwarsa ada di depan
+            while self._cache and (
+                len(self._cache) > self.cache_size
+                or now - next(iter(self._cache.values()))["touched"] > self.cache_ttl
+            ):
+                self._cache.popitem(last=False)
+
+    def _cache_drop(self, thread_id):
+        with self._lock:
+            for key in [key for key in self._cache if key[0] == thread_id]:
+                del self._cache[key]
+
+    # ----- helper -----
+
+    @staticmethod
+    def _config(thread_id, checkpoint_ns, checkpoint_id):
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint_id,
+            }
+        }
+
+    def _to_tuple(self, thread_id, checkpoint_ns, checkpoint_id, parent_id, checkpoint, metadata, writes):
+        return CheckpointTuple(
+            config=self._config(thread_id, checkpoint_ns, checkpoint_id),
+            checkpoint=self._load(*checkpoint),
+            metadata=self._load(*metadata),
+            parent_config=self._config(thread_id, checkpoint_ns, parent_id) if parent_id else None,
+            pending_writes=[
+                (task_id, channel, self._load(*value))
+                for task_id, channel, value in writes
+            ],
+        )
+
+    def _load_writes(self, thread_id, checkpoint_ns, checkpoint_id):
+        from api.models import GraphCheckpointWrite
+
+        rows = GraphCheckpointWrite.objects.filter(
+            thread_id=thread_id, checkpoint_ns=checkpoint_ns, checkpoint_id=checkpoint_id
+        ).order_by("task_path", "task_id", "idx").values_list("task_id", "channel", "value_type", "value")
+        return [(task_id, channel, (value_type, bytes(value))) for task_id, channel, value_type, value in rows]
+
+    def _row_entry(self, row):
+        return {
+            "checkpoint_id": row.checkpoint_id,
+            "parent_id": row.parent_checkpoint_id,
+            "checkpoint": (row.checkpoint_type, bytes(row.checkpoint)),
+            "metadata": (row.metadata_type, bytes(row.metadata)),
+            "writes": self._load_writes(row.thread_id, row.checkpoint_ns, row.checkpoint_id),
+        }
+
+    def _entry_tuple(self, thread_id, checkpoint_ns, entry):
+        return self._to_tuple(
+            thread_id, checkpoint_ns, entry["checkpoint_id"], entry["parent_id"],
+            entry["checkpoint"], entry["metadata"], entry["writes"],
+        )
+
+    # ----- BaseCheckpointSaver API -----
+
+    def get_tuple(self, config):
+        from api.models import GraphCheckpoint
+
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = get_checkpoint_id(config)
+        rows = GraphCheckpoint.objects.filter(thread_id=thread_id, checkpoint_ns=checkpoint_ns)
+
+        if checkpoint_id:
+            entry = self._cache_get((thread_id, checkpoint_ns))
+            if entry and entry["checkpoint_id"] == checkpoint_id:
+                return self._entry_tuple(thread_id, checkpoint_ns, entry)
+            row = rows.filter(checkpoint_id=checkpoint_id).first()
+            return self._entry_tuple(thread_id, checkpoint_ns, self._row_entry(row)) if row else None
+
+        latest_id = rows.order_by("-checkpoint_id").values_list("checkpoint_id", flat=True).first()
+        if latest_id is None:
+            return None
+
+        entry = self._cache_get((thread_id, checkpoint_ns))
+        if not entry or entry["checkpoint_id"] != latest_id:
+            row = rows.filter(checkpoint_id=latest_id).first()
+            if row is None:
+                # Baru saja di-prune worker lain
+                return None
+            entry = self._row_entry(row)
+            self._cache_put((thread_id, checkpoint_ns), entry)
+        return self._entry_tuple(thread_id, checkpoint_ns, entry)
+
+    def list(self, config, *, filter=None, before=None, limit=None):
+        from api.models import GraphCheckpoint
+
+        rows = GraphCheckpoint.objects.order_by("thread_id", "-checkpoint_id")
+        if config:
+            rows = rows.filter(thread_id=config["configurable"]["thread_id"])
+            if config["configurable"].get("checkpoint_ns") is not None:
+                rows = rows.filter(checkpoint_ns=config["configurable"]["checkpoint_ns"])
+            if get_checkpoint_id(config):
+                rows = rows.filter(checkpoint_id=get_checkpoint_id(config))
+        if before and get_checkpoint_id(before):
+            rows = rows.filter(checkpoint_id__lt=get_checkpoint_id(before))
+
+        for row in rows.iterator():
+            if limit is not None and limit <= 0:
+                break
+            entry = self._row_entry(row)
+            if filter:
+                metadata = self._load(*entry["metadata"])
+                if not all(metadata.get(key) == value for key, value in filter.items()):
+                    continue
+            if limit is not None:
+                limit -= 1
+            yield self._entry_tuple(row.thread_id, row.checkpoint_ns, entry)
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        from api.models import GraphCheckpoint
+
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        parent_id = config["configurable"].get("checkpoint_id")
+        checkpoint_data = self._dump(checkpoint)
+        metadata_data = self._dump(get_checkpoint_metadata(config, metadata))
+
+        # Satu statement upsert: LangGraph memanggil put() dari thread pool-nya sendiri,
+        # dan SELECT-lalu-INSERT dalam satu transaksi bisa deadlock di SQLite
+        with self._write_lock:
+            GraphCheckpoint.objects.bulk_create(
+                [GraphCheckpoint(
+                    thread_id=thread_id,
+                    checkpoint_ns=checkpoint_ns,
+                    checkpoint_id=checkpoint["id"],
+                    parent_checkpoint_id=parent_id,
+                    checkpoint_type=checkpoint_data[0],
+                    checkpoint=checkpoint_data[1],
+                    metadata_type=metadata_data[0],
+                    metadata=metadata_data[1],
+                )],
+                update_conflicts=True,
+                unique_fields=["thread_id", "checkpoint_ns", "checkpoint_id"],
+                update_fields=["parent_checkpoint_id", "checkpoint_type", "checkpoint", "metadata_type", "metadata"],
+            )
+            self._prune_thread(thread_id, checkpoint_ns)
+        self._cache_put((thread_id, checkpoint_ns), {
+            "checkpoint_id": checkpoint["id"],
+            "parent_id": parent_id,
+            "checkpoint": checkpoint_data,
+            "metadata": metadata_data,
+            "writes": [],
+        })
+        self._maybe_prune_idle()
+        return self._config(thread_id, checkpoint_ns, checkpoint["id"])
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        from api.models import GraphCheckpointWrite
+
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+
+        rows = []
+        for index, (channel, value) in enumerate(writes):
+            value_type, data = self._dump(value)
+            rows.append(GraphCheckpointWrite(
+                thread_id=thread_id,
+                checkpoint_ns=checkpoint_ns,
+                checkpoint_id=checkpoint_id,
+                task_id=task_id,
+                task_path=task_path,
+                idx=WRITES_IDX_MAP.get(channel, index),
+                channel=channel,
+                value_type=value_type,
+                value=data,
+            ))
+
+        # Write khusus (error, interrupt, ...) boleh menimpa; write biasa tidak
+        special = [row for row in rows if row.idx < 0]
+        regular = [row for row in rows if row.idx >= 0]
+        with self._write_lock:
+            if regular:
+                GraphCheckpointWrite.objects.bulk_create(regular, ignore_conflicts=True)
+            if special:
+                GraphCheckpointWrite.objects.bulk_create(
+                    special,
+                    update_conflicts=True,
+                    unique_fields=["thread_id", "checkpoint_ns", "checkpoint_id", "task_id", "idx"],
+                    update_fields=["task_path", "channel", "value_type", "value"],
+                )
+
+        entry = self._cache_get((thread_id, checkpoint_ns))
+        if entry and entry["checkpoint_id"] == checkpoint_id:
+            entry["writes"] = self._load_writes(thread_id, checkpoint_ns, checkpoint_id)
+
+    def delete_thread(self, thread_id):
+        from api.models import GraphCheckpoint, GraphCheckpointWrite
+
+        with transaction.atomic():
+            GraphCheckpoint.objects.filter(thread_id=thread_id).delete()
+            GraphCheckpointWrite.objects.filter(thread_id=thread_id).delete()
+        self._cache_drop(thread_id)
+
+    async def aget_tuple(self, config):
+        return self.get_tuple(config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        for item in self.list(config, filter=filter, before=before, limit=limit):
+            yield item
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return self.put(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        return self.put_writes(config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id):
+        return self.delete_thread(thread_id)
+
+    # ----- pembatasan ukuran -----
+
+    def _prune_thread(self, thread_id, checkpoint_ns):
+        """Hapus checkpoint (dan write-nya) di luar `keep_last` terbaru"""
+        from api.models import GraphCheckpoint, GraphCheckpointWrite
+
+        rows = GraphCheckpoint.objects.filter(thread_id=thread_id, checkpoint_ns=checkpoint_ns)
+        oldest_kept = rows.order_by("-checkpoint_id").values_list("checkpoint_id", flat=True)[
+            self.keep_last - 1:self.keep_last
+        ].first()
+        if oldest_kept is None:
+            return
+        rows.filter(checkpoint_id__lt=oldest_kept).delete()
+        GraphCheckpointWrite.objects.filter(
+            thread_id=thread_id, checkpoint_ns=checkpoint_ns, checkpoint_id__lt=oldest_kept
+        ).delete()
+
+    def _maybe_prune_idle(self):
+        now = time.monotonic()
+        if now - self._last_idle_prune < PRUNE_IDLE_INTERVAL:
+            return
+        self._last_idle_prune = now
+        try:
+            self.prune_idle()
+        except Exception as e:
+            logger.error(f"❌ Failed pruning idle LangGraph threads: {e}")
+
+    def prune_idle(self):
+        """
+        Hapus semua checkpoint thread yang tidak aktif lebih dari idle_ttl.
+
+        Returns:
+            Jumlah thread yang dihapus
+        """
+        from api.models import GraphCheckpoint, GraphCheckpointWrite
+
+        cutoff = timezone.now() - timedelta(seconds=self.idle_ttl)
+        active = GraphCheckpoint.objects.filter(created_at__gte=cutoff).values("thread_id")
+        idle = list(
+            GraphCheckpoint.objects.exclude(thread_id__in=active).values_list("thread_id", flat=True).distinct()
+        )
+        if not idle:
+            return 0
+
+        with transaction.atomic():
+            GraphCheckpoint.objects.filter(thread_id__in=idle).delete()
+            GraphCheckpointWrite.objects.filter(thread_id__in=idle).delete()
+        for thread_id in idle:
+            self._cache_drop(thread_id)
+        logger.info(f"🧹 Removed checkpoints of {len(idle)} idle LangGraph threads")
+        return len(idle)
@@ -1,5 +1,6 @@
 import cloudinary
 import cloudinary.api
+import cloudinary.uploader
 import cloudinary.utils
 import os
 from django.conf import settings
@@ -119,4 +120,24 @@ def generate_responsive_urls(public_id, breakpoints=[400, 800, 1200, 1920]):
     for width in breakpoints:
         urls[f'w{width}'] = get_optimized_url(public_id, width=width)
     
-    return urls
\ No newline at end of file
+    return urls
+def upload_image(data, public_id, folder='ecombot/answers'):
+    """
+    Upload gambar (bytes) ke Cloudinary.
+    
+    Args:
+        data: Isi file gambar yang sudah diproses
+        public_id: ID public tujuan (tanpa folder)
+        folder: Folder Cloudinary
+    
+    Returns:
+        URL HTTPS gambar yang diupload
+    """
+    result = cloudinary.uploader.upload(
+        data,
+        public_id=public_id,
+        folder=folder,
+        overwrite=True,
+        resource_type='image'
+    )
+    return result['secure_url']
@@ -0,0 +1,174 @@
+import atexit
+import logging
+import operator
+import os
+import threading
+import time
+from functools import reduce
+
+from django.conf import settings
+from django.db import close_old_connections, models
+from django.db.models import Case, Q, Value, When
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+def is_stale(draft_updated_at, submitted_at):
+    """Draft yang diketik sebelum jawaban terakhir di-submit tidak boleh muncul lagi"""
+    return submitted_at is not None and draft_updated_at <= submitted_at
+
+
+class DraftBuffer:
+    """
+    Penampung draft jawaban (autosave) per worker.
+
+    Client boleh mengirim draft setiap beberapa ketukan; buffer hanya
+    menyimpan versi terakhir per (sesi, pertanyaan) dan thread flusher
+    menulisnya sekaligus setiap flush_interval detik dengan satu upsert.
+    Draft yang belum di-flush ikut dibaca lewat pending(), dan dibuang saat
+    jawabannya di-submit (discard). Draft di buffer worker lain tidak ikut
+    terbuang, jadi flush hanya menulis draft yang lebih baru dari
+    submitted_at baris jawabannya.
+    """
+
+    def __init__(self, flush_interval=5.0, enabled=True):
+        self.flush_interval = float(flush_interval)
+        self.enabled = enabled
+
+        # (session pk, question_id) -> dict field UserAnswer versi terakhir
+        self._drafts = {}
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._stopping = False
+
+        self.stats = {"received": 0, "flushed": 0, "flushes": 0, "errors": 0}
+
+    # ----- API untuk views -----
+
+    def put(self, session_pk, question_id, draft_text, **fields):
+        """
+        Simpan draft terbaru. `fields` (activity_id, question_text, answer_type,
+        storage_key) hanya dipakai jika baris UserAnswer belum ada.
+        """
+        draft = {
+            **fields,
+            "session_id": session_pk,
+            "question_id": question_id,
+            "draft_text": draft_text,
+            "draft_updated_at": timezone.now(),
+        }
+        with self._cond:
+            self._drafts[(session_pk, question_id)] = draft
+            self.stats["received"] += 1
+        if not self.enabled:
+            self.flush()
+        else:
+            self._ensure_started()
+        return draft
+
+    def pending(self, session_pk):
+        """Draft sesi ini yang belum ditulis ke database, per question_id"""
+        with self._cond:
+            return {
+                question_id: dict(draft)
+                for (pk, question_id), draft in self._drafts.items()
+                if pk == session_pk
+            }
+
+    def discard(self, session_pk, question_ids):
+        with self._cond:
+            for question_id in question_ids:
+                self._drafts.pop((session_pk, question_id), None)
+
+    def flush(self):
+        with self._flush_lock:
+            with self._cond:
+                drafts, self._drafts = self._drafts, {}
+            if drafts:
+                self._write(list(drafts.values()))
+
+    # ----- internal -----
+
+    def _write(self, drafts):
+        from api.models import UserAnswer
+
+        started = time.perf_counter()
+        answers = [
+            UserAnswer(
+                answer_text="",
+                is_submitted=False,
+                step_id=draft.get("activity_id", ""),
+                **draft,
+            )
+            for draft in drafts
+        ]
+        rows = [Q(session_id=draft["session_id"], question_id=draft["question_id"]) for draft in drafts]
+        draft_text = Case(
+            *[When(row, then=Value(draft["draft_text"])) for row, draft in zip(rows, drafts)],
+            output_field=models.TextField(),
+        )
+        draft_updated_at = Case(
+            *[When(row, then=Value(draft["draft_updated_at"])) for row, draft in zip(rows, drafts)],
+            output_field=models.DateTimeField(),
+        )
+        try:
+            # Baris baru dibuat dengan draft-nya; baris yang sudah ada dilewati di sini
+            UserAnswer.objects.bulk_create(answers, ignore_conflicts=True)
+            # Baris yang sudah ada hanya berubah kolom draft-nya, dan hanya jika draft lebih
+            # baru dari submit terakhir (kondisinya dicek di DB, jadi aman terhadap submit paralel)
+            UserAnswer.objects.filter(reduce(operator.or_, rows)).filter(
+                Q(submitted_at__isnull=True) | Q(submitted_at__lt=draft_updated_at)
+            ).update(draft_text=draft_text, draft_updated_at=draft_updated_at, updated_at=timezone.now())
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.error(f"❌ Draft flush failed ({len(answers)} drafts): {e}")
+            return
+        self.stats["flushed"] += len(answers)
+        self.stats["flushes"] += 1
+        logger.debug(f"📝 Flushed {len(answers)} drafts in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    def _ensure_started(self):
+        if self._pid == os.getpid() and self._thread and self._thread.is_alive():
+            return
+        with self._cond:
+            if self._pid == os.getpid() and self._thread and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="draft-flusher", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._stopping:
+                    self._cond.wait(self.flush_interval)
+                stopping = self._stopping
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"❌ Draft flusher error: {e}")
+            finally:
+                close_old_connections()
+            if stopping:
+                return
+
+    def shutdown(self):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"❌ Final draft flush failed: {e}")
+
+
+_options = getattr(settings, "CHAT_DRAFTS", {})
+draft_buffer = DraftBuffer(
+    flush_interval=_options.get("flush_interval", 5.0),
+    enabled=_options.get("enabled", True),
+)
+atexit.register(draft_buffer.shutdown)
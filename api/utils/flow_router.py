@@ -0,0 +1,171 @@
+import re
+from collections import deque
+
+# Kata pengisi yang boleh menemani keyword navigasi ("ayo mulai kegiatan 2 dong")
+FILLER_WORDS = {
+    "ayo", "yuk", "ok", "oke", "okay", "ya", "iya", "dong", "deh", "kak", "aquano",
+    "saya", "aku", "kita", "mau", "ingin", "lanjut", "sekarang", "please", "tolong",
+}
+
+_NON_WORD = re.compile(r"[^\w\s]+")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize(text):
+    """Lowercase, buang tanda baca, rapikan spasi"""
+    return _SPACES.sub(" ", _NON_WORD.sub(" ", text.lower())).strip()
+
+
+class AhoCorasick:
+    """
+    Automaton Aho-Corasick sederhana untuk mencari banyak pola sekaligus
+    dalam satu kali scan teks (O(panjang teks + jumlah match)).
+    """
+
+    def __init__(self, patterns):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+
+        for pattern in patterns:
+            state = 0
+            for char in pattern:
+                if char not in self.goto[state]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                    self.goto[state][char] = len(self.goto) - 1
+                state = self.goto[state][char]
+            self.output[state].append(pattern)
+
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self.goto[state].items():
+                queue.append(child)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(char, 0)
+                self.output[child] = self.output[child] + self.output[self.fail[child]]
+
+    def find_all(self, text):
+        """Yield (start, end, pattern) untuk setiap kemunculan pola"""
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+            for pattern in self.output[state]:
+                yield index - len(pattern) + 1, index + 1, pattern
+
+
+class FlowKeywordRouter:
+    """
+    Router lokal untuk pesan navigasi CHATBOT_FLOW ('siap', 'mulai kegiatan 2',
+    'kembali ke kegiatan 1', ...). Pesan yang isinya hanya keyword navigasi
+    dijawab langsung dengan konten step tujuan tanpa retrieval atau LLM.
+
+    Keyword yang tidak punya step tujuan ('forum diskusi', 'kembali ke menu')
+    tidak di-route dan tetap diteruskan ke model.
+    """
+
+    def __init__(self, flow):
+        self.flow = flow
+        self.order = list(flow.keys())
+        # keyword -> {source_step: (target_step, mode)}
+        self.routes = {}
+        # Keyword yang tujuannya eksplisit ('mulai kegiatan 3') berlaku dari step mana pun;
+        # konfirmasi seperti 'sudah' dan 'selesai' hanya berlaku di step yang mencantumkannya
+        self.global_keywords = set()
+
+        for step_id, step in flow.items():
+            for keyword in step.get("next_keywords", []):
+                target = self._resolve_target(step_id, normalize(keyword))
+                if target:
+                    self.routes.setdefault(normalize(keyword), {})[step_id] = target
+                    if normalize(keyword).startswith(("mulai ", "kembali ke ")):
+                        self.global_keywords.add(normalize(keyword))
+
+        self.automaton = AhoCorasick(self.routes.keys())
+
+    def _resolve_target(self, step_id, keyword):
+        """Tentukan step tujuan sebuah keyword di step tertentu"""
+        for prefix in ("mulai ", "kembali ke "):
+            if keyword.startswith(prefix):
+                slug = keyword[len(prefix):].replace(" ", "_")
+                return (slug, "step") if slug in self.flow else None
+
+        if keyword == "selesai":
+            return ("completion", "step") if "completion" in self.flow else None
+
+        if keyword.startswith("pertanyaan"):
+            step = self.flow[step_id]
+            return (step_id, "question") if step.get("question") or step.get("questions") else None
+
+        if keyword in ("forum diskusi", "kembali ke menu"):
+            return None
+
+        # Konfirmasi seperti 'siap' / 'sudah' -> lanjut ke step berikutnya
+        position = self.order.index(step_id)
+        if position + 1 < len(self.order):
+            return (self.order[position + 1], "step")
+        return None
+
+    def match(self, message, current_step=None):
+        """
+        Cocokkan pesan dengan keyword navigasi.
+
+        Args:
+            message: Pesan mentah dari user
+            current_step: Activity/step yang sedang aktif di client
+
+        Returns:
+            Dict berisi keyword, target_step, mode, title, content dan
+            questions, atau None jika pesan bukan pesan navigasi.
+        """
+        text = normalize(message)
+        if not text:
+            return None
+
+        candidates = []
+        for start, end, keyword in self.automaton.find_all(text):
+            # Hanya terima match utuh per kata
+            if (start and text[start - 1] != " ") or (end < len(text) and text[end] != " "):
+                continue
+            rest = (text[:start] + " " + text[end:]).split()
+            if any(word not in FILLER_WORDS for word in rest):
+                continue
+            candidates.append(keyword)
+
+        for keyword in sorted(candidates, key=len, reverse=True):
+            sources = self.routes[keyword]
+            if current_step in sources:
+                target = sources[current_step]
+            elif keyword in self.global_keywords:
+                target = next(iter(sources.values()))
+            else:
+                continue
+            return self._build_route(keyword, *target)
+        return None
+
+    def _build_route(self, keyword, target_step, mode):
+        step = self.flow[target_step]
+        questions = step.get("questions") or ([step["question"]] if step.get("question") else [])
+
+        if mode == "question":
+            content = "\n\n".join(question["text"] for question in questions)
+        else:
+            content = step.get("message", "")
+
+        return {
+            "keyword": keyword,
+            "target_step": target_step,
+            "mode": mode,
+            "title": step.get("title"),
+            "character": step.get("character", "Aquano"),
+            "content": content,
+            "image_url": step.get("image_url"),
+            "questions": questions,
+            "next_keywords": step.get("next_keywords", []),
+        }
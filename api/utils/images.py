@@ -0,0 +1,233 @@
+import hashlib
+import io
+import logging
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+# Batas piksel untuk mencegah decompression bomb (Pillow default ~89 MP)
+Image.MAX_IMAGE_PIXELS = settings.IMAGE_UPLOAD["max_pixels"]
+
+
+class ImageRejected(ValueError):
+    """File upload bukan gambar yang valid / melebihi batas"""
+
+
+class LocalImageStorage:
+    """Simpan varian gambar di MEDIA_ROOT (perlu volume persisten di produksi)"""
+
+    def __init__(self, subdir="answers"):
+        self.root = os.path.join(settings.MEDIA_ROOT, subdir)
+        self.base_url = settings.MEDIA_URL.rstrip("/") + "/" + subdir
+
+    def save(self, name, data):
+        path = os.path.join(self.root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+        return f"{self.base_url}/{name}"
+
+
+class CloudinaryImageStorage:
+    """Simpan varian gambar di Cloudinary (lihat api/utils/cloudinary_utils.py)"""
+
+    def __init__(self, folder="ecombot/answers"):
+        self.folder = folder
+
+    def save(self, name, data):
+        from .cloudinary_utils import upload_image
+
+        public_id = os.path.splitext(name)[0]
+        return upload_image(io.BytesIO(data), public_id=public_id, folder=self.folder)
+
+
+_storage = None
+
+
+def get_image_storage():
+    global _storage
+    if _storage is None:
+        _storage = import_string(settings.IMAGE_UPLOAD["storage"])()
+    return _storage
+
+
+def hash_upload(uploaded_file):
+    """sha256 isi file, dibaca per chunk dari file spool di disk"""
+    digest = hashlib.sha256()
+    for chunk in uploaded_file.chunks():
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def stage_upload(uploaded_file, upload_id):
+    """
+    Pindahkan file spool upload ke direktori staging agar tetap ada setelah
+    request selesai (TemporaryUploadedFile dihapus saat request ditutup).
+    """
+    staging_dir = settings.IMAGE_UPLOAD["staging_dir"]
+    os.makedirs(staging_dir, exist_ok=True)
+    path = os.path.join(staging_dir, f"{upload_id}.upload")
+    if hasattr(uploaded_file, "temporary_file_path"):
+        shutil.move(uploaded_file.temporary_file_path(), path)
+    else:
+        with open(path, "wb") as f:
+            for chunk in uploaded_file.chunks():
+                f.write(chunk)
+    return path
+
+
+def render_variants(path):
+    """
+    Validasi gambar dan buat varian JPEG tanpa metadata (EXIF/GPS ikut terbuang).
+
+    Returns:
+        Tuple (dict nama varian -> bytes, (lebar, tinggi) asli)
+    """
+    config = settings.IMAGE_UPLOAD
+    try:
+        with Image.open(path) as probe:
+            # Pillow hanya memberi warning sampai 2x MAX_IMAGE_PIXELS; ukuran dari header, belum di-decode
+            if probe.width * probe.height > config["max_pixels"]:
+                raise ImageRejected(f"Gambar {probe.width}x{probe.height} melebihi batas piksel")
+            probe.verify()
+        with Image.open(path) as image:
+            if image.format not in config["allowed_formats"]:
+                raise ImageRejected(f"Format {image.format} tidak didukung")
+            image = ImageOps.exif_transpose(image)
+            size = image.size
+            if image.mode not in ("RGB", "L"):
+                # Transparansi diratakan ke latar putih (JPEG tidak punya alpha)
+                rgba = image.convert("RGBA")
+                image = Image.new("RGB", rgba.size, "white")
+                image.paste(rgba, mask=rgba.getchannel("A"))
+
+            variants = {}
+            for name, max_side in (("large", config["large_size"]), ("thumb", config["thumbnail_size"])):
+                variant = image.copy()
+                variant.thumbnail((max_side, max_side), Image.LANCZOS)
+                buffer = io.BytesIO()
+                variant.save(buffer, "JPEG", quality=config["jpeg_quality"], optimize=True, progressive=True)
+                variants[name] = buffer.getvalue()
+            return variants, size
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError, SyntaxError) as e:
+        logger.info(f"Image decode failed for {path}: {e}")
+        raise ImageRejected("File bukan gambar yang valid") from e
+
+
+class ImagePipeline:
+    """
+    Pool worker pemrosesan gambar jawaban.
+
+    Pillow melepas GIL saat decode/resize, jadi thread pool cukup. Jumlah
+    upload yang menunggu dibatasi max_pending; view menolak upload baru
+    (503) saat antrean penuh supaya burst upload tidak menumpuk di worker web.
+    """
+
+    def __init__(self, workers=2, max_pending=32):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def try_submit(self, upload_id):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                return False
+            self._pending += 1
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="image-pipeline")
+        self._executor.submit(self._run, upload_id)
+        return True
+
+    def _run(self, upload_id):
+        try:
+            process_upload(upload_id)
+        except Exception as e:
+            logger.error(f"❌ Image pipeline error for upload {upload_id}: {e}")
+        finally:
+            with self._lock:
+                self._pending -= 1
+            close_old_connections()
+
+
+def process_upload(upload_id):
+    """Proses satu ImageUpload: validasi, varian, simpan ke storage, isi image_url jawaban"""
+    from api.models import ImageUpload, UserAnswer
+    from api.views import question_registry
+
+    from .realtime import publish_session_event
+
+    upload = ImageUpload.objects.select_related("session").get(pk=upload_id)
+    question = question_registry.get(upload.question_id, upload.activity_id)
+    ImageUpload.objects.filter(pk=upload_id).update(status="processing")
+    try:
+        if question is None:
+            # Registry bisa berubah (flow di-reload) antara upload diterima dan diproses
+            raise ImageRejected(f"Pertanyaan {upload.question_id} tidak ditemukan")
+        variants, (width, height) = render_variants(upload.staged_path)
+        storage = get_image_storage()
+        base_name = f"{upload.session.session_id}/{upload.question_id}-{upload.content_hash[:16]}"
+        url = storage.save(f"{base_name}.jpg", variants["large"])
+        thumbnail_url = storage.save(f"{base_name}-thumb.jpg", variants["thumb"])
+    except Exception as e:
+        ImageUpload.objects.filter(pk=upload_id).update(status="failed", error=str(e)[:500])
+        logger.warning(f"⚠️ Image upload {upload_id} rejected: {e}")
+        publish_session_event(upload.session_id, "image", {"upload_id": upload_id, "status": "failed"})
+        return
+    finally:
+        try:
+            os.remove(upload.staged_path)
+        except OSError:
+            pass
+
+    from .ocr import cached_ocr_text, ocr_pipeline
+
+    ImageUpload.objects.filter(pk=upload_id).update(
+        status="ready", url=url, thumbnail_url=thumbnail_url, width=width, height=height,
+        processed_at=timezone.now(),
+    )
+    # Jawaban belum tentu ada (gambar bisa diupload sebelum teks); buat baris draft jika perlu
+    UserAnswer.objects.bulk_create(
+        [UserAnswer(
+            session_id=upload.session_id,
+            question_id=upload.question_id,
+            storage_key=question["storage_key"],
+            answer_text="",
+            answer_type=question["type"],
+            question_text=question["text"],
+            step_id=upload.activity_id,
+            activity_id=upload.activity_id,
+            image_url=url,
+            image_hash=upload.content_hash,
+            ocr_text=cached_ocr_text(upload.content_hash),
+        )],
+        update_conflicts=True,
+        unique_fields=["session", "question_id"],
+        update_fields=["image_url", "image_hash", "ocr_text", "updated_at"],
+    )
+    # OCR di process pool terpisah; hasilnya menyusul ke UserAnswer.ocr_text
+    ocr_pipeline.request(upload.content_hash, variants["large"])
+    publish_session_event(upload.session_id, "image", {
+        "upload_id": upload_id,
+        "status": "ready",
+        "question_id": upload.question_id,
+        "url": url,
+        "thumbnail_url": thumbnail_url,
+    })
+    logger.info(f"🖼️ Processed image upload {upload_id} ({width}x{height}) for {upload.question_id}")
+
+
+image_pipeline = ImagePipeline(
+    workers=settings.IMAGE_UPLOAD["workers"],
+    max_pending=settings.IMAGE_UPLOAD["max_pending"],
+)
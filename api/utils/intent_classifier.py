@@ -0,0 +1,217 @@
+import json
+import math
+import random
+import re
+from collections import defaultdict
+
+LABELS = ["navigation", "smalltalk", "faq", "open_question"]
+
+# Pesan panjang cukup diklasifikasi dari bagian awalnya agar tetap < 1 ms
+MAX_CLASSIFY_CHARS = 200
+
+_NON_WORD = re.compile(r"[^\w\s]+")
+_SPACES = re.compile(r"\s+")
+
+GREETING_WORDS = {"halo", "hallo", "hai", "hay", "hi", "hello", "pagi", "siang", "sore", "malam", "assalamualaikum", "permisi"}
+THANKS_WORDS = {"terima", "makasih", "makasi", "thanks", "thank", "thx", "tengkyu", "hatur", "nuhun"}
+YES_WORDS = {"sudah", "udah", "sdh", "paham", "mengerti", "ngerti", "oke", "ok", "okay", "iya", "ya", "yes", "siap", "bisa"}
+NO_WORDS = {"belum", "blm", "tidak", "nggak", "gak", "ga", "enggak", "engga", "no", "bingung"}
+
+# Kata materi: pesan yang menyebutnya tidak pernah dijawab dengan balasan template
+TOPIC_WORDS = {
+    "prinsip", "kimia", "biopori", "mapag", "banjir", "sampah", "sungai", "limbah",
+    "polusi", "pencemaran", "atom", "katalis", "pelarut", "mikroplastik", "plastik",
+    "metana", "lindi", "kompos", "genangan", "walungan", "susukan", "bebersih", "seba",
+    "tangkal", "drainase", "bod", "cod", "oksigen", "amonia", "logam", "asam", "ph",
+    "sdgs", "stem", "steam", "iklim", "energi", "tradisi", "lingkungan", "resapan",
+    "erosi", "ecombot", "greenverse",
+}
+
+
+def normalize(text):
+    """Lowercase, buang tanda baca, rapikan spasi"""
+    return _SPACES.sub(" ", _NON_WORD.sub(" ", text.lower())).strip()
+
+
+def extract_features(text, ngram_range=(2, 4)):
+    """
+    Fitur biner char n-gram + kata utuh dari teks yang sudah dinormalisasi.
+
+    Returns:
+        Set string fitur, misal {' ha', 'hal', 'w:halo', ...}
+    """
+    text = normalize(text[:MAX_CLASSIFY_CHARS])
+    padded = f" {text} "
+    features = set()
+    for n in range(ngram_range[0], ngram_range[1] + 1):
+        for i in range(len(padded) - n + 1):
+            features.add(padded[i:i + n])
+    for word in text.split():
+        features.add("w:" + word)
+    return features
+
+
+def mentions_topic(text):
+    return not TOPIC_WORDS.isdisjoint(normalize(text).split())
+
+
+def smalltalk_kind(text):
+    """Jenis smalltalk untuk memilih balasan: greeting, thanks, yes, no atau other"""
+    words = set(normalize(text).split())
+    if words & THANKS_WORDS:
+        return "thanks"
+    if words & GREETING_WORDS:
+        return "greeting"
+    if words & NO_WORDS:
+        return "no"
+    if words & YES_WORDS:
+        return "yes"
+    return "other"
+
+
+class IntentClassifier:
+    """
+    Regresi logistik multinomial di atas fitur char n-gram.
+
+    Bobot dilatih offline (`python manage.py train_intent_classifier`) lalu
+    disimpan sebagai JSON di repo, sehingga inferensi hanya berupa penjumlahan
+    bobot fitur yang muncul, tanpa dependensi ML tambahan. Fitur biner
+    dinormalisasi L2 supaya teks panjang tidak mendominasi.
+    """
+
+    def __init__(self, labels, weights, bias):
+        self.labels = labels
+        self.weights = weights
+        self.bias = bias
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["labels"], data["weights"], data["bias"])
+
+    def save(self, path, meta=None):
+        data = {
+            "labels": self.labels,
+            "bias": [round(b, 4) for b in self.bias],
+            "weights": {
+                feature: [round(w, 4) for w in row]
+                for feature, row in sorted(self.weights.items())
+                if max(abs(w) for w in row) >= 1e-3
+            },
+            "meta": meta or {},
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+
+    def predict_proba(self, text):
+        features = extract_features(text)
+        scale = 1.0 / math.sqrt(len(features) or 1)
+        scores = list(self.bias)
+        for feature in features:
+            row = self.weights.get(feature)
+            if row:
+                for i, w in enumerate(row):
+                    scores[i] += w * scale
+        return dict(zip(self.labels, _softmax(scores)))
+
+    def predict(self, text):
+        """
+        Returns:
+            Tuple (label, confidence)
+        """
+        probs = self.predict_proba(text)
+        label = max(probs, key=probs.get)
+        return label, probs[label]
+
+    @classmethod
+    def train(cls, samples, labels=LABELS, epochs=30, learning_rate=0.5, l2=1e-4, seed=13):
+        """
+        Latih model dengan SGD.
+
+        Args:
+            samples: List tuple (text, label)
+
+        Returns:
+            IntentClassifier yang sudah dilatih
+        """
+        rng = random.Random(seed)
+        index = {label: i for i, label in enumerate(labels)}
+        data = [(sorted(extract_features(text)), index[label]) for text, label in samples]
+        weights = defaultdict(lambda: [0.0] * len(labels))
+        bias = [0.0] * len(labels)
+
+        for epoch in range(epochs):
+            rng.shuffle(data)
+            rate = learning_rate / (1 + epoch * 0.1)
+            for features, target in data:
+                scale = 1.0 / math.sqrt(len(features) or 1)
+                scores = list(bias)
+                for feature in features:
+                    row = weights[feature]
+                    for i in range(len(labels)):
+                        scores[i] += row[i] * scale
+                probs = _softmax(scores)
+                for i in range(len(labels)):
+                    gradient = probs[i] - (1.0 if i == target else 0.0)
+                    bias[i] -= rate * gradient
+                    for feature in features:
+                        row = weights[feature]
+                        row[i] -= rate * (gradient * scale + l2 * row[i])
+
+        return cls(list(labels), dict(weights), bias)
+
+
+class FaqIndex:
+    """
+    Indeks terbalik pertanyaan FAQ (data/data.csv) untuk menjawab pertanyaan
+    yang hampir sama persis dengan entri knowledge base tanpa memanggil LLM.
+    """
+
+    def __init__(self, entries):
+        """
+        Args:
+            entries: List dict dengan key 'id', 'question' dan 'answer'
+        """
+        self.entries = entries
+        self.postings = defaultdict(list)
+        self.norms = []
+        for doc_id, entry in enumerate(entries):
+            features = self._features(entry["question"])
+            self.norms.append(math.sqrt(len(features)) or 1.0)
+            for feature in features:
+                self.postings[feature].append(doc_id)
+
+    @staticmethod
+    def _features(text):
+        # Hanya 3-/4-gram dan kata utuh agar posting list tetap pendek
+        return extract_features(text, ngram_range=(3, 4))
+
+    def lookup(self, text, min_similarity=0.6):
+        """
+        Returns:
+            Tuple (entry, similarity) untuk FAQ paling mirip, atau (None, skor terbaik)
+        """
+        features = self._features(text)
+        if not features:
+            return None, 0.0
+        overlap = defaultdict(int)
+        for feature in features:
+            for doc_id in self.postings.get(feature, ()):
+                overlap[doc_id] += 1
+        if not overlap:
+            return None, 0.0
+
+        query_norm = math.sqrt(len(features))
+        doc_id, shared = max(overlap.items(), key=lambda item: item[1] / self.norms[item[0]])
+        similarity = shared / (query_norm * self.norms[doc_id])
+        if similarity < min_similarity:
+            return None, similarity
+        return self.entries[doc_id], similarity
+
+
+def _softmax(scores):
+    top = max(scores)
+    exps = [math.exp(s - top) for s in scores]
+    total = sum(exps)
+    return [e / total for e in exps]
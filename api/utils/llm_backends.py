@@ -0,0 +1,158 @@
+import asyncio
+import importlib
+import random
+import threading
+import time
+
+from django.conf import settings
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage
+
+
+class FakeLLMError(RuntimeError):
+    """Error buatan yang dilempar FakeChatModel sesuai error_rate."""
+
+
+class FakeChatModel:
+    """
+    Chat model lokal yang deterministik untuk load test dan uji latensi.
+
+    Meniru antarmuka yang dipakai views dari ChatGoogleGenerativeAI
+    (invoke, ainvoke, stream, batch) tanpa memanggil jaringan sama sekali.
+
+    Args:
+        reply_template: Template balasan. Placeholder yang tersedia:
+            {question} (pesan user terakhir), {prompt} (seluruh prompt),
+            {n} (nomor panggilan), {model}.
+        latency_distribution: 'constant', 'uniform', 'normal' atau 'lognormal'
+        latency_ms: Latensi rata-rata sebelum token pertama (milidetik)
+        latency_jitter_ms: Sebaran latensi (lebar uniform / standar deviasi)
+        error_rate: Peluang (0-1) setiap panggilan gagal dengan FakeLLMError
+        stream_chunk_size: Jumlah karakter per chunk saat streaming
+        stream_chunk_delay_ms: Jeda antar chunk saat streaming
+        seed: Seed RNG agar urutan latensi dan error bisa direproduksi
+    """
+
+    model = "fake-chat-model"
+
+    def __init__(self, reply_template="Aquano (fake) menjawab: {question}",
+                 latency_distribution="constant", latency_ms=0.0, latency_jitter_ms=0.0,
+                 error_rate=0.0, stream_chunk_size=16, stream_chunk_delay_ms=0.0, seed=None):
+        if latency_distribution not in ("constant", "uniform", "normal", "lognormal"):
+            raise ValueError(f"Distribusi latensi tidak dikenal: {latency_distribution}")
+
+        self.reply_template = reply_template
+        self.latency_distribution = latency_distribution
+        self.latency_ms = float(latency_ms)
+        self.latency_jitter_ms = float(latency_jitter_ms)
+        self.error_rate = float(error_rate)
+        self.stream_chunk_size = max(1, int(stream_chunk_size))
+        self.stream_chunk_delay_ms = float(stream_chunk_delay_ms)
+
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._calls = 0
+
+    def _next_call(self):
+        """Ambil nomor panggilan, latensi dan status error secara atomik"""
+        with self._lock:
+            self._calls += 1
+            return self._calls, self._sample_latency(), self._rng.random() < self.error_rate
+
+    def _sample_latency(self):
+        mean, jitter = self.latency_ms, self.latency_jitter_ms
+        if self.latency_distribution == "uniform":
+            value = self._rng.uniform(mean - jitter, mean + jitter)
+        elif self.latency_distribution == "normal":
+            value = self._rng.gauss(mean, jitter)
+        elif self.latency_distribution == "lognormal":
+            # Ekor panjang seperti latensi API sungguhan; median = latency_ms
+            value = mean * self._rng.lognormvariate(0, jitter / mean if mean else 0)
+        else:
+            value = mean
+        return max(0.0, value) / 1000.0
+
+    def _render(self, prompt_input, call_no):
+        messages = _to_messages(prompt_input)
+        question = ""
+        for msg in reversed(messages):
+            if isinstance(msg, HumanMessage):
+                question = msg.content
+                break
+        prompt = "\n".join(str(msg.content) for msg in messages)
+        return self.reply_template.format(
+            question=question.strip()[:200], prompt=prompt, n=call_no, model=self.model
+        )
+
+    def invoke(self, prompt_input, config=None, **kwargs):
+        call_no, latency, fail = self._next_call()
+        time.sleep(latency)
+        if fail:
+            raise FakeLLMError(f"Fake LLM error (call {call_no})")
+        return AIMessage(content=self._render(prompt_input, call_no))
+
+    async def ainvoke(self, prompt_input, config=None, **kwargs):
+        call_no, latency, fail = self._next_call()
+        await asyncio.sleep(latency)
+        if fail:
+            raise FakeLLMError(f"Fake LLM error (call {call_no})")
+        return AIMessage(content=self._render(prompt_input, call_no))
+
+    def stream(self, prompt_input, config=None, **kwargs):
+        call_no, latency, fail = self._next_call()
+        time.sleep(latency)
+        if fail:
+            raise FakeLLMError(f"Fake LLM error (call {call_no})")
+        text = self._render(prompt_input, call_no)
+        for start in range(0, len(text), self.stream_chunk_size):
+            if start and self.stream_chunk_delay_ms:
+                time.sleep(self.stream_chunk_delay_ms / 1000.0)
+            yield AIMessageChunk(content=text[start:start + self.stream_chunk_size])
+
+    def batch(self, inputs, config=None, **kwargs):
+        return [self.invoke(prompt_input) for prompt_input in inputs]
+
+
+def _to_messages(prompt_input):
+    """Normalisasi input invoke (str, PromptValue, list pesan) menjadi list pesan"""
+    if isinstance(prompt_input, str):
+        return [HumanMessage(content=prompt_input)]
+    if hasattr(prompt_input, "to_messages"):
+        return prompt_input.to_messages()
+    messages = []
+    for item in prompt_input:
+        if isinstance(item, BaseMessage):
+            messages.append(item)
+        elif isinstance(item, tuple):
+            role, content = item
+            messages.append(HumanMessage(content=content) if role in ("human", "user") else AIMessage(content=content))
+        else:
+            messages.append(HumanMessage(content=str(item)))
+    return messages
+
+
+def create_fake_chat_model(**overrides):
+    """Buat FakeChatModel dari settings.FAKE_LLM (bisa ditimpa lewat argumen)"""
+    options = dict(getattr(settings, "FAKE_LLM", {}))
+    options.update(overrides)
+    return FakeChatModel(**options)
+
+
+def create_chat_model(backend):
+    """
+    Buat chat model untuk backend non-Gemini.
+
+    Args:
+        backend: 'fake' atau dotted path ke factory tanpa argumen
+            (misal 'myproject.llm.build_model')
+
+    Returns:
+        Object dengan method invoke() yang mengembalikan AIMessage
+    """
+    if backend == "fake":
+        return create_fake_chat_model()
+
+    module_path, _, factory_name = backend.rpartition(".")
+    if not module_path:
+        raise ValueError(f"LLM backend tidak dikenal: {backend}")
+    factory = getattr(importlib.import_module(module_path), factory_name)
+    return factory()
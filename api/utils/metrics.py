@@ -0,0 +1,138 @@
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+# Di gunicorn, PROMETHEUS_MULTIPROC_DIR di-set oleh gunicorn.conf.py sebelum worker di-fork,
+# sehingga setiap worker menulis nilai metric ke file mmap di direktori yang sama
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+SIZE_BUCKETS = (100, 500, 1_000, 5_000, 10_000, 50_000, 100_000, 500_000, 1_000_000, 5_000_000)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+LLM_LATENCY = Histogram(
+    "ecombot_llm_request_seconds", "Latency of LLM calls (gemini_model.invoke and friends)",
+    ["method"], buckets=LATENCY_BUCKETS,
+)
+LLM_ERRORS = Counter("ecombot_llm_errors_total", "LLM calls that raised an exception", ["method"])
+
+RETRIEVAL_LATENCY = Histogram(
+    "ecombot_retrieval_seconds", "Latency of knowledge base retrieval", buckets=LATENCY_BUCKETS,
+)
+RETRIEVAL_DOCUMENTS = Histogram(
+    "ecombot_retrieval_documents", "Documents returned per retrieval", buckets=(0, 1, 2, 3, 5, 10),
+)
+
+HTTP_LATENCY = Histogram(
+    "ecombot_http_request_seconds", "View latency", ["view", "method", "status"], buckets=LATENCY_BUCKETS,
+)
+HTTP_REQUEST_SIZE = Histogram(
+    "ecombot_http_request_size_bytes", "Request body size", ["view"], buckets=SIZE_BUCKETS,
+)
+HTTP_RESPONSE_SIZE = Histogram(
+    "ecombot_http_response_size_bytes", "Response body size", ["view"], buckets=SIZE_BUCKETS,
+)
+DB_QUERIES = Histogram(
+    "ecombot_db_queries_per_request", "Database queries executed per request", ["view"], buckets=QUERY_BUCKETS,
+)
+
+CACHE_REQUESTS = Counter(
+    "ecombot_cache_requests_total", "Lookups in local answer paths and caches", ["cache", "result"],
+)
+
+LLM_QUOTA_DECISIONS = Counter(
+    "ecombot_llm_quota_requests_total", "LLM quota checks per bucket scope", ["scope", "result"],
+)
+
+LANGGRAPH_THREADS = Gauge(
+    "ecombot_langgraph_threads_in_memory", "LangGraph conversation threads held in worker memory",
+    multiprocess_mode="livesum",
+)
+
+
+def record_cache(cache, hit):
+    """Catat satu lookup cache; rasio hit = hit / (hit + miss)"""
+    CACHE_REQUESTS.labels(cache=cache, result="hit" if hit else "miss").inc()
+
+
+@contextmanager
+def observe_llm(method):
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        LLM_ERRORS.labels(method=method).inc()
+        raise
+    finally:
+        LLM_LATENCY.labels(method=method).observe(time.perf_counter() - started)
+
+
+class InstrumentedChatModel:
+    """Proxy chat model yang mengukur latensi setiap panggilan LLM"""
+
+    def __init__(self, model):
+        self._model = model
+
+    def __getattr__(self, name):
+        return getattr(self._model, name)
+
+    def invoke(self, *args, **kwargs):
+        with observe_llm("invoke"):
+            return self._model.invoke(*args, **kwargs)
+
+    async def ainvoke(self, *args, **kwargs):
+        with observe_llm("ainvoke"):
+            return await self._model.ainvoke(*args, **kwargs)
+
+    def stream(self, *args, **kwargs):
+        # Diukur sampai chunk terakhir diterima
+        with observe_llm("stream"):
+            yield from self._model.stream(*args, **kwargs)
+
+    def batch(self, *args, **kwargs):
+        with observe_llm("batch"):
+            return self._model.batch(*args, **kwargs)
+
+
+class InstrumentedRetriever:
+    """Proxy retriever yang mengukur latensi dan jumlah dokumen hasil retrieval"""
+
+    def __init__(self, retriever):
+        self._retriever = retriever
+
+    def __getattr__(self, name):
+        return getattr(self._retriever, name)
+
+    def get_relevant_documents(self, query, *args, **kwargs):
+        with RETRIEVAL_LATENCY.time():
+            docs = self._retriever.get_relevant_documents(query, *args, **kwargs)
+        RETRIEVAL_DOCUMENTS.observe(len(docs))
+        return docs
+
+    async def aget_relevant_documents(self, query, *args, **kwargs):
+        with RETRIEVAL_LATENCY.time():
+            docs = await self._retriever.aget_relevant_documents(query, *args, **kwargs)
+        RETRIEVAL_DOCUMENTS.observe(len(docs))
+        return docs
+
+
+def render_metrics():
+    """
+    Returns:
+        Tuple (body, content_type) format teks Prometheus, digabung dari semua worker
+    """
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
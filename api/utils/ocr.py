@@ -0,0 +1,173 @@
+import io
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+def extract_text(image_bytes, lang, timeout):
+    """Dijalankan di proses worker: OCR satu gambar JPEG (varian "large")"""
+    import pytesseract
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        gray = ImageOps.autocontrast(ImageOps.grayscale(image))
+        return pytesseract.image_to_string(gray, lang=lang, timeout=timeout).strip()
+
+
+def tesseract_available():
+    try:
+        import pytesseract
+
+        pytesseract.get_tesseract_version()
+        return True
+    except Exception as e:
+        logger.warning(f"⚠️ OCR disabled, tesseract not available: {e}")
+        return False
+
+
+def cached_ocr_text(content_hash):
+    """Teks OCR yang sudah jadi untuk gambar ini, atau string kosong"""
+    from api.models import ImageOcrResult
+
+    return ImageOcrResult.objects.filter(content_hash=content_hash, status="done").values_list(
+        "text", flat=True
+    ).first() or ""
+
+
+class OcrPipeline:
+    """
+    OCR gambar jawaban di process pool (tesseract berat di CPU dan
+    pytesseract memanggil subprocess, jadi tidak ditaruh di worker web).
+
+    Hasil disimpan per content hash di ImageOcrResult: gambar yang sama
+    tidak pernah di-OCR dua kali, dan teksnya disalin ke semua UserAnswer
+    dengan image_hash yang sama. Paling banyak max_pending gambar menunggu;
+    sisanya ditandai "skipped" dan di-OCR ulang saat gambar itu diupload lagi.
+    Baris "pending" yang lebih tua dari stale_after detik (worker yang
+    memegangnya mati sebelum callback jalan) juga di-OCR ulang.
+    """
+
+    def __init__(self, workers=1, max_pending=16, lang="ind+eng", timeout=30, enabled=True, stale_after=900):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.lang = lang
+        self.timeout = timeout
+        self.enabled = enabled
+        self.stale_after = stale_after
+        self._available = None
+        self._executor = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def available(self):
+        if self._available is None:
+            self._available = self.enabled and tesseract_available()
+        return self._available
+
+    def request(self, content_hash, image_bytes):
+        """
+        Minta teks OCR untuk gambar; dipanggil setelah UserAnswer.image_hash diisi.
+
+        Returns:
+            Status ImageOcrResult ("done", "pending", "failed", "skipped") atau None jika OCR nonaktif
+        """
+        from api.models import ImageOcrResult, UserAnswer
+
+        if not self.available:
+            return None
+
+        result, created = ImageOcrResult.objects.get_or_create(content_hash=content_hash)
+        if result.status == "done":
+            UserAnswer.objects.filter(image_hash=content_hash).update(ocr_text=result.text)
+            return result.status
+        if not created:
+            if result.status == "failed":
+                return result.status
+            # Status diset sebelum submit agar tidak menimpa "done" dari callback yang cepat selesai.
+            # UPDATE bersyarat: hanya satu request (di worker mana pun) yang mengambil alih baris ini
+            claim = ImageOcrResult.objects.filter(pk=result.pk, status=result.status)
+            if result.status == "pending":
+                # Sedang diproses (hasilnya akan disalin oleh callback), kecuali sudah terlalu lama
+                claim = claim.filter(queued_at__lt=timezone.now() - timedelta(seconds=self.stale_after))
+            if not claim.update(status="pending", queued_at=timezone.now()):
+                return "pending"
+            if result.status == "pending":
+                logger.warning(f"⚠️ OCR for image {content_hash[:16]} stuck since {result.queued_at}, retrying")
+
+        if self._try_submit(content_hash, image_bytes):
+            return "pending"
+        ImageOcrResult.objects.filter(pk=result.pk).update(status="skipped")
+        return "skipped"
+
+    def _try_submit(self, content_hash, image_bytes):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                logger.warning(f"⚠️ OCR queue full, skipping image {content_hash[:16]}")
+                return False
+            if self._executor is None:
+                # spawn: worker tidak mewarisi thread/koneksi DB dari proses web
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            try:
+                future = self._executor.submit(extract_text, image_bytes, self.lang, self.timeout)
+            except Exception as e:
+                # Pool rusak (worker mati) dibuat ulang pada submit berikutnya
+                logger.error(f"❌ OCR submit failed for image {content_hash[:16]}: {e}")
+                self._executor = None
+                return False
+            self._pending += 1
+        future.add_done_callback(lambda f: self._done(content_hash, f))
+        return True
+
+    def _done(self, content_hash, future):
+        from api.models import ImageOcrResult, UserAnswer
+
+        with self._lock:
+            self._pending -= 1
+        try:
+            try:
+                text = future.result()
+            except BrokenProcessPool as e:
+                with self._lock:
+                    self._executor = None
+                ImageOcrResult.objects.filter(content_hash=content_hash).update(status="skipped", error=str(e)[:500])
+                logger.error(f"❌ OCR worker crashed on image {content_hash[:16]}: {e}")
+                return
+            except Exception as e:
+                ImageOcrResult.objects.filter(content_hash=content_hash).update(
+                    status="failed", error=str(e)[:500], processed_at=timezone.now()
+                )
+                logger.warning(f"⚠️ OCR failed for image {content_hash[:16]}: {e}")
+                return
+
+            ImageOcrResult.objects.filter(content_hash=content_hash).update(
+                status="done", text=text, processed_at=timezone.now()
+            )
+            updated = UserAnswer.objects.filter(image_hash=content_hash).update(ocr_text=text)
+            logger.info(f"🔤 OCR image {content_hash[:16]}: {len(text)} chars, {updated} answers")
+        except Exception as e:
+            logger.error(f"❌ Saving OCR result for {content_hash[:16]} failed: {e}")
+        finally:
+            close_old_connections()
+
+
+_options = getattr(settings, "IMAGE_OCR", {})
+ocr_pipeline = OcrPipeline(
+    workers=_options.get("workers", 1),
+    max_pending=_options.get("max_pending", 16),
+    lang=_options.get("lang", "ind+eng"),
+    timeout=_options.get("timeout", 30),
+    enabled=_options.get("enabled", True),
+    stale_after=_options.get("stale_after", 900),
+)
@@ -0,0 +1,61 @@
+import base64
+import json
+
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(sequence_order, pk):
+    """Cursor opaque untuk client: base64 dari posisi (sequence_order, id)"""
+    raw = json.dumps([sequence_order, pk], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        sequence_order, pk = json.loads(raw)
+        return int(sequence_order), int(pk)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(f"Cursor tidak valid: {cursor!r}") from e
+
+
+def encode_sync_cursor(sequence_order, since):
+    """Cursor delta-sync: sequence_order pesan terakhir + batas waktu (epoch) untuk updated_at"""
+    raw = json.dumps([sequence_order, round(since, 6)], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_sync_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        sequence_order, since = json.loads(raw)
+        return int(sequence_order), float(since)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(f"Cursor tidak valid: {cursor!r}") from e
+
+
+def page_backward(queryset, cursor=None, page_size=50):
+    """
+    Ambil satu halaman pesan, berjalan mundur dari yang terbaru.
+
+    Urutan (sequence_order, id) sama dengan index (session, sequence_order),
+    jadi setiap halaman adalah satu range scan tanpa OFFSET.
+
+    Returns:
+        Tuple (rows urut lama -> baru, next_cursor atau None jika sudah habis)
+    """
+    if cursor:
+        sequence_order, pk = decode_cursor(cursor)
+        queryset = queryset.filter(
+            Q(sequence_order__lt=sequence_order) | Q(sequence_order=sequence_order, id__lt=pk)
+        )
+
+    rows = list(queryset.order_by("-sequence_order", "-id")[:page_size + 1])
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    next_cursor = encode_cursor(rows[-1].sequence_order, rows[-1].pk) if has_more else None
+    return rows[::-1], next_cursor
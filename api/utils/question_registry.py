@@ -0,0 +1,73 @@
+class QuestionRegistry:
+    """
+    Daftar pertanyaan yang dikompilasi sekali dari CHATBOT_FLOW.
+
+    Setiap pertanyaan ('question' tunggal atau list 'questions' di step)
+    dinormalisasi menjadi dict dengan key id, activity_id, text, type,
+    storage_key, required, max_length dan allow_image_upload. Validasi dan
+    pengisian data jawaban cukup lookup dict, jadi client hanya perlu
+    mengirim question_id.
+
+    Pertanyaan wajib yang menerima gambar boleh dijawab dengan gambar saja,
+    jadi teksnya tidak wajib (requires_text False).
+    """
+
+    def __init__(self, flow):
+        # question_id -> pertanyaan
+        self.questions = {}
+        # activity_id -> {question_id: pertanyaan}, urutan sesuai flow
+        self.activities = {}
+
+        for activity_id, step in flow.items():
+            raw_questions = step.get("questions") or ([step["question"]] if step.get("question") else [])
+            for raw in raw_questions:
+                question_id = raw["id"]
+                if question_id in self.questions:
+                    raise ValueError(f"Question id {question_id} dipakai lebih dari sekali di flow")
+                question = {
+                    "id": question_id,
+                    "activity_id": activity_id,
+                    "text": raw.get("text", ""),
+                    "type": raw.get("type", "essay"),
+                    "storage_key": raw.get("storage_key") or f"answer:{question_id}",
+                    "required": bool(raw.get("required")),
+                    "max_length": raw.get("max_length"),
+                    "allow_image_upload": bool(raw.get("allow_image_upload")),
+                }
+                question["requires_text"] = question["required"] and not question["allow_image_upload"]
+                self.questions[question_id] = question
+                self.activities.setdefault(activity_id, {})[question_id] = question
+
+    def __contains__(self, question_id):
+        return question_id in self.questions
+
+    def get(self, question_id, activity_id=None):
+        """Pertanyaan dengan id ini, atau None (juga jika bukan milik activity_id)"""
+        question = self.questions.get(question_id)
+        if question is None or (activity_id and question["activity_id"] != activity_id):
+            return None
+        return question
+
+    def for_activity(self, activity_id):
+        """Semua pertanyaan satu activity, per question_id"""
+        return self.activities.get(activity_id, {})
+
+    def clean_answer(self, question, text):
+        """
+        Normalisasi jawaban teks (strip) lalu validasi terhadap pertanyaan.
+        Dipakai submit satu jawaban dan submit batch agar yang disimpan sama.
+
+        Returns:
+            Tuple (teks yang sudah dinormalisasi, pesan error atau None)
+        """
+        text = str(text or "").strip()
+        if question["requires_text"] and not text:
+            return text, f"Jawaban untuk {question['id']} wajib diisi"
+        return text, self.validate_length(question, text)
+
+    def validate_length(self, question, text):
+        """Pesan error jika text melebihi max_length pertanyaan, selain itu None"""
+        max_length = question["max_length"]
+        if max_length is not None and len(text) > max_length:
+            return f"Jawaban untuk {question['id']} melebihi {max_length} karakter"
+        return None
@@ -0,0 +1,204 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+def session_channel(session_pk):
+    return f"session:{session_pk}"
+
+
+class Subscription:
+    """Antrean event milik satu koneksi WebSocket (hidup di event loop koneksi tersebut)"""
+
+    def __init__(self, broker, channel, maxsize):
+        self.broker = broker
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize)
+        self.dropped = 0
+
+    def deliver(self, event):
+        # Client lambat tidak boleh menahan publisher: event tertua dibuang
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+    async def get(self):
+        return await self.queue.get()
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class InProcessBroker:
+    """
+    Broker pub/sub di dalam satu proses.
+
+    publish() boleh dipanggil dari thread mana pun (writer antrean tulis,
+    thread graph chat, view sync); event diteruskan ke event loop tiap
+    subscriber lewat call_soon_threadsafe. Hanya cukup untuk satu proses
+    ASGI; dengan beberapa worker gunakan RedisBroker.
+    """
+
+    def __init__(self, queue_size=256):
+        self.queue_size = queue_size
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel):
+        subscription = Subscription(self, channel, self.queue_size)
+        with self._lock:
+            self._subscribers.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.channel)
+            if subscribers:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.channel]
+
+    def wants(self, channel):
+        """Apakah ada yang mendengarkan channel ini (publisher bisa melewati serialisasi)"""
+        return channel in self._subscribers
+
+    def publish(self, channel, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+            except RuntimeError:
+                # Event loop koneksi sudah ditutup
+                self.unsubscribe(subscription)
+
+
+class RedisBroker(InProcessBroker):
+    """
+    Broker pub/sub lewat Redis untuk beberapa worker/proses.
+
+    publish() dikirim ke Redis. Setiap worker berlangganan channel yang punya
+    subscriber lokal (thread listener) dan meneruskan event ke koneksi
+    WebSocket-nya lewat fan-out InProcessBroker. wants() memakai PUBSUB NUMSUB
+    yang di-cache sebentar, jadi publisher tetap bisa melewati serialisasi
+    untuk sesi yang tidak sedang dibuka.
+
+    Butuh paket `redis` dan settings.REALTIME["redis_url"].
+    """
+
+    def __init__(self, queue_size=256, url=None, wants_ttl=1.0, poll_interval=0.2):
+        import redis
+
+        super().__init__(queue_size=queue_size)
+        self.redis = redis.Redis.from_url(url or settings.REALTIME["redis_url"])
+        self.wants_ttl = wants_ttl
+        self.poll_interval = poll_interval
+        self._wants_cache = {}
+        self._listener = None
+        self._listener_lock = threading.Lock()
+
+    def subscribe(self, channel):
+        subscription = super().subscribe(channel)
+        self._ensure_listener()
+        return subscription
+
+    def wants(self, channel):
+        if super().wants(channel):
+            return True
+        now = time.monotonic()
+        cached = self._wants_cache.get(channel)
+        if cached and now - cached[1] < self.wants_ttl:
+            return cached[0]
+        try:
+            listeners = dict(self.redis.pubsub_numsub(channel)).get(channel.encode(), 0) > 0
+        except Exception as e:
+            logger.error(f"❌ Redis NUMSUB failed for {channel}: {e}")
+            listeners = False
+        self._wants_cache[channel] = (listeners, now)
+        return listeners
+
+    def publish(self, channel, event):
+        self.redis.publish(channel, json.dumps(event, cls=DjangoJSONEncoder))
+
+    def _ensure_listener(self):
+        with self._listener_lock:
+            if self._listener is None or not self._listener.is_alive():
+                self._listener = threading.Thread(target=self._listen, name="realtime-redis", daemon=True)
+                self._listener.start()
+
+    def _listen(self):
+        # Objek PubSub tidak thread-safe: subscribe/unsubscribe hanya dilakukan di thread ini
+        pubsub, subscribed = self.redis.pubsub(ignore_subscribe_messages=True), set()
+        while True:
+            try:
+                with self._lock:
+                    wanted = set(self._subscribers)
+                if wanted - subscribed:
+                    pubsub.subscribe(*(wanted - subscribed))
+                if subscribed - wanted:
+                    pubsub.unsubscribe(*(subscribed - wanted))
+                subscribed = wanted
+
+                message = pubsub.get_message(timeout=self.poll_interval)
+                if message and message["type"] == "message":
+                    channel = message["channel"].decode()
+                    InProcessBroker.publish(self, channel, json.loads(message["data"]))
+            except Exception as e:
+                logger.error(f"❌ Redis realtime listener error: {e}; reconnecting")
+                time.sleep(1)
+                pubsub.close()
+                pubsub, subscribed = self.redis.pubsub(ignore_subscribe_messages=True), set()
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                config = settings.REALTIME
+                _broker = import_string(config["broker"])(queue_size=config["queue_size"])
+    return _broker
+
+
+def publish_session_event(session_pk, event_type, data):
+    try:
+        get_broker().publish(session_channel(session_pk), {"type": event_type, "data": data})
+    except Exception as e:
+        logger.error(f"❌ Realtime publish failed for session {session_pk}: {e}")
+
+
+def session_has_listeners(session_pk):
+    return get_broker().wants(session_channel(session_pk))
+
+
+def publish_messages(messages):
+    """Kirim ChatMessage yang sudah tersimpan ke client yang terhubung ke sesinya"""
+    from api.serializers import ChatMessageSerializer
+
+    for message in messages:
+        if session_has_listeners(message.session_id):
+            publish_session_event(message.session_id, "message", ChatMessageSerializer(message).data)
+
+
+def publish_progress(progress):
+    if session_has_listeners(progress.session_id):
+        publish_session_event(progress.session_id, "progress", {
+            "activity_id": progress.activity_id,
+            "status": progress.status,
+            "completed_at": progress.completed_at.isoformat() if progress.completed_at else None,
+            "last_accessed": progress.last_accessed.isoformat() if progress.last_accessed else None,
+        })
@@ -0,0 +1,56 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+
+OVERVIEW_CACHE_PREFIX = "session-overview"
+
+
+def _cache_key(session_pk):
+    return f"{OVERVIEW_CACHE_PREFIX}:{session_pk}"
+
+
+def build_session_overview(session, activities):
+    """
+    Hitung jumlah pesan, jumlah jawaban dan status per activity untuk satu sesi.
+
+    Tiga query GROUP BY (pesan, jawaban, progress) pada index
+    (session, activity_id), berapa pun banyaknya activity. Hasil di-cache
+    per sesi dan dihapus oleh invalidate_session_overview saat ada tulisan baru.
+    """
+    from api.models import ActivityProgress, ChatMessage, UserAnswer
+
+    key = _cache_key(session.pk)
+    overview = cache.get(key)
+    if overview is not None:
+        return overview
+
+    messages = dict(
+        ChatMessage.objects.filter(session=session)
+        .values_list("activity_id")
+        .annotate(total=Count("id"))
+        .order_by()
+    )
+    answers = dict(
+        UserAnswer.objects.filter(session=session, is_submitted=True)
+        .values_list("activity_id")
+        .annotate(total=Count("id"))
+        .order_by()
+    )
+    statuses = dict(
+        ActivityProgress.objects.filter(session=session).values_list("activity_id", "status")
+    )
+
+    overview = {
+        activity: {
+            "messages_count": messages.get(activity, 0),
+            "answers_count": answers.get(activity, 0),
+            "status": statuses.get(activity, "not_started"),
+        }
+        for activity in activities
+    }
+    cache.set(key, overview, settings.SESSION_OVERVIEW_CACHE_TTL)
+    return overview
+
+
+def invalidate_session_overview(*session_pks):
+    cache.delete_many([_cache_key(pk) for pk in session_pks])
@@ -0,0 +1,241 @@
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .realtime import publish_messages
+from .session_overview import invalidate_session_overview
+
+logger = logging.getLogger(__name__)
+
+
+class ChatWriteQueue:
+    """
+    Antrean tulis in-process untuk ChatMessage dan update ChatSession.
+
+    View chat cukup memasukkan pesan ke antrean lalu langsung membalas;
+    thread writer menggabungkannya menjadi satu bulk_create (dan satu UPDATE
+    per sesi) ketika antrean mencapai batch_size atau setiap flush_interval
+    detik. Sisa antrean di-flush saat proses berhenti (atexit).
+
+    Pesan yang dikembalikan ke client (balasan bot) ditulis lewat
+    write_now(): id dan timestamp-nya nyata dan pesan itu (beserta antrean
+    sesinya) sudah commit sebelum respons dikirim, jadi worker lain langsung
+    bisa membacanya. Yang tetap di-batch hanya tulisan yang tidak dibaca balik
+    di respons yang sama.
+
+    Read-your-writes: view yang membaca ChatMessage memanggil
+    flush_session() dulu sehingga pesan yang masih antre ikut terbaca.
+    """
+
+    def __init__(self, batch_size=50, flush_interval=0.5, enabled=True):
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = float(flush_interval)
+        self.enabled = enabled
+
+        self._messages = []
+        # session pk -> field yang diupdate; hanya nilai terakhir yang ditulis
+        self._session_updates = OrderedDict()
+        self._cond = threading.Condition()
+        # Serialisasi flush agar urutan tulis sama dengan urutan antrean
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._stopping = False
+
+        self.stats = {"enqueued": 0, "flushed": 0, "batches": 0, "errors": 0}
+
+    # ----- API untuk views -----
+
+    def enqueue_message(self, message):
+        """
+        Antrekan ChatMessage yang belum disimpan.
+
+        Jika antrean dinonaktifkan, pesan langsung disimpan (perilaku lama).
+        """
+        if not self.enabled:
+            message.save()
+            return message
+
+        # timestamp akan diisi ulang oleh auto_now_add saat bulk_create;
+        # nilai ini hanya untuk respons API
+        message.timestamp = timezone.now()
+        self._ensure_started()
+        with self._cond:
+            self._messages.append(message)
+            self.stats["enqueued"] += 1
+            if len(self._messages) >= self.batch_size:
+                self._cond.notify()
+        return message
+
+    def enqueue_session_update(self, session, **fields):
+        """Antrekan update field ChatSession (misal current_step); updated_at ikut diperbarui"""
+        for name, value in fields.items():
+            setattr(session, name, value)
+
+        if not self.enabled:
+            # session bisa berupa instance parsial (hanya pk), jadi jangan save()
+            from api.models import ChatSession
+
+            ChatSession.objects.filter(pk=session.pk).update(updated_at=timezone.now(), **fields)
+            return
+
+        self._ensure_started()
+        with self._cond:
+            pending = self._session_updates.setdefault(session.pk, {})
+            pending.update(fields)
+
+    def write_now(self, message, **session_fields):
+        """
+        Simpan satu pesan sekarang, setelah tulisan yang masih antre untuk sesinya.
+
+        sequence_order pesan ini tetap setelah pesan yang lebih dulu diantrekan;
+        session_fields (misal current_step) ditulis dalam transaksi yang sama.
+        """
+        from api.models import ChatSession
+
+        self.flush_session(message.session_id)
+        with transaction.atomic():
+            message.save()
+            if session_fields:
+                for name, value in session_fields.items():
+                    setattr(message.session, name, value)
+                ChatSession.objects.filter(pk=message.session_id).update(updated_at=timezone.now(), **session_fields)
+        return message
+
+    def has_pending(self, session_pk):
+        with self._cond:
+            return session_pk in self._session_updates or any(
+                message.session_id == session_pk for message in self._messages
+            )
+
+    def flush_session(self, session_pk):
+        """Flush sinkron jika masih ada tulisan antre untuk sesi ini"""
+        if self.enabled and self.has_pending(session_pk):
+            self.flush()
+
+    def flush(self):
+        """Tulis semua isi antrean sekarang (dipanggil writer, read-your-writes dan atexit)"""
+        with self._flush_lock:
+            with self._cond:
+                messages, self._messages = self._messages, []
+                updates, self._session_updates = self._session_updates, OrderedDict()
+            if messages or updates:
+                self._write(messages, updates)
+
+    # ----- internal -----
+
+    def _write(self, messages, updates):
+        from api.models import ChatMessage, ChatSession
+
+        started = time.perf_counter()
+        try:
+            with transaction.atomic():
+                self._assign_sequence(messages)
+                ChatMessage.objects.bulk_create(messages)
+                now = timezone.now()
+                for session_pk, fields in updates.items():
+                    ChatSession.objects.filter(pk=session_pk).update(updated_at=now, **fields)
+        except Exception as e:
+            # Satu baris rusak (misal sesi sudah dihapus) jangan menggagalkan satu batch penuh
+            logger.error(f"❌ Batch write failed ({len(messages)} messages): {e}; retrying one by one")
+            # Counter ikut di-rollback, jadi nomor urut dibagikan ulang saat save()
+            for message in messages:
+                message.sequence_order = 0
+            self._write_one_by_one(messages, updates)
+        else:
+            invalidate_session_overview(*{m.session_id for m in messages}, *updates)
+            # bulk_create tidak memicu post_save, jadi push realtime dikirim di sini;
+            # on_commit agar client tidak menerima pesan yang belum bisa dibaca
+            transaction.on_commit(lambda: publish_messages(messages))
+            self.stats["flushed"] += len(messages)
+            self.stats["batches"] += 1
+            logger.debug(
+                f"💾 Flushed {len(messages)} messages, {len(updates)} sessions "
+                f"in {(time.perf_counter() - started) * 1000:.1f} ms"
+            )
+
+    def _assign_sequence(self, messages):
+        """Bagikan sequence_order per sesi: satu UPDATE counter per sesi dalam batch"""
+        from api.models import ChatSession
+
+        by_session = OrderedDict()
+        for message in messages:
+            if not message.sequence_order:
+                by_session.setdefault(message.session_id, []).append(message)
+        for session_pk, session_messages in by_session.items():
+            first = ChatSession.allocate_sequence(session_pk, len(session_messages))
+            for offset, message in enumerate(session_messages):
+                message.sequence_order = first + offset
+
+    def _write_one_by_one(self, messages, updates):
+        from api.models import ChatSession
+
+        for message in messages:
+            try:
+                message.save()
+                self.stats["flushed"] += 1
+            except Exception as e:
+                self.stats["errors"] += 1
+                logger.error(f"❌ Dropping chat message for session {message.session_id}: {e}")
+        now = timezone.now()
+        for session_pk, fields in updates.items():
+            try:
+                ChatSession.objects.filter(pk=session_pk).update(updated_at=now, **fields)
+            except Exception as e:
+                self.stats["errors"] += 1
+                logger.error(f"❌ Dropping session update for {session_pk}: {e}")
+        invalidate_session_overview(*{m.session_id for m in messages}, *updates)
+
+    def _ensure_started(self):
+        # Thread tidak ikut ter-fork ke worker gunicorn, jadi cek per PID
+        if self._pid == os.getpid() and self._thread and self._thread.is_alive():
+            return
+        with self._cond:
+            if self._pid == os.getpid() and self._thread and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="chat-write-queue", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                # Tunggu sampai batch penuh atau flush_interval habis supaya batch lebih besar
+                if len(self._messages) < self.batch_size and not self._stopping:
+                    self._cond.wait(self.flush_interval)
+                stopping = self._stopping
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"❌ Chat write queue flush error: {e}")
+            finally:
+                close_old_connections()
+            if stopping:
+                return
+
+    def shutdown(self):
+        """Flush terakhir secara durable sebelum proses keluar"""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"❌ Final chat write queue flush failed: {e}")
+
+
+_options = getattr(settings, "CHAT_WRITE_QUEUE", {})
+chat_write_queue = ChatWriteQueue(
+    batch_size=_options.get("batch_size", 50),
+    flush_interval=_options.get("flush_interval", 0.5),
+    enabled=_options.get("enabled", True),
+)
+atexit.register(chat_write_queue.shutdown)
@@ -1,15 +1,34 @@
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from django.contrib.auth.models import User
-from .models import Feedback, UserComicProgress, ChatSession, ChatMessage, UserAnswer, UserProgress, ActivityProgress
-from django.db import IntegrityError
+from .models import Feedback, UserComicProgress, ChatSession, ChatMessage, UserAnswer, UserProgress, ActivityProgress, ImageUpload
+from django.db import IntegrityError, close_old_connections, connections, transaction
+from django.db.models import F, Subquery
 from .serializers import UserSerializer, FeedbackSerializer, ChatMessageSerializer, UserAnswerSerializer
 from rest_framework_simplejwt.views import TokenVerifyView
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.decorators import permission_classes
-from django.http import JsonResponse
+from django.http import JsonResponse, HttpResponse
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
 from django.conf import settings
 from .utils.cloudinary_utils import get_optimized_resources
+from .utils.llm_backends import create_chat_model
+from .utils.flow_router import FlowKeywordRouter
+from .utils.question_registry import QuestionRegistry
+from .utils.intent_classifier import IntentClassifier, FaqIndex, mentions_topic, smalltalk_kind
+from .utils.answer_cache import lookup_cached_answer
+from .utils.write_queue import chat_write_queue
+from .utils.drafts import draft_buffer, is_stale
+from .utils.images import hash_upload, image_pipeline, stage_upload
+from .utils.ocr import cached_ocr_text
+from .throttling import check_llm_quota, quota_stats
+from .utils.checkpointer import DatabaseCheckpointSaver
+from .utils.chat_history import ChatHistoryCache, to_langchain_messages, message_pk
+from .utils.pagination import InvalidCursor, decode_sync_cursor, encode_sync_cursor, page_backward
+from .utils.session_overview import build_session_overview, invalidate_session_overview
+from .utils.realtime import publish_progress, publish_session_event, session_has_listeners
+from .utils.archive import restore_session
+from .utils.metrics import InstrumentedChatModel, InstrumentedRetriever, LANGGRAPH_THREADS, record_cache, render_metrics
 from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework_simplejwt.tokens import RefreshToken, TokenError
@@ -20,6 +39,12 @@ import sys
 import os
 import pandas as pd
 import json
+import threading
+import time
+import weakref
+from functools import wraps
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timezone as dt_timezone
 import google.generativeai as genai
 from langchain_community.vectorstores import Chroma
 from langchain_community.embeddings import HuggingFaceEmbeddings
@@ -31,13 +56,13 @@ import logging
 # ===== LANGGRAPH & LANGCHAIN IMPORTS =====
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langgraph.checkpoint.memory import MemorySaver
-from langgraph.graph import START, MessagesState, StateGraph
+from langgraph.graph import START, END, MessagesState, StateGraph
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
-from langchain_core.messages import trim_messages
+from langchain_core.messages import trim_messages, RemoveMessage
 from typing import Sequence, Annotated, TypedDict
 from langchain_core.messages import BaseMessage
-from langgraph.graph.message import add_messages
+from langgraph.graph.message import add_messages, REMOVE_ALL_MESSAGES
 
 # Setup logging
 logger = logging.getLogger(__name__)
@@ -50,6 +75,7 @@ load_dotenv(env_path)
 # Configuration untuk chatbot - PATH DIPERBAIKI
 CSV_PATH = os.path.join(BASE_DIR, "data/data.csv")
 PERSIST_DIR = os.path.join(BASE_DIR, "chroma_db")
+INTENT_MODEL_PATH = os.path.join(BASE_DIR, "data/intent_model.json")
 
 # PERBAIKAN: Debug environment variables
 print(f"=== DEBUG: Current directory: {os.getcwd()} ===")
@@ -75,15 +101,52 @@ else:
     print(f"=== DEBUG: Available API/KEY env vars: {all_env_vars} ===")
 
 MODEL_NAME = "gemini-2.0-flash-lite"  
+LLM_BACKEND = getattr(settings, "LLM_BACKEND", "gemini")
 CHUNK_SIZE = 800
 CHUNK_OVERLAP = 150
 TOP_K = 4
 
+# Jumlah giliran (pesan user + balasan bot) terakhir yang dikirim utuh ke model.
+# Giliran yang lebih lama dilipat ke dalam ringkasan berjalan di state thread.
+MAX_HISTORY_TURNS = int(os.getenv("CHAT_MAX_HISTORY_TURNS", "6"))
+
+# Ringkasan baru diperbarui setelah sebanyak ini pesan keluar dari jendela giliran
+# terbaru, lalu semuanya dilipat dalam satu panggilan LLM (bukan setiap giliran)
+SUMMARY_FOLD_MESSAGES = int(os.getenv("CHAT_SUMMARY_FOLD_MESSAGES", str(MAX_HISTORY_TURNS * 4)))
+
+# Histori chat dibaca dari ChatMessage; worker menyimpan jendela terbarunya di memori.
+# Jendela cukup untuk semua pesan yang belum diringkas (+ giliran yang sedang berjalan)
+chat_history = ChatHistoryCache(depth=MAX_HISTORY_TURNS * 2 + SUMMARY_FOLD_MESSAGES + 2)
+
+# Pesan dengan confidence intent di bawah ambang ini tetap dikirim ke LLM.
+# FAQ hanya dijawab lokal jika pertanyaannya hampir sama persis dengan entri CSV.
+INTENT_MIN_CONFIDENCE = float(os.getenv("INTENT_MIN_CONFIDENCE", "0.9"))
+FAQ_MIN_SIMILARITY = float(os.getenv("FAQ_MIN_SIMILARITY", "0.9"))
+
 # Global variables
 retriever = None
 gemini_model = None
 chatbot_app = None
 
+# Interval probe health di background (detik) dan batas tunggu request saat worker baru start
+HEALTH_PROBE_INTERVAL = int(os.getenv("HEALTH_PROBE_INTERVAL", "300"))
+# Probe LLM sungguhan memanggil Gemini dari setiap worker tiap interval (kuota & biaya);
+# default hanya cek model sudah terinisialisasi
+HEALTH_PROBE_LLM = os.getenv("HEALTH_PROBE_LLM", "False").lower() == "true"
+SYSTEM_READY_WAIT = float(os.getenv("SYSTEM_READY_WAIT", "10"))
+
+# Status sistem per worker: liveness, readiness dan hasil probe terakhir (di-cache)
+systems_ready = threading.Event()
+system_state = {
+    "pid": None,
+    "started_at": None,
+    "ready_at": None,
+    "systems": {},
+    "healthy": False,
+    "last_probe": None,
+}
+system_state_lock = threading.Lock()
+
 # Data struktur chatbot dari file JSON Anda
 CHATBOT_FLOW = {
     "intro": {
@@ -270,17 +333,113 @@ CHATBOT_FLOW = {
     }
 }
 
+# Router keyword navigasi (Aho-Corasick) yang dikompilasi sekali dari CHATBOT_FLOW
+flow_router = FlowKeywordRouter(CHATBOT_FLOW)
+
+# Registry pertanyaan (question_id -> activity, storage_key, type, max_length, ...) dari CHATBOT_FLOW
+question_registry = QuestionRegistry(CHATBOT_FLOW)
+
+# Balasan untuk smalltalk yang dijawab tanpa LLM
+SMALLTALK_REPLIES = {
+    "greeting": "Halo! 👋 Aku Aquano. Ada yang ingin kamu tanyakan tentang Kimia Hijau atau Tradisi Mapag Hujan?",
+    "thanks": "Sama-sama! 😊 Jangan ragu bertanya lagi kalau ada yang belum jelas ya.",
+    "yes": "Mantap! 👍 Kalau sudah siap, kita bisa lanjut ke kegiatan berikutnya.",
+    "no": "Tidak apa-apa 😊 Coba tuliskan bagian mana yang belum kamu pahami, nanti Aquano bantu jelaskan.",
+    "other": "Hehe 😄 Yuk kita kembali ke materi. Ada yang ingin kamu tanyakan tentang Kimia Hijau atau Mapag Hujan?",
+}
+
+# ===== INTENT CLASSIFIER LOKAL =====
+
+def load_intent_classifier():
+    """Load bobot classifier intent yang dilatih offline (data/intent_model.json)"""
+    try:
+        classifier = IntentClassifier.load(INTENT_MODEL_PATH)
+        logger.info(f"✅ Intent classifier loaded ({len(classifier.weights)} features)")
+        return classifier
+    except Exception as e:
+        logger.error(f"❌ Intent classifier not available: {e}")
+        return None
+
+def load_faq_index():
+    """Bangun indeks pertanyaan FAQ dari knowledge base CSV"""
+    try:
+        df = pd.read_csv(CSV_PATH, dtype=str).fillna("")
+        entries = [
+            {'id': row['id'], 'question': row['question'], 'answer': row['answer']}
+            for _, row in df.iterrows() if row.get('question') and row.get('answer')
+        ]
+        return FaqIndex(entries)
+    except Exception as e:
+        logger.error(f"❌ FAQ index not available: {e}")
+        return None
+
+intent_classifier = load_intent_classifier()
+faq_index = load_faq_index()
+
+def answer_locally(message_text, current_step=None):
+    """
+    Jawab pesan murah (smalltalk, FAQ, navigasi yang tidak dikenali router)
+    tanpa memanggil LLM.
+    
+    Returns:
+        Dict berisi intent, confidence dan answer, atau None jika pesan
+        harus diteruskan ke LLM.
+    """
+    if not intent_classifier:
+        return None
+    
+    intent, confidence = intent_classifier.predict(message_text)
+    
+    # FAQ dijawab dari CSV hanya jika pertanyaannya hampir sama persis dengan entri
+    # knowledge base ('apa itu biopori' != 'Apa itu biopori portabel?')
+    if faq_index:
+        entry, similarity = faq_index.lookup(message_text, min_similarity=FAQ_MIN_SIMILARITY)
+        if entry:
+            return {
+                'intent': 'faq',
+                'confidence': round(confidence if intent == 'faq' else similarity, 3),
+                'answer': entry['answer'],
+                'faq_id': entry['id'],
+                'similarity': round(similarity, 3),
+            }
+    
+    # Pesan yang menyebut materi ('prinsip 5', 'belum paham biopori') selalu ke LLM
+    if confidence < INTENT_MIN_CONFIDENCE or mentions_topic(message_text):
+        return None
+    
+    result = {'intent': intent, 'confidence': round(confidence, 3)}
+    
+    if intent == 'smalltalk':
+        result['answer'] = SMALLTALK_REPLIES[smalltalk_kind(message_text)]
+        return result
+    
+    if intent == 'navigation' and current_step in CHATBOT_FLOW:
+        keywords = CHATBOT_FLOW[current_step].get('next_keywords', [])
+        if keywords:
+            options = ", ".join(f"'{keyword}'" for keyword in keywords)
+            result['answer'] = f"Untuk melanjutkan, ketik salah satu pilihan berikut: {options} 😊"
+            return result
+    
+    return None
+
 # ===== INISIALISASI MODEL GEMINI =====
 
 def initialize_gemini_model():
     """Initialize Gemini model dengan error handling yang lebih baik"""
     try:
+        # Backend selain Gemini (misal "fake" untuk load test) tidak butuh API key
+        if LLM_BACKEND != "gemini":
+            model = create_chat_model(LLM_BACKEND)
+            logger.info(f"✅ LLM backend '{LLM_BACKEND}' initialized")
+            return InstrumentedChatModel(model)
+        
         if not API_KEY:
             logger.error("❌ API key tidak ditemukan di environment variables")
             logger.info("Pastikan GEMINI_API_KEY atau GOOGLE_API_KEY sudah di-set di .env file")
             return None
             
-        # Gunakan LangChain ChatGoogleGenerativeAI tanpa setting verbose global
+        # Gunakan LangChain ChatGoogleGenerativeAI tanpa setting verbose global.
+        # Tidak ada test call di sini; koneksi dicek oleh health prober di background.
         model = ChatGoogleGenerativeAI(
             model=MODEL_NAME,
             google_api_key=API_KEY,
@@ -288,19 +447,8 @@ def initialize_gemini_model():
             max_tokens=1000,
             timeout=30
         )
-        
-        # Test the model dengan prompt sederhana
-        try:
-            test_response = model.invoke("Hello, test connection")
-            if test_response and hasattr(test_response, 'content'):
-                logger.info("✅ Gemini model initialized dan tested successfully")
-                return model
-            else:
-                logger.error("❌ Gemini model test failed - no response content")
-                return None
-        except Exception as test_error:
-            logger.error(f"❌ Gemini model test failed: {test_error}")
-            return None
+        logger.info("✅ Gemini model initialized")
+        return InstrumentedChatModel(model)
             
     except Exception as e:
         logger.error(f"❌ Error initializing Gemini model: {e}")
@@ -308,11 +456,102 @@ def initialize_gemini_model():
 
 # ===== LANGGRAPH CHATBOT SYSTEM =====
 
+def create_checkpointer():
+    """Checkpointer LangGraph sesuai settings.LANGGRAPH_CHECKPOINTER ('db' atau 'memory')"""
+    options = dict(getattr(settings, "LANGGRAPH_CHECKPOINTER", {}))
+    if options.pop("backend", "db") == "memory":
+        return MemorySaver()
+    return DatabaseCheckpointSaver(**options)
+
+def count_threads_in_memory(checkpointer):
+    if isinstance(checkpointer, DatabaseCheckpointSaver):
+        return checkpointer.threads_in_memory
+    return len(checkpointer.storage)
+
+# Graph chat dijalankan di thread terpisah supaya view bisa membalas begitu node
+# generate selesai, sementara summarize + checkpoint menyusul di belakang.
+chat_graph_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("CHAT_GRAPH_WORKERS", "8")),
+    thread_name_prefix="chat-graph",
+)
+
+# Satu giliran graph per thread_id pada satu waktu (per proses): giliran baru
+# menunggu summarize + checkpoint giliran sebelumnya agar tidak saling menimpa
+_chat_turn_locks = weakref.WeakValueDictionary()
+_chat_turn_locks_guard = threading.Lock()
+
+def chat_turn_lock(thread_id):
+    with _chat_turn_locks_guard:
+        lock = _chat_turn_locks.get(thread_id)
+        if lock is None:
+            lock = threading.Lock()
+            _chat_turn_locks[thread_id] = lock
+        return lock
+
+def release_db_connections(node):
+    """Node graph yang memakai ORM: jangan biarkan thread executor memegang koneksi DB (CONN_MAX_AGE)"""
+    @wraps(node)
+    def wrapper(state):
+        close_old_connections()
+        try:
+            return node(state)
+        finally:
+            connections.close_all()
+    return wrapper
+
+def run_chat_turn(input_state, config, timeout=120):
+    """
+    Jalankan satu giliran graph chat dan kembalikan respons begitu tersedia.
+    
+    Balasan bot sudah disimpan di node generate (tepat setelah pesan user
+    giliran ini), jadi urutan sequence_order tetap benar walaupun
+    summarize + checkpoint belum selesai saat view membalas.
+    
+    Returns:
+        Update node generate (response, response_id, response_at), atau None
+        jika graph selesai tanpa respons
+    """
+    response_ready = Future()
+    turn_lock = chat_turn_lock(config["configurable"]["thread_id"])
+    
+    def run():
+        close_old_connections()
+        try:
+            with turn_lock:
+                for update in chatbot_app.stream(input_state, config, stream_mode="updates"):
+                    generated = update.get("generate")
+                    if generated is not None and not response_ready.done():
+                        response_ready.set_result(generated)
+            LANGGRAPH_THREADS.set(count_threads_in_memory(chatbot_app.checkpointer))
+        except Exception as e:
+            if response_ready.done():
+                logger.error(f"LangGraph error after response for {config['configurable']['thread_id']}: {e}")
+            else:
+                response_ready.set_exception(e)
+        finally:
+            if not response_ready.done():
+                response_ready.set_result(None)
+            connections.close_all()
+    
+    chat_graph_executor.submit(run)
+    return response_ready.result(timeout=timeout)
+
 class ChatState(TypedDict):
+    # Hanya terisi selama satu giliran; sumber histori adalah tabel chat_messages
     messages: Annotated[Sequence[BaseMessage], add_messages]
     session_id: str
+    session_pk: int
     user_id: str
     current_activity: str
+    question: str
+    context: str
+    response: str
+    # id dan timestamp ChatMessage balasan giliran ini (untuk respons API)
+    response_id: int
+    response_at: datetime
+    summary: str
+    # pk ChatMessage terakhir yang sudah dilipat ke ringkasan
+    summarized_upto: int
 
 def create_chatbot_graph():
     """Membuat LangGraph chatbot dengan memory persistence"""
@@ -341,91 +580,165 @@ def create_chatbot_graph():
                 - Fokus pada topik-topik utama di atas
                 - Bimbing siswa melalui proses pembelajaran yang interaktif
                 - Gunakan emoji sesekali untuk membuat percakapan lebih hidup
+                
+                RINGKASAN PERCAKAPAN SEBELUMNYA:
+                {summary}
                 """
             ),
             MessagesPlaceholder(variable_name="messages"),
         ])
         
-        # Define the function that calls the model dengan RAG integration
-        def call_model_with_rag(state: ChatState):
-            """Memanggil model dengan konteks dari RAG system"""
+        summary_prompt = """Anda merangkum percakapan antara siswa dan Aquano (asisten pembelajaran Ecombot).
+
+RINGKASAN SAAT INI:
+{summary}
+
+PERCAKAPAN LANJUTAN:
+{conversation}
+
+Perbarui ringkasan di atas dengan informasi penting dari percakapan lanjutan (topik yang dibahas, pertanyaan siswa, jawaban dan pemahaman siswa). Tulis dalam bahasa Indonesia, maksimal 8 kalimat. RINGKASAN BARU:"""
+        
+        def recent_window(messages):
+            """Ambil MAX_HISTORY_TURNS giliran terakhir, selalu diawali pesan user"""
+            return trim_messages(
+                messages,
+                max_tokens=MAX_HISTORY_TURNS * 2,
+                token_counter=len,
+                strategy="last",
+                start_on="human",
+            )
+        
+        def retrieve_context(state: ChatState):
+            """Ambil dokumen knowledge base untuk pertanyaan giliran ini (paralel dengan load_history)"""
+            if not retriever:
+                return {"context": ""}
             try:
-                # Dapatkan pertanyaan terakhir dari user
-                last_user_message = None
-                for msg in reversed(state["messages"]):
-                    if isinstance(msg, HumanMessage):
-                        last_user_message = msg.content
-                        break
-                
-                # Jika ada RAG system, dapatkan konteks relevan
-                context = ""
-                if retriever and last_user_message:
-                    try:
-                        docs = retriever.get_relevant_documents(last_user_message)
-                        context = "\n\n".join([d.page_content for d in docs[:2]])  # Ambil 2 dokumen teratas
-                        logger.info(f"RAG retrieved {len(docs)} documents for question")
-                    except Exception as e:
-                        logger.error(f"Error retrieving RAG documents: {e}")
-                        context = "Informasi dari database sedang tidak tersedia."
+                docs = retriever.get_relevant_documents(state["question"])
+                logger.info(f"RAG retrieved {len(docs)} documents for question")
+                return {"context": "\n\n".join([d.page_content for d in docs[:2]])}  # Ambil 2 dokumen teratas
+            except Exception as e:
+                logger.error(f"Error retrieving RAG documents: {e}")
+                return {"context": "Informasi dari database sedang tidak tersedia."}
+        
+        @release_db_connections
+        def load_history(state: ChatState):
+            """Bangun ulang histori thread dari ChatMessage (tanpa pesan yang sudah diringkas)"""
+            session_pk = state["session_pk"]
+            # Pesan user giliran ini masih di antrean tulis
+            chat_write_queue.flush_session(session_pk)
+            rows = chat_history.recent(session_pk, after_pk=state.get("summarized_upto") or 0)
+            return {"messages": to_langchain_messages(rows)}
+        
+        @release_db_connections
+        def generate_response(state: ChatState):
+            """Memanggil model dengan histori dan konteks RAG yang sudah disiapkan node sebelumnya"""
+            try:
+                history = list(recent_window(state["messages"]))
+                summary = state.get("summary") or "-"
+                question = state["question"]
+                context = state.get("context")
                 
-                # Siapkan prompt dengan konteks
+                # Pesan user terakhir diganti versi yang diperkaya konteks
+                if history and isinstance(history[-1], HumanMessage):
+                    history.pop()
                 if context:
-                    enhanced_prompt = f"""
+                    history.append(HumanMessage(content=f"""
 KONTEKS TAMBAHAN:
 {context}
 
 PERTANYAAN USER:
-{last_user_message}
+{question}
 
 JAWABAN (gunakan bahasa Indonesia yang jelas dan membantu):
-"""
-                    # Buat messages baru dengan konteks
-                    enhanced_messages = []
-                    for msg in state["messages"]:
-                        if isinstance(msg, HumanMessage) and msg.content == last_user_message:
-                            # Ganti pesan user dengan yang sudah diperkaya konteks
-                            enhanced_messages.append(HumanMessage(content=enhanced_prompt))
-                        else:
-                            enhanced_messages.append(msg)
-                    
-                    prompt = prompt_template.invoke({"messages": enhanced_messages})
+"""))
                 else:
-                    prompt = prompt_template.invoke(state)
+                    history.append(HumanMessage(content=question))
                 
-                # Panggil model
-                response = gemini_model.invoke(prompt)
-                
-                # Simpan interaksi ke database untuk analytics
-                try:
-                    session = ChatSession.objects.get(session_id=state["session_id"])
-                    ChatMessage.objects.create(
-                        session=session,
-                        message_type='bot',
-                        character='Aquano',
-                        message_text=response.content,
-                        step_id=state.get("current_activity", "general"),
-                        activity_id=state.get("current_activity", "general")
-                    )
-                except Exception as db_error:
-                    logger.error(f"Error saving chat message to DB: {db_error}")
+                prompt = prompt_template.invoke({"messages": history, "summary": summary})
                 
-                return {"messages": [response]}
+                # Ada client WebSocket di sesi ini -> stream token ke sana
+                if session_has_listeners(state["session_pk"]):
+                    content = ""
+                    for chunk in gemini_model.stream(prompt):
+                        content += chunk.content
+                        publish_session_event(state["session_pk"], "token", {"delta": chunk.content})
+                else:
+                    content = gemini_model.invoke(prompt).content
                 
             except Exception as e:
-                logger.error(f"Error in call_model_with_rag: {e}")
+                logger.error(f"Error in generate_response: {e}")
                 # Fallback response
-                fallback_response = AIMessage(
-                    content="Maaf, saya mengalami gangguan teknis. Silakan coba lagi atau hubungi administrator."
-                )
-                return {"messages": [fallback_response]}
-        
-        # Add nodes and edges
-        workflow.add_node("model", call_model_with_rag)
-        workflow.add_edge(START, "model")
+                content = "Maaf, saya mengalami gangguan teknis. Silakan coba lagi atau hubungi administrator."
+            
+            # Simpan balasan sebelum view membalas, supaya id-nya nyata dan nomor urutnya tepat setelah pesan user
+            message = persist_response(state, content)
+            return {"response": content, "response_id": message.id, "response_at": message.timestamp}
+        
+        def persist_response(state, content):
+            """Simpan balasan bot sekarang (bukan di-batch): id dan timestamp-nya dikembalikan ke client"""
+            session = ChatSession(pk=state["session_pk"], session_id=state["session_id"])
+            return chat_write_queue.write_now(ChatMessage(
+                session=session,
+                message_type='bot',
+                character='Aquano',
+                message_text=content,
+                step_id=state["current_activity"],
+                activity_id=state["current_activity"]
+            ), current_step=state["current_activity"])
+        
+        def summarize_history(state: ChatState):
+            """
+            Lipat pesan di luar jendela giliran terbaru ke ringkasan berjalan.
+            
+            Ringkasan hanya diperbarui setelah SUMMARY_FOLD_MESSAGES pesan keluar
+            dari jendela, supaya tidak ada panggilan LLM tambahan di setiap giliran;
+            sampai saat itu pesan tersebut tetap dibaca ulang oleh load_history.
+            
+            Pesan selalu dikosongkan dari state di akhir giliran supaya checkpoint
+            hanya berisi ringkasan, bukan salinan kedua dari chat_messages.
+            """
+            clear = {"messages": [RemoveMessage(id=REMOVE_ALL_MESSAGES)]}
+            kept_ids = {msg.id for msg in recent_window(state["messages"])}
+            older = [msg for msg in state["messages"] if msg.id not in kept_ids]
+            if len(older) < max(1, SUMMARY_FOLD_MESSAGES):
+                return clear
+            
+            conversation = "\n".join(
+                f"{'Siswa' if isinstance(msg, HumanMessage) else 'Aquano'}: {msg.content}"
+                for msg in older
+            )
+            try:
+                response = gemini_model.invoke(summary_prompt.format(
+                    summary=state.get("summary") or "-",
+                    conversation=conversation,
+                ))
+                new_summary = response.content.strip()
+            except Exception as e:
+                # summarized_upto tidak maju, jadi pesan lama dicoba lagi di giliran berikutnya
+                logger.error(f"Error summarizing chat history: {e}")
+                return clear
+            
+            logger.info(f"Folded {len(older)} old messages into summary for {state['session_id']}")
+            return {
+                **clear,
+                "summary": new_summary,
+                "summarized_upto": max(message_pk(msg) for msg in older),
+            }
         
-        # Add memory persistence
-        memory = MemorySaver()
-        app = workflow.compile(checkpointer=memory)
+        # Retrieval dan pembacaan histori tidak saling bergantung -> jalan paralel.
+        # Peringkasan setelah generate tidak ditunggu oleh view (lihat run_chat_turn).
+        workflow.add_node("retrieve", retrieve_context)
+        workflow.add_node("load_history", load_history)
+        workflow.add_node("generate", generate_response)
+        workflow.add_node("summarize", summarize_history)
+        workflow.add_edge(START, "retrieve")
+        workflow.add_edge(START, "load_history")
+        workflow.add_edge(["retrieve", "load_history"], "generate")
+        workflow.add_edge("generate", "summarize")
+        workflow.add_edge("summarize", END)
+        
+        # State percakapan disimpan di DB agar dibagi semua worker dan tahan restart
+        app = workflow.compile(checkpointer=create_checkpointer())
         
         logger.info("✅ LangGraph chatbot system initialized successfully")
         return app
@@ -653,6 +966,8 @@ def initialize_all_systems():
     # Initialize RAG System
     try:
         retriever = initialize_rag_system()
+        if retriever:
+            retriever = InstrumentedRetriever(retriever)
         status_report["rag_system"] = "✅ Ready" if retriever else "❌ Failed"
         logger.info(f"RAG System: {status_report['rag_system']}")
     except Exception as e:
@@ -677,11 +992,79 @@ def initialize_all_systems():
     logger.info(f"System Status: {status_report}")
     return status_report
 
-# Panggil initialization dengan error handling
-try:
-    initialize_all_systems()
-except Exception as e:
-    logger.error(f"Failed to initialize systems: {e}")
+# ===== STARTUP NON-BLOCKING & HEALTH PROBE =====
+
+def probe_systems():
+    """Cek semua sistem sekali dan simpan hasilnya ke cache status"""
+    gemini_test = False
+    if gemini_model and HEALTH_PROBE_LLM:
+        try:
+            test_response = gemini_model.invoke("Test")
+            gemini_test = bool(test_response and hasattr(test_response, 'content'))
+        except Exception as e:
+            logger.error(f"Health probe Gemini failed: {e}")
+    elif gemini_model:
+        gemini_test = True
+    
+    rag_test = False
+    if retriever:
+        try:
+            rag_test = len(retriever.get_relevant_documents("test")) > 0
+        except Exception as e:
+            logger.error(f"Health probe RAG failed: {e}")
+    
+    langgraph_test = bool(chatbot_app)
+    
+    with system_state_lock:
+        system_state["systems"] = {
+            "rag_system": "✅ Ready" if rag_test else "❌ Failed",
+            "langgraph_chatbot": "✅ Ready" if langgraph_test else "❌ Failed",
+            "gemini_model": "✅ Ready" if gemini_test else "❌ Failed"
+        }
+        system_state["healthy"] = all([gemini_test, rag_test, langgraph_test])
+        system_state["last_probe"] = timezone.now().isoformat()
+
+def _background_startup():
+    """Inisialisasi sistem lalu jalankan probe health secara periodik"""
+    try:
+        initialize_all_systems()
+    except Exception as e:
+        logger.error(f"Failed to initialize systems: {e}")
+    finally:
+        with system_state_lock:
+            system_state["ready_at"] = timezone.now().isoformat()
+        systems_ready.set()
+    
+    while True:
+        try:
+            probe_systems()
+        except Exception as e:
+            logger.error(f"Health probe error: {e}")
+        time.sleep(HEALTH_PROBE_INTERVAL)
+
+def start_background_initialization():
+    """
+    Mulai inisialisasi Gemini, RAG dan LangGraph di thread background.
+    
+    Dipanggil dari backend/wsgi.py dan backend/asgi.py setelah aplikasi
+    dibuat, sehingga worker langsung bisa melayani request (liveness)
+    sementara sistem chatbot disiapkan (readiness).
+    """
+    with system_state_lock:
+        # Aman dipanggil berkali-kali; ulangi hanya di proses hasil fork (gunicorn --preload)
+        if system_state["pid"] == os.getpid():
+            return
+        system_state["pid"] = os.getpid()
+        system_state["started_at"] = timezone.now().isoformat()
+        system_state["ready_at"] = None
+    
+    systems_ready.clear()
+    threading.Thread(target=_background_startup, name="systems-startup", daemon=True).start()
+
+def wait_for_systems():
+    """Tunggu sebentar jika request datang sebelum inisialisasi selesai"""
+    start_background_initialization()
+    return systems_ready.wait(timeout=SYSTEM_READY_WAIT)
 
 # ===== VIEWS UTAMA =====
 
@@ -898,6 +1281,11 @@ class LogoutView(APIView):
 
 # ===== CHATBOT VIEWS DENGAN LANGGRAPH =====
 
+def reopen_archived_session(session):
+    """Sesi paused/completed mungkin sudah diarsipkan; pulihkan pesannya sebelum dibaca/ditulis"""
+    if session.status != 'active':
+        restore_session(session)
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def start_chat_session(request):
@@ -916,10 +1304,12 @@ def start_chat_session(request):
             }
         )
         
-        # Jika session baru, inisialisasi di LangGraph
-        if created and chatbot_app:
-            config = {"configurable": {"thread_id": session_id}}
-            
+        if not created:
+            reopen_archived_session(session)
+        
+        # Pesan pembuka dan progress tidak butuh LLM, jadi tidak menunggu
+        # inisialisasi background (thread LangGraph dibuat saat pesan pertama)
+        if created:
             # Buat pesan pembuka
             opening_message = "Halo! 👋 Saya Aquano, asisten pembelajaran Ecombot. Saya siap membantu Anda menjelajahi dunia Kimia Hijau dan Tradisi Mapag Hujan. Ada yang bisa saya bantu hari ini?"
             
@@ -986,18 +1376,15 @@ JAWABAN (gunakan bahasa Indonesia yang jelas dan membantu):
         else:
             bot_response = "Maaf, sistem sedang dalam perbaikan. Silakan coba lagi nanti."
         
-        # Simpan ke database
-        bot_message = ChatMessage.objects.create(
+        # Simpan sekarang: id dan timestamp dikembalikan ke client
+        bot_message = chat_write_queue.write_now(ChatMessage(
             session=session,
             message_type='bot',
             character='Aquano',
             message_text=bot_response,
             step_id=activity_id,
             activity_id=activity_id
-        )
-        
-        session.current_step = activity_id
-        session.save()
+        ), current_step=activity_id)
         
         return Response({
             'status': 'success',
@@ -1014,6 +1401,76 @@ JAWABAN (gunakan bahasa Indonesia yang jelas dan membantu):
             'message': 'Gagal memproses pesan'
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+def send_flow_step(session, route):
+    """Balas pesan navigasi dengan konten step tujuan langsung dari CHATBOT_FLOW"""
+    try:
+        target_step = route['target_step']
+        step_info = {
+            'id': target_step,
+            'mode': route['mode'],
+            'title': route['title'],
+            'image_url': route['image_url'],
+            'questions': route['questions'],
+            'next_keywords': route['next_keywords'],
+        }
+        
+        bot_message = chat_write_queue.write_now(ChatMessage(
+            session=session,
+            message_type='bot',
+            character=route['character'],
+            message_text=route['content'],
+            step_id=target_step,
+            activity_id=target_step,
+            message_data={'routed_by': 'flow_keyword', 'keyword': route['keyword'], **step_info}
+        ), current_step=target_step)
+        
+        return Response({
+            'status': 'success',
+            'message_id': bot_message.id,
+            'timestamp': bot_message.timestamp,
+            'response': route['content'],
+            'session_id': session.session_id,
+            'routed': 'flow',
+            'step': step_info
+        })
+        
+    except Exception as e:
+        logger.error(f"Error in flow routing: {e}")
+        return Response({
+            'status': 'error',
+            'message': 'Gagal memproses pesan'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+def send_local_answer(session, activity_id, local):
+    """Balas pesan yang sudah dijawab classifier intent lokal"""
+    try:
+        bot_message = chat_write_queue.write_now(ChatMessage(
+            session=session,
+            message_type='bot',
+            character='Aquano',
+            message_text=local['answer'],
+            step_id=activity_id,
+            activity_id=activity_id,
+            message_data={'routed_by': 'intent', **{k: v for k, v in local.items() if k != 'answer'}}
+        ), current_step=activity_id)
+        
+        return Response({
+            'status': 'success',
+            'message_id': bot_message.id,
+            'timestamp': bot_message.timestamp,
+            'response': local['answer'],
+            'session_id': session.session_id,
+            'routed': 'intent',
+            'intent': local['intent']
+        })
+        
+    except Exception as e:
+        logger.error(f"Error sending local answer: {e}")
+        return Response({
+            'status': 'error',
+            'message': 'Gagal memproses pesan'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def send_chat_message(request):
@@ -1037,60 +1494,67 @@ def send_chat_message(request):
                 'status': 'error',
                 'message': 'Sesi tidak ditemukan'
             }, status=status.HTTP_404_NOT_FOUND)
-        
-        # Simpan pesan user ke database
-        user_message = ChatMessage.objects.create(
+        reopen_archived_session(session)
+        
+        # Pesan navigasi ('siap', 'mulai kegiatan 2', ...) dijawab lokal tanpa retrieval/LLM
+        current_step = activity_id if activity_id in CHATBOT_FLOW else session.current_step
+        route = flow_router.match(message_text, current_step)
+        record_cache("flow_router", route is not None)
+        
+        # Smalltalk dan FAQ juga dijawab lokal; hanya pertanyaan terbuka yang sampai ke LLM
+        local = None
+        if not route:
+            local = answer_locally(message_text, current_step)
+            record_cache("local_answer", local is not None)
+        
+        # Kuota LLM hanya dipotong untuk pesan yang benar-benar ke LLM;
+        # pesan yang ditolak tidak disimpan
+        if not route and not local:
+            throttled = check_llm_quota(request)
+            if throttled:
+                return throttled
+        
+        # Simpan pesan user ke database (di-batch oleh writer background)
+        chat_write_queue.enqueue_message(ChatMessage(
             session=session,
             message_type='user',
             character='User',
             message_text=message_text,
             step_id=activity_id,
             activity_id=activity_id
-        )
+        ))
+        
+        if route:
+            return send_flow_step(session, route)
+        if local:
+            return send_local_answer(session, activity_id, local)
+        
+        wait_for_systems()
         
         # Process dengan LangGraph jika tersedia
         if chatbot_app:
             try:
                 config = {"configurable": {"thread_id": session_id}}
                 
-                # Prepare state untuk LangGraph
+                # Prepare state untuk LangGraph; histori (termasuk pesan ini) dibaca dari ChatMessage
                 input_state = {
-                    "messages": [HumanMessage(content=message_text)],
                     "session_id": session_id,
+                    "session_pk": session.pk,
                     "user_id": str(request.user.id),
-                    "current_activity": activity_id
+                    "current_activity": activity_id,
+                    "question": message_text
                 }
                 
-                # Invoke LangGraph
-                output = chatbot_app.invoke(input_state, config)
+                # Respons dikembalikan setelah node generate (balasan bot sudah tersimpan);
+                # summarize + checkpoint masih berjalan di background
+                generated = run_chat_turn(input_state, config)
                 
-                # Dapatkan respons terakhir
-                bot_response = None
-                for msg in reversed(output["messages"]):
-                    if isinstance(msg, AIMessage):
-                        bot_response = msg.content
-                        break
-                
-                if bot_response:
-                    # Simpan respons bot ke database
-                    bot_message = ChatMessage.objects.create(
-                        session=session,
-                        message_type='bot',
-                        character='Aquano',
-                        message_text=bot_response,
-                        step_id=activity_id,
-                        activity_id=activity_id
-                    )
-                    
-                    # Update session
-                    session.current_step = activity_id
-                    session.save()
-                    
+                if generated and generated.get("response"):
                     return Response({
                         'status': 'success',
-                        'message_id': bot_message.id,
-                        'timestamp': bot_message.timestamp,
-                        'response': bot_response,
+                        'message_id': generated.get("response_id"),
+                        'timestamp': generated.get("response_at"),
+                        'response': generated["response"],
                         'session_id': session_id
                     })
                     
@@ -1109,53 +1573,48 @@ def send_chat_message(request):
             'message': 'Gagal mengirim pesan'
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-@api_view(['POST'])
-@permission_classes([AllowAny])
-def ask_question(request):
-    """Handle question asking dengan RAG system atau fallback"""
-    try:
-        question = request.data.get('question', '').strip()
-        
-        if not question:
-            return Response(
-                {"answer": "Silakan ajukan pertanyaan yang lebih spesifik."}, 
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        logger.info(f"🔍 Processing question: '{question}'")
-        
-        # Get relevant documents from RAG system atau fallback
-        context = ""
-        relevant_docs = []
-        rag_status = "fallback"
-        
-        if retriever:
-            try:
-                docs = retriever.get_relevant_documents(question)
-                logger.info(f"📄 Retrieved {len(docs)} documents for question: '{question}'")
-                
-                # LOG DETAIL SETIAP DOKUMEN YANG DITEMUKAN
-                for i, doc in enumerate(docs):
-                    logger.info(f"   📝 Doc {i+1} Content: {doc.page_content}")
-                    logger.info(f"   🏷️  Doc {i+1} Metadata: {doc.metadata}")
-                    logger.info("   " + "-" * 50)
-                
-                context = "\n\n".join([f"Dokumen {i+1}:\n{d.page_content}" for i, d in enumerate(docs)])
-                relevant_docs = docs
-                rag_status = "active" if docs else "no_docs"
-                
-            except Exception as e:
-                logger.error(f"❌ Error retrieving documents: {e}")
-                context = "Sistem pencarian informasi sedang dalam perbaikan."
-                rag_status = "error"
-        else:
-            logger.warning("RAG system not available, using direct Gemini")
+def build_ask_prompt(question):
+    """
+    Retrieval + susun prompt untuk /api/ask/.
+    
+    Dipakai juga oleh command precompute_answers agar jawaban yang di-cache
+    identik dengan jawaban jalur online.
+    
+    Returns:
+        Tuple (full_prompt, relevant_docs, rag_status)
+    """
+    # Get relevant documents from RAG system atau fallback
+    context = ""
+    relevant_docs = []
+    rag_status = "fallback"
+    
+    if retriever:
+        try:
+            docs = retriever.get_relevant_documents(question)
+            logger.info(f"📄 Retrieved {len(docs)} documents for question: '{question}'")
+            
+            # LOG DETAIL SETIAP DOKUMEN YANG DITEMUKAN
+            for i, doc in enumerate(docs):
+                logger.info(f"   📝 Doc {i+1} Content: {doc.page_content}")
+                logger.info(f"   🏷️  Doc {i+1} Metadata: {doc.metadata}")
+                logger.info("   " + "-" * 50)
+            
+            context = "\n\n".join([f"Dokumen {i+1}:\n{d.page_content}" for i, d in enumerate(docs)])
+            relevant_docs = docs
+            rag_status = "active" if docs else "no_docs"
+            
+        except Exception as e:
+            logger.error(f"❌ Error retrieving documents: {e}")
             context = "Sistem pencarian informasi sedang dalam perbaikan."
-            rag_status = "not_available"
-        
-        # Prepare prompt dengan konteks yang lebih jelas
-        if context and rag_status == "active":
-            full_prompt = f"""
+            rag_status = "error"
+    else:
+        logger.warning("RAG system not available, using direct Gemini")
+        context = "Sistem pencarian informasi sedang dalam perbaikan."
+        rag_status = "not_available"
+    
+    # Prepare prompt dengan konteks yang lebih jelas
+    if context and rag_status == "active":
+        full_prompt = f"""
 INFORMASI KONTEKS YANG DITEMUKAN:
 {context}
 
@@ -1170,13 +1629,61 @@ INSTRUKSI:
 
 JAWABAN:
 """
-        else:
-            full_prompt = f"""
+    else:
+        full_prompt = f"""
 PERTANYAAN USER:
 {question}
 
 JAWABAN (gunakan bahasa Indonesia yang jelas dan informatif. Jika tidak tahu jawabannya, jelaskan bahwa informasi tidak tersedia):
 """
+    
+    return full_prompt, relevant_docs, rag_status
+
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def ask_question(request):
+    """Handle question asking dengan RAG system atau fallback"""
+    try:
+        question = request.data.get('question', '').strip()
+        
+        if not question:
+            return Response(
+                {"answer": "Silakan ajukan pertanyaan yang lebih spesifik."}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        logger.info(f"🔍 Processing question: '{question}'")
+        
+        # Smalltalk dan FAQ dijawab lokal tanpa retrieval/LLM
+        local = answer_locally(question)
+        record_cache("local_answer", local is not None)
+        if local:
+            logger.info(f"⚡ Answered locally as {local['intent']} ({local['confidence']})")
+            return Response({
+                "answer": local['answer'],
+                "sources_count": 1 if local['intent'] == 'faq' else 0,
+                "rag_system": "local",
+                "intent": local['intent']
+            })
+        
+        # Jawaban hasil precompute_answers (knowledge base + parafrase)
+        cached = lookup_cached_answer(question)
+        record_cache("answer_cache", cached is not None)
+        if cached:
+            logger.info(f"⚡ Answered from answer cache (source {cached.source_id})")
+            return Response({
+                "answer": cached.answer,
+                "sources_count": 1,
+                "rag_system": "cached"
+            })
+        
+        throttled = check_llm_quota(request)
+        if throttled:
+            return throttled
+        
+        wait_for_systems()
+        
+        full_prompt, relevant_docs, rag_status = build_ask_prompt(question)
         
         # Get answer from Gemini
         answer = "Maaf, sistem AI sedang tidak tersedia. Silakan coba lagi nanti."
@@ -1207,21 +1714,163 @@ JAWABAN (gunakan bahasa Indonesia yang jelas dan informatif. Jika tidak tahu jaw
         )
         
         
+def lock_user_progress(user, session, activity_id):
+    """Ambil (atau buat) UserProgress sesi dengan SELECT ... FOR UPDATE; panggil di dalam transaksi"""
+    user_progress, _ = UserProgress.objects.select_for_update().get_or_create(
+        user=user,
+        session=session,
+        defaults={'current_kegiatan': activity_id}
+    )
+    return user_progress
+
+def mark_activity_completed(session, activity_id, now):
+    """
+    Upsert ActivityProgress menjadi 'completed'. Pemanggil membaca status lama
+    lebih dulu (setelah lock_user_progress) untuk menentukan counter progress.
+    """
+    progress = ActivityProgress(session=session, activity_id=activity_id, status='completed', completed_at=now)
+    ActivityProgress.objects.bulk_create(
+        [progress],
+        update_conflicts=True,
+        unique_fields=['session', 'activity_id'],
+        update_fields=['status', 'completed_at', 'last_accessed']
+    )
+    # bulk_create tidak memicu post_save
+    transaction.on_commit(lambda: publish_progress(progress))
+
+ANSWER_UPDATE_FIELDS = [
+    'answer_text', 'answer_type', 'question_text', 'step_id',
+    'activity_id', 'is_submitted', 'submitted_at', 'updated_at',
+    # Draft dikosongkan saat submit
+    'draft_text', 'draft_updated_at'
+]
+
+def save_submitted_answers(user, session, activity_id, answers, now):
+    """
+    Upsert jawaban yang di-submit untuk satu activity dalam satu transaksi.
+    
+    Baris UserProgress sesi dikunci dulu, sehingga submit paralel untuk sesi
+    yang sama diproses bergiliran. Setelah lock, status lama jawaban dan
+    status activity dibaca dalam satu SELECT, jawaban di-upsert, lalu counter
+    progress dinaikkan dengan satu UPDATE F(). ActivityProgress hanya ditulis
+    saat activity baru selesai.
+    
+    Returns:
+        Tuple ({question_id: 'created'/'updated'}, dict progress untuk respons)
+    """
+    question_ids = [answer.question_id for answer in answers]
+    # Draft yang belum di-flush tidak boleh muncul lagi setelah submit
+    draft_buffer.discard(session.pk, question_ids)
+    with transaction.atomic():
+        user_progress = lock_user_progress(user, session, activity_id)
+        
+        activity_status = ActivityProgress.objects.filter(
+            session=session,
+            activity_id=activity_id
+        ).values('status')[:1]
+        previous = {
+            question_id: (pk, is_submitted, status)
+            for question_id, pk, is_submitted, status in UserAnswer.objects.filter(
+                session=session,
+                question_id__in=question_ids
+            ).annotate(activity_status=Subquery(activity_status)).values_list(
+                'question_id', 'pk', 'is_submitted', 'activity_status'
+            )
+        }
+        if previous:
+            previous_status = next(iter(previous.values()))[2]
+        else:
+            # Submit pertama untuk pertanyaan-pertanyaan ini
+            previous_status = activity_status.values_list('status', flat=True).first()
+        
+        UserAnswer.objects.bulk_create(
+            answers,
+            update_conflicts=True,
+            unique_fields=['session', 'question_id'],
+            update_fields=ANSWER_UPDATE_FIELDS
+        )
+        # Upsert di MySQL tidak mengembalikan pk: baris lama pk-nya sudah diketahui,
+        # baris baru dibaca ulang
+        for answer in answers:
+            if answer.pk is None and answer.question_id in previous:
+                answer.pk = previous[answer.question_id][0]
+        missing = [answer for answer in answers if answer.pk is None]
+        if missing:
+            ids = dict(UserAnswer.objects.filter(
+                session=session,
+                question_id__in=[answer.question_id for answer in missing]
+            ).values_list('question_id', 'pk'))
+            for answer in missing:
+                answer.pk = ids.get(answer.question_id)
+        
+        newly_completed = previous_status != 'completed'
+        if newly_completed:
+            mark_activity_completed(session, activity_id, now)
+        
+        # Counter denormalisasi: tidak perlu COUNT(*) ulang setiap submit
+        answer_delta = sum(1 for question_id in question_ids if not previous.get(question_id, (None, False))[1])
+        UserProgress.objects.filter(pk=user_progress.pk).update(
+            current_kegiatan=activity_id,
+            total_answers=F('total_answers') + answer_delta,
+            completed_activities=F('completed_activities') + int(newly_completed),
+            updated_at=now
+        )
+    invalidate_session_overview(session.pk)
+    
+    actions = {
+        question_id: 'created' if question_id not in previous else 'updated'
+        for question_id in question_ids
+    }
+    return actions, {
+        'total_answers': user_progress.total_answers + answer_delta,
+        'current_activity': activity_id,
+        'completed_activities_count': user_progress.completed_activities + int(newly_completed)
+    }
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def submit_activity_answer(request):
-    """Menyimpan jawaban user untuk activity tertentu"""
+    """
+    Menyimpan jawaban user untuk satu pertanyaan.
+    
+    Body: {"session_id", "question_id", "answer_text"} (activity_id opsional).
+    Activity, storage_key, teks dan tipe pertanyaan diambil dari question_registry,
+    bukan dari client.
+    """
     try:
         session_id = request.data.get('session_id')
-        activity_id = request.data.get('activity_id')
-        question_data = request.data.get('question_data', {})
-        answer_text = request.data.get('answer_text', '')
-        answer_type = request.data.get('answer_type', 'essay')
+        question_id = request.data.get('question_id')
         
-        if not all([session_id, activity_id]):
-            return Response({
+        # Kompatibilitas client lama yang mengirim question_data; hanya id-nya yang dipakai
+        if not question_id:
+            question_data = request.data.get('question_data') or {}
+            if isinstance(question_data, str):
+                try:
+                    question_data = json.loads(question_data)
+                except ValueError:
+                    question_data = {}
+            if isinstance(question_data, dict):
+                question_id = question_data.get('id')
+        
+        if not all([session_id, question_id]):
+            return Response({
                 'status': 'error',
-                'message': 'Session ID dan Activity ID diperlukan'
+                'message': 'Session ID dan Question ID diperlukan'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        question = question_registry.get(question_id, request.data.get('activity_id'))
+        if question is None:
+            return Response({
+                'status': 'error',
+                'message': f'Pertanyaan {question_id} tidak dikenal untuk activity ini'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        activity_id = question['activity_id']
+        answer_text, answer_error = question_registry.clean_answer(question, request.data.get('answer_text'))
+        if answer_error:
+            return Response({
+                'status': 'error',
+                'message': answer_error
             }, status=status.HTTP_400_BAD_REQUEST)
         
         # Dapatkan session
@@ -1233,82 +1882,21 @@ def submit_activity_answer(request):
                 'message': 'Sesi tidak ditemukan'
             }, status=status.HTTP_404_NOT_FOUND)
         
-        # Extract question data
-        if isinstance(question_data, str):
-            try:
-                question_data = json.loads(question_data)
-            except:
-                question_data = {}
-        
-        question_id = question_data.get('id') or f"question_{int(timezone.now().timestamp())}"
-        storage_key = question_data.get('storage_key') or f"storage_{question_id}"
-        question_text = question_data.get('text') or question_data.get('question_text') or 'Pertanyaan tidak tersedia'
-        
-        # Cek atau buat jawaban
-        existing_answer = UserAnswer.objects.filter(
-            session=session,
-            question_id=question_id
-        ).first()
-        
-        if existing_answer:
-            existing_answer.answer_text = answer_text
-            existing_answer.answer_type = answer_type
-            existing_answer.question_text = question_text
-            existing_answer.step_id = activity_id
-            existing_answer.activity_id = activity_id
-            existing_answer.is_submitted = True
-            existing_answer.submitted_at = timezone.now()
-            existing_answer.save()
-            answer = existing_answer
-            action = 'updated'
-        else:
-            answer = UserAnswer.objects.create(
-                session=session,
-                question_id=question_id,
-                storage_key=storage_key,
-                answer_text=answer_text,
-                answer_type=answer_type,
-                question_text=question_text,
-                step_id=activity_id,
-                activity_id=activity_id,
-                is_submitted=True,
-                submitted_at=timezone.now()
-            )
-            action = 'created'
-        
-        # Update progress
-        user_progress, created = UserProgress.objects.get_or_create(
-            user=request.user,
-            session=session,
-            defaults={
-                'current_kegiatan': activity_id,
-                'total_answers': 1,
-            }
-        )
-        
-        if not created:
-            total_submitted = UserAnswer.objects.filter(
-                session=session, 
-                is_submitted=True
-            ).count()
-            user_progress.total_answers = total_submitted
-            user_progress.current_kegiatan = activity_id
-            user_progress.save()
-        
-        # Update activity progress
-        activity_progress, created = ActivityProgress.objects.get_or_create(
+        now = timezone.now()
+        answer = UserAnswer(
             session=session,
+            question_id=question_id,
+            storage_key=question['storage_key'],
+            answer_text=answer_text,
+            answer_type=question['type'],
+            question_text=question['text'],
+            step_id=activity_id,
             activity_id=activity_id,
-            defaults={
-                'status': 'completed',
-                'completed_at': timezone.now()
-            }
+            is_submitted=True,
+            submitted_at=now
         )
-        
-        if not created:
-            activity_progress.status = 'completed'
-            activity_progress.completed_at = timezone.now()
-            activity_progress.save()
+        actions, progress = save_submitted_answers(request.user, session, activity_id, [answer], now)
+        action = actions[question_id]
         
         # Response data
         answer_data = {
@@ -1322,21 +1910,12 @@ def submit_activity_answer(request):
             'submitted_at': answer.submitted_at.isoformat() if answer.submitted_at else None,
         }
         
-        completed_activities_count = ActivityProgress.objects.filter(
-            session=session,
-            status='completed'
-        ).count()
-        
         return Response({
             'status': 'success',
             'message': 'Jawaban berhasil disimpan',
             'action': action,
             'answer': answer_data,
-            'progress': {
-                'total_answers': user_progress.total_answers,
-                'current_activity': user_progress.current_kegiatan,
-                'completed_activities_count': completed_activities_count
-            }
+            'progress': progress
         })
         
     except Exception as e:
@@ -1346,6 +1925,321 @@ def submit_activity_answer(request):
             'message': f'Gagal menyimpan jawaban: {str(e)}'
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def submit_activity_answers_batch(request):
+    """
+    Menyimpan semua jawaban satu activity sekaligus (misal kegiatan_4 dan kegiatan_7).
+    
+    Body: {"session_id", "activity_id", "answers": [{"question_id", "answer_text"}, ...]}
+    Jawaban divalidasi terhadap question_registry (dikompilasi dari CHATBOT_FLOW).
+    """
+    try:
+        session_id = request.data.get('session_id')
+        activity_id = request.data.get('activity_id')
+        submitted = request.data.get('answers')
+        
+        if not session_id or not activity_id or not isinstance(submitted, list) or not submitted:
+            return Response({
+                'status': 'error',
+                'message': 'Session ID, Activity ID dan daftar answers diperlukan'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        questions = question_registry.for_activity(activity_id)
+        if not questions:
+            return Response({
+                'status': 'error',
+                'message': f'Activity {activity_id} tidak memiliki pertanyaan'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Validasi terhadap definisi flow
+        errors = []
+        texts = {}
+        for item in submitted:
+            question_id = item.get('question_id') if isinstance(item, dict) else None
+            question = questions.get(question_id)
+            if question is None:
+                errors.append(f'Pertanyaan {question_id} bukan bagian dari {activity_id}')
+                continue
+            if question_id in texts:
+                errors.append(f'Jawaban untuk {question_id} dikirim lebih dari sekali')
+                continue
+            answer_text, answer_error = question_registry.clean_answer(question, item.get('answer_text'))
+            if answer_error:
+                errors.append(answer_error)
+            texts[question_id] = answer_text
+        
+        missing = [qid for qid, question in questions.items() if question['required'] and qid not in texts]
+        errors += [f'Jawaban untuk {qid} belum dikirim' for qid in missing]
+        if errors:
+            return Response({
+                'status': 'error',
+                'message': 'Jawaban tidak valid',
+                'errors': errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            session = ChatSession.objects.get(session_id=session_id, user=request.user)
+        except ChatSession.DoesNotExist:
+            return Response({
+                'status': 'error',
+                'message': 'Sesi tidak ditemukan'
+            }, status=status.HTTP_404_NOT_FOUND)
+        
+        now = timezone.now()
+        answers = [
+            UserAnswer(
+                session=session,
+                question_id=question_id,
+                storage_key=questions[question_id]['storage_key'],
+                answer_text=answer_text,
+                answer_type=questions[question_id]['type'],
+                question_text=questions[question_id]['text'],
+                step_id=activity_id,
+                activity_id=activity_id,
+                is_submitted=True,
+                submitted_at=now
+            )
+            for question_id, answer_text in texts.items()
+        ]
+        actions, progress = save_submitted_answers(request.user, session, activity_id, answers, now)
+        
+        return Response({
+            'status': 'success',
+            'message': f'{len(answers)} jawaban berhasil disimpan',
+            'answers': [{
+                'id': answer.id,
+                'question_id': answer.question_id,
+                'answer_type': answer.answer_type,
+                'action': actions[answer.question_id],
+                'submitted_at': answer.submitted_at.isoformat(),
+            } for answer in answers],
+            'progress': progress
+        })
+        
+    except Exception as e:
+        logger.error(f"Error submitting activity answers batch: {e}")
+        return Response({
+            'status': 'error',
+            'message': 'Gagal menyimpan jawaban'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['GET', 'POST'])
+@permission_classes([IsAuthenticated])
+def answer_draft(request):
+    """
+    Autosave draft jawaban.
+    
+    POST {"session_id", "activity_id", "question_id", "draft_text"} boleh dikirim
+    sesering apa pun; hanya versi terakhir yang ditulis ke database secara berkala.
+    GET ?session_id=&activity_id= mengembalikan draft yang tersimpan (termasuk
+    yang belum di-flush) untuk dipulihkan setelah koneksi terputus.
+    """
+    params = request.data if request.method == 'POST' else request.GET
+    session_id = params.get('session_id')
+    activity_id = params.get('activity_id')
+    if not session_id or (request.method == 'POST' and not activity_id):
+        return Response({
+            'status': 'error',
+            'message': 'Session ID dan Activity ID diperlukan'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        session = ChatSession.objects.get(session_id=session_id, user=request.user)
+    except ChatSession.DoesNotExist:
+        return Response({
+            'status': 'error',
+            'message': 'Sesi tidak ditemukan'
+        }, status=status.HTTP_404_NOT_FOUND)
+    
+    try:
+        if request.method == 'GET':
+            rows = UserAnswer.objects.filter(session=session)
+            if activity_id:
+                rows = rows.filter(activity_id=activity_id)
+            drafts, submitted = {}, {}
+            for question_id, text, updated_at, submitted_at in rows.values_list(
+                'question_id', 'draft_text', 'draft_updated_at', 'submitted_at'
+            ):
+                submitted[question_id] = submitted_at
+                if text:
+                    drafts[question_id] = {'question_id': question_id, 'draft_text': text, 'draft_updated_at': updated_at}
+            # Draft antre yang diketik sebelum submit (di worker ini belum sempat dibuang) tidak ditampilkan
+            for question_id, draft in draft_buffer.pending(session.pk).items():
+                if is_stale(draft['draft_updated_at'], submitted.get(question_id)):
+                    continue
+                if not activity_id or draft.get('activity_id') == activity_id:
+                    drafts[question_id] = {
+                        'question_id': question_id,
+                        'draft_text': draft['draft_text'],
+                        'draft_updated_at': draft['draft_updated_at']
+                    }
+            return Response({
+                'status': 'success',
+                'session_id': session_id,
+                'drafts': list(drafts.values())
+            })
+        
+        question_id = params.get('question_id')
+        draft_text = params.get('draft_text') or ''
+        question = question_registry.get(question_id, activity_id)
+        if question is None:
+            return Response({
+                'status': 'error',
+                'message': f'Pertanyaan {question_id} bukan bagian dari {activity_id}'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if question_registry.validate_length(question, draft_text):
+            return Response({
+                'status': 'error',
+                'message': f"Draft melebihi {question['max_length']} karakter"
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        draft = draft_buffer.put(
+            session.pk,
+            question_id,
+            draft_text,
+            activity_id=activity_id,
+            question_text=question['text'],
+            answer_type=question['type'],
+            storage_key=question['storage_key']
+        )
+        return Response({
+            'status': 'success',
+            'question_id': question_id,
+            'saved_at': draft['draft_updated_at']
+        })
+        
+    except Exception as e:
+        logger.error(f"Error handling answer draft: {e}")
+        return Response({
+            'status': 'error',
+            'message': 'Gagal memproses draft jawaban'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+def image_upload_data(upload):
+    return {
+        'upload_id': upload.id,
+        'question_id': upload.question_id,
+        'processing_status': upload.status,
+        'url': upload.url or None,
+        'thumbnail_url': upload.thumbnail_url or None,
+        'width': upload.width,
+        'height': upload.height,
+        'error': upload.error or None,
+    }
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def upload_answer_image(request):
+    """
+    Upload gambar jawaban (multipart: session_id, activity_id, question_id, image).
+    
+    File di-spool ke disk (bukan memori), lalu divalidasi dan di-resize oleh
+    pool Pillow di background. Respons 202 berisi upload_id; status bisa dicek
+    lewat GET /api/chat/answer/image/<upload_id>/ atau event "image" di WebSocket.
+    """
+    max_bytes = settings.IMAGE_UPLOAD['max_bytes']
+    # Tolak sebelum body dibaca jika Content-Length sudah jelas terlalu besar
+    if int(request.META.get('CONTENT_LENGTH') or 0) > max_bytes + 64 * 1024:
+        return Response({
+            'status': 'error',
+            'message': f'Ukuran gambar maksimal {max_bytes // (1024 * 1024)} MB'
+        }, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+    
+    # Harus dipasang sebelum request.data diakses
+    request.upload_handlers = [TemporaryFileUploadHandler(request._request)]
+    
+    try:
+        session_id = request.data.get('session_id')
+        activity_id = request.data.get('activity_id')
+        question_id = request.data.get('question_id')
+        image = request.FILES.get('image')
+        
+        if not all([session_id, activity_id, question_id, image]):
+            return Response({
+                'status': 'error',
+                'message': 'session_id, activity_id, question_id dan file image diperlukan'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        question = question_registry.get(question_id, activity_id)
+        if not question or not question['allow_image_upload']:
+            return Response({
+                'status': 'error',
+                'message': f'Pertanyaan {question_id} tidak menerima upload gambar'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        if image.size > max_bytes:
+            return Response({
+                'status': 'error',
+                'message': f'Ukuran gambar maksimal {max_bytes // (1024 * 1024)} MB'
+            }, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        
+        try:
+            session = ChatSession.objects.get(session_id=session_id, user=request.user)
+        except ChatSession.DoesNotExist:
+            return Response({
+                'status': 'error',
+                'message': 'Sesi tidak ditemukan'
+            }, status=status.HTTP_404_NOT_FOUND)
+        
+        content_hash = hash_upload(image)
+        
+        # Gambar yang sama untuk pertanyaan yang sama tidak diproses ulang
+        existing = ImageUpload.objects.filter(
+            session=session, question_id=question_id, content_hash=content_hash, status='ready'
+        ).first()
+        if existing:
+            UserAnswer.objects.filter(session=session, question_id=question_id).update(
+                image_url=existing.url,
+                image_hash=content_hash,
+                ocr_text=cached_ocr_text(content_hash),
+                updated_at=timezone.now()
+            )
+            return Response({'status': 'success', **image_upload_data(existing)})
+        
+        upload = ImageUpload.objects.create(
+            session=session,
+            question_id=question_id,
+            activity_id=activity_id,
+            content_hash=content_hash,
+            original_name=(image.name or '')[:255],
+            size_bytes=image.size
+        )
+        upload.staged_path = stage_upload(image, upload.id)
+        upload.save(update_fields=['staged_path'])
+        
+        if not image_pipeline.try_submit(upload.id):
+            os.remove(upload.staged_path)
+            upload.delete()
+            response = Response({
+                'status': 'error',
+                'message': 'Server sedang memproses banyak gambar, coba lagi sebentar lagi'
+            }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+            response['Retry-After'] = '5'
+            return response
+        
+        return Response({'status': 'success', **image_upload_data(upload)}, status=status.HTTP_202_ACCEPTED)
+        
+    except Exception as e:
+        logger.error(f"Error uploading answer image: {e}")
+        return Response({
+            'status': 'error',
+            'message': 'Gagal mengupload gambar'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_answer_image(request, upload_id):
+    """Status pemrosesan gambar jawaban"""
+    try:
+        upload = ImageUpload.objects.get(pk=upload_id, session__user=request.user)
+    except ImageUpload.DoesNotExist:
+        return Response({
+            'status': 'error',
+            'message': 'Upload tidak ditemukan'
+        }, status=status.HTTP_404_NOT_FOUND)
+    return Response({'status': 'success', **image_upload_data(upload)})
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def complete_activity(request):
@@ -1370,19 +2264,18 @@ def complete_activity(request):
             }, status=status.HTTP_404_NOT_FOUND)
         
         # Tandai activity sebagai selesai
-        activity_progress, created = ActivityProgress.objects.get_or_create(
-            session=session,
-            activity_id=activity_id,
-            defaults={
-                'status': 'completed',
-                'completed_at': timezone.now()
-            }
-        )
-        
-        if not created:
-            activity_progress.status = 'completed'
-            activity_progress.completed_at = timezone.now()
-            activity_progress.save()
+        with transaction.atomic():
+            user_progress = lock_user_progress(request.user, session, activity_id)
+            previous_status = ActivityProgress.objects.filter(
+                session=session,
+                activity_id=activity_id
+            ).values_list('status', flat=True).first()
+            if previous_status != 'completed':
+                mark_activity_completed(session, activity_id, timezone.now())
+                UserProgress.objects.filter(pk=user_progress.pk).update(
+                    completed_activities=F('completed_activities') + 1
+                )
+        invalidate_session_overview(session.pk)
         
         return Response({
             'status': 'success',
@@ -1453,9 +2346,11 @@ from django.db.models import Q, Count
 def teacher_answers(request):
     """GET /api/teacher/answers/"""
     try:
-        # Query dengan filter untuk memastikan data valid
+        # Query dengan filter untuk memastikan data valid (draft yang belum di-submit tidak ditampilkan)
         qs = UserAnswer.objects.select_related(
             "session__user"
+        ).filter(
+            is_submitted=True
         ).exclude(
             session__isnull=True
         ).exclude(
@@ -1475,7 +2370,8 @@ def teacher_answers(request):
             qs = qs.filter(
                 Q(session__user__username__icontains=q) |
                 Q(answer_text__icontains=q) |
-                Q(question_text__icontains=q)
+                Q(question_text__icontains=q) |
+                Q(ocr_text__icontains=q)
             )
         
         # Activity filter
@@ -1548,6 +2444,7 @@ def teacher_answers(request):
                 "pertanyaan": answer.question_text or "-",
                 "jawaban_siswa": answer.answer_text or "-",
                 "image_url": answer.image_url or None,
+                "teks_gambar": answer.ocr_text or None,
                 "tipe_jawaban": answer.answer_type or "essay",
                 "status": "Submitted" if answer.is_submitted else "Draft",
                 "tanggal_dikirim": tanggal,
@@ -1835,32 +2732,12 @@ def teacher_student_detail(request, username):
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def health_check(request):
-    """Health check endpoint dengan debugging detail"""
+    """Health check dari cache status; probe sebenarnya dijalankan prober di background"""
     try:
-        # Test each system
-        gemini_test = False
-        if gemini_model:
-            try:
-                test_response = gemini_model.invoke("Test")
-                gemini_test = bool(test_response and hasattr(test_response, 'content'))
-            except:
-                gemini_test = False
+        start_background_initialization()
         
-        rag_test = False
-        if retriever:
-            try:
-                test_docs = retriever.get_relevant_documents("test")
-                rag_test = len(test_docs) > 0
-            except:
-                rag_test = False
-        
-        langgraph_test = bool(chatbot_app)
-        
-        systems_status = {
-            "rag_system": "✅ Ready" if rag_test else "❌ Failed",
-            "langgraph_chatbot": "✅ Ready" if langgraph_test else "❌ Failed",
-            "gemini_model": "✅ Ready" if gemini_test else "❌ Failed"
-        }
+        with system_state_lock:
+            state = dict(system_state)
         
         api_key_info = {
             "available": bool(API_KEY),
@@ -1872,9 +2749,22 @@ def health_check(request):
         csv_exists = os.path.exists(CSV_PATH)
         persist_exists = os.path.exists(PERSIST_DIR) and os.listdir(PERSIST_DIR)
         
+        if not systems_ready.is_set():
+            overall = "starting"
+        else:
+            overall = "healthy" if state["healthy"] else "degraded"
+        
         health_data = {
-            "status": "healthy" if all([gemini_test, rag_test, langgraph_test]) else "degraded",
-            "systems": systems_status,
+            "status": overall,
+            "live": True,
+            "ready": systems_ready.is_set(),
+            "systems": state["systems"],
+            "last_probe": state["last_probe"],
+            "probe_interval_seconds": HEALTH_PROBE_INTERVAL,
+            "started_at": state["started_at"],
+            "ready_at": state["ready_at"],
+            "llm_backend": LLM_BACKEND,
+            "llm_quota": quota_stats,
             "api_key": api_key_info,
             "model": MODEL_NAME,
             "files": {
@@ -1895,6 +2785,32 @@ def health_check(request):
             "message": f"Health check failed: {str(e)}"
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def health_live(request):
+    """Liveness: proses worker hidup dan bisa melayani request"""
+    return Response({"status": "alive", "pid": os.getpid()})
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def health_ready(request):
+    """Readiness: Gemini, RAG dan LangGraph sudah selesai diinisialisasi"""
+    start_background_initialization()
+    if systems_ready.is_set():
+        return Response({"status": "ready", "ready_at": system_state["ready_at"]})
+    return Response(
+        {"status": "starting", "started_at": system_state["started_at"]},
+        status=status.HTTP_503_SERVICE_UNAVAILABLE
+    )
+
+def metrics(request):
+    """Metric format teks Prometheus, diagregasi dari semua worker gunicorn"""
+    token = getattr(settings, "METRICS_TOKEN", "")
+    if token and request.headers.get("Authorization") != f"Bearer {token}":
+        return HttpResponse("Unauthorized", status=401)
+    body, content_type = render_metrics()
+    return HttpResponse(body, content_type=content_type)
+
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def debug_rag_status(request):
@@ -1938,6 +2854,7 @@ def reload_rag_system(request):
         retriever = initialize_rag_system()
         
         if retriever:
+            retriever = InstrumentedRetriever(retriever)
             return Response({
                 "status": "success", 
                 "message": "RAG system reloaded successfully"
@@ -1986,33 +2903,66 @@ def reload_all_systems(request):
 
 # ===== ACTIVITY HISTORY ENDPOINTS =====
 
+# Ukuran halaman histori chat (default dan batas atas ?page_size=)
+HISTORY_PAGE_SIZE = int(os.getenv("CHAT_HISTORY_PAGE_SIZE", "30"))
+HISTORY_MAX_PAGE_SIZE = int(os.getenv("CHAT_HISTORY_MAX_PAGE_SIZE", "100"))
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_activity_history(request, session_id, activity_id):
-    """Mendapatkan histori percakapan untuk activity tertentu"""
+    """
+    Mendapatkan histori percakapan untuk activity tertentu, per halaman.
+    
+    Halaman pertama berisi pesan terbaru; `pagination.next_cursor` dikirim
+    kembali sebagai ?cursor= untuk memuat pesan yang lebih lama. Jawaban
+    siswa hanya disertakan di halaman pertama.
+    """
     try:
         session = ChatSession.objects.get(session_id=session_id, user=request.user)
         
-        messages = ChatMessage.objects.filter(
-            session=session,
-            step_id=activity_id
-        ).order_by('timestamp')
+        cursor = request.GET.get('cursor') or None
+        try:
+            page_size = int(request.GET.get('page_size', HISTORY_PAGE_SIZE))
+        except ValueError:
+            page_size = HISTORY_PAGE_SIZE
+        page_size = max(1, min(page_size, HISTORY_MAX_PAGE_SIZE))
         
-        answers = UserAnswer.objects.filter(
-            session=session,
-            step_id=activity_id
-        ).order_by('created_at')
+        reopen_archived_session(session)
+        # Read-your-writes: pastikan pesan yang masih antre ikut terbaca
+        chat_write_queue.flush_session(session.pk)
+        
+        try:
+            messages, next_cursor = page_backward(
+                ChatMessage.objects.filter(session=session, activity_id=activity_id),
+                cursor=cursor,
+                page_size=page_size
+            )
+        except InvalidCursor:
+            return Response({
+                'status': 'error',
+                'message': 'Cursor tidak valid'
+            }, status=status.HTTP_400_BAD_REQUEST)
         
         history = {
             'messages': ChatMessageSerializer(messages, many=True).data,
-            'answers': UserAnswerSerializer(answers, many=True).data
         }
+        if cursor is None:
+            answers = UserAnswer.objects.filter(
+                session=session,
+                activity_id=activity_id
+            ).order_by('created_at')
+            history['answers'] = UserAnswerSerializer(answers, many=True).data
         
         return Response({
             'status': 'success',
             'session_id': session_id,
             'activity_id': activity_id,
-            'history': history
+            'history': history,
+            'pagination': {
+                'page_size': page_size,
+                'has_more': next_cursor is not None,
+                'next_cursor': next_cursor
+            }
         })
         
     except ChatSession.DoesNotExist:
@@ -2030,39 +2980,15 @@ def get_activity_history(request, session_id, activity_id):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_session_overview(request, session_id):
-    """Mendapatkan overview seluruh sesi"""
+    """Mendapatkan overview seluruh sesi (urutan activity mengikuti CHATBOT_FLOW)"""
     try:
         session = ChatSession.objects.get(session_id=session_id, user=request.user)
         
-        activities = [
-            'intro', 'kimia_hijau', 'pre_kegiatan', 
-            'kegiatan_1', 'kegiatan_2', 'kegiatan_3', 'kegiatan_4',
-            'kegiatan_5', 'kegiatan_6', 'kegiatan_7', 'completion'
-        ]
+        reopen_archived_session(session)
+        # Flush pesan yang masih antre (sekaligus meng-invalidate cache overview)
+        chat_write_queue.flush_session(session.pk)
         
-        overview = {}
-        for activity in activities:
-            messages_count = ChatMessage.objects.filter(
-                session=session, step_id=activity
-            ).count()
-            
-            answers_count = UserAnswer.objects.filter(
-                session=session, step_id=activity
-            ).count()
-            
-            try:
-                activity_progress = ActivityProgress.objects.get(
-                    session=session, activity_id=activity
-                )
-                status = activity_progress.status
-            except ActivityProgress.DoesNotExist:
-                status = 'not_started'
-            
-            overview[activity] = {
-                'messages_count': messages_count,
-                'answers_count': answers_count,
-                'status': status
-            }
+        overview = build_session_overview(session, list(CHATBOT_FLOW))
         
         return Response({
             'status': 'success',
@@ -2073,4 +2999,87 @@ def get_session_overview(request, session_id):
         return Response({
             'status': 'error',
             'message': 'Sesi tidak ditemukan'
-        }, status=status.HTTP_404_NOT_FOUND)
\ No newline at end of file
+        }, status=status.HTTP_404_NOT_FOUND)
+
+
+# Jendela tumpang-tindih cursor delta-sync: baris yang commit terlambat dengan
+# updated_at sedikit di belakang tetap terkirim (client men-dedup per id)
+SYNC_OVERLAP_SECONDS = float(os.getenv("CHAT_SYNC_OVERLAP_SECONDS", "5"))
+SYNC_MAX_MESSAGES = int(os.getenv("CHAT_SYNC_MAX_MESSAGES", "200"))
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_session_changes(request, session_id):
+    """
+    Delta-sync: pesan, jawaban dan progress yang berubah sejak ?since=<cursor>.
+    
+    Tanpa `since` seluruh state dikirim. Cursor berikutnya selalu ada di
+    respons; jika `has_more` true, panggil lagi segera dengan cursor tersebut.
+    """
+    try:
+        session = ChatSession.objects.get(session_id=session_id, user=request.user)
+    except ChatSession.DoesNotExist:
+        return Response({
+            'status': 'error',
+            'message': 'Sesi tidak ditemukan'
+        }, status=status.HTTP_404_NOT_FOUND)
+    
+    since = request.GET.get('since')
+    try:
+        last_seq, since_ts = decode_sync_cursor(since) if since else (0, None)
+    except InvalidCursor:
+        return Response({
+            'status': 'error',
+            'message': 'Cursor tidak valid'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        # Batas waktu cursor berikutnya diambil sebelum query supaya tulisan di
+        # tengah request tidak terlewat
+        now = time.time()
+        reopen_archived_session(session)
+        chat_write_queue.flush_session(session.pk)
+        
+        # ChatMessage append-only: cukup sequence_order di atas cursor
+        messages = list(
+            ChatMessage.objects.filter(session=session, sequence_order__gt=last_seq)
+            .order_by('sequence_order', 'id')[:SYNC_MAX_MESSAGES + 1]
+        )
+        has_more = len(messages) > SYNC_MAX_MESSAGES
+        messages = messages[:SYNC_MAX_MESSAGES]
+        
+        answers = UserAnswer.objects.filter(session=session)
+        progress = ActivityProgress.objects.filter(session=session)
+        if since_ts is not None:
+            changed_since = datetime.fromtimestamp(since_ts, tz=dt_timezone.utc)
+            answers = answers.filter(updated_at__gte=changed_since)
+            progress = progress.filter(last_accessed__gte=changed_since)
+        
+        next_seq = messages[-1].sequence_order if messages else last_seq
+        # Selama pesan belum habis, batas waktu tidak dimajukan
+        next_ts = since_ts if has_more and since_ts is not None else now - SYNC_OVERLAP_SECONDS
+        
+        return Response({
+            'status': 'success',
+            'session_id': session_id,
+            'messages': ChatMessageSerializer(messages, many=True).data,
+            'answers': UserAnswerSerializer(answers.order_by('updated_at'), many=True).data,
+            'progress': [
+                {
+                    'activity_id': item.activity_id,
+                    'status': item.status,
+                    'completed_at': item.completed_at,
+                    'last_accessed': item.last_accessed,
+                }
+                for item in progress.order_by('last_accessed')
+            ],
+            'cursor': encode_sync_cursor(next_seq, next_ts),
+            'has_more': has_more
+        })
+        
+    except Exception as e:
+        logger.error(f"Error getting session changes: {e}")
+        return Response({
+            'status': 'error',
+            'message': 'Gagal mengambil perubahan sesi'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
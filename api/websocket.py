@@ -0,0 +1,89 @@
+import asyncio
+import json
+import logging
+import re
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+
+from .utils.realtime import get_broker, session_channel
+
+logger = logging.getLogger(__name__)
+
+CHAT_SOCKET_PATH = re.compile(r"^/ws/chat/(?P<session_id>[^/]+)/?$")
+
+
+def _authorize(token, session_id):
+    """Validasi JWT (query ?token=) dan kepemilikan sesi; mengembalikan pk sesi atau None"""
+    from rest_framework_simplejwt.exceptions import TokenError
+    from rest_framework_simplejwt.tokens import AccessToken
+
+    from .models import ChatSession
+
+    close_old_connections()
+    try:
+        user_id = AccessToken(token)["user_id"]
+    except (TokenError, KeyError):
+        return None
+    try:
+        return ChatSession.objects.values_list("pk", flat=True).get(session_id=session_id, user_id=user_id)
+    except ChatSession.DoesNotExist:
+        return None
+    finally:
+        close_old_connections()
+
+
+async def chat_socket(scope, receive, send):
+    """
+    WebSocket /ws/chat/<session_id>/?token=<access token>
+
+    Server mengirim event JSON {"type": ..., "data": ...}:
+    - "token": potongan balasan bot selama LLM masih menjawab
+    - "message": ChatMessage yang sudah tersimpan
+    - "progress": perubahan ActivityProgress
+    - "image": hasil pemrosesan gambar jawaban (ready/failed)
+    Client boleh mengirim "ping" dan akan dibalas "pong".
+    """
+    match = CHAT_SOCKET_PATH.match(scope["path"])
+    event = await receive()
+    if event["type"] != "websocket.connect":
+        return
+    if not match:
+        await send({"type": "websocket.close", "code": 4404})
+        return
+
+    token = parse_qs(scope.get("query_string", b"").decode()).get("token", [""])[0]
+    session_pk = await sync_to_async(_authorize)(token, match["session_id"])
+    if session_pk is None:
+        await send({"type": "websocket.close", "code": 4401})
+        return
+
+    await send({"type": "websocket.accept"})
+    subscription = get_broker().subscribe(session_channel(session_pk))
+
+    async def pump():
+        while True:
+            event = await subscription.get()
+            await send({"type": "websocket.send", "text": json.dumps(event)})
+
+    pump_task = asyncio.create_task(pump())
+    try:
+        while True:
+            event = await receive()
+            if event["type"] == "websocket.disconnect":
+                break
+            if event["type"] == "websocket.receive" and event.get("text") == "ping":
+                await send({"type": "websocket.send", "text": "pong"})
+    finally:
+        subscription.close()
+        pump_task.cancel()
+        if subscription.dropped:
+            logger.warning(f"⚠️ Slow websocket client on {match['session_id']}: dropped {subscription.dropped} events")
+
+
+async def websocket_application(scope, receive, send):
+    try:
+        await chat_socket(scope, receive, send)
+    except Exception as e:
+        logger.error(f"❌ WebSocket error on {scope.get('path')}: {e}")
@@ -13,4 +13,20 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Koneksi WebSocket (push balasan bot & progress) ditangani di luar Django view
+from api.websocket import websocket_application
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "websocket":
+        await websocket_application(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
+
+# Inisialisasi chatbot (Gemini, RAG, LangGraph) berjalan di background
+# supaya worker langsung bisa melayani request
+from api.views import start_background_initialization
+
+start_background_initialization()
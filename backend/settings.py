@@ -58,6 +58,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.middleware.PrometheusMetricsMiddleware',
 ]
 
 ROOT_URLCONF = 'backend.urls'
@@ -99,7 +100,10 @@ DATABASES = {
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
-    )
+    ),
+    # Jumlah reverse proxy di depan app (Railway = 1); dipakai untuk IP klien
+    # dari X-Forwarded-For sehingga header palsu dari klien diabaikan
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES', '1')),
 }
 
 SIMPLE_JWT = {
@@ -131,6 +135,12 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 STATICFILES_DIRS = []  # kosong karena file statis dikumpulkan di root saat deploy
 STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
 
+# ----------------------------------------------------
+# 🖼️ Media (gambar jawaban jika IMAGE_STORAGE lokal)
+# ----------------------------------------------------
+MEDIA_URL = 'media/'
+MEDIA_ROOT = Path(os.getenv('MEDIA_ROOT', BASE_DIR / 'media'))
+
 # ----------------------------------------------------
 # 🧩 Cloudinary (jika kamu pakai)
 # ----------------------------------------------------
@@ -138,6 +148,145 @@ CLOUD_NAME = os.getenv("CLOUD_NAME")
 CLOUD_API_KEY = os.getenv("CLOUD_API_KEY")
 CLOUD_API_SECRET = os.getenv("CLOUD_API_SECRET")
 
+# ----------------------------------------------------
+# 🤖 LLM backend ("gemini" untuk produksi, "fake" untuk load test offline)
+# ----------------------------------------------------
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")
+
+FAKE_LLM = {
+    "reply_template": os.getenv("FAKE_LLM_REPLY_TEMPLATE", "Aquano (fake) menjawab: {question}"),
+    "latency_distribution": os.getenv("FAKE_LLM_LATENCY_DISTRIBUTION", "constant"),
+    "latency_ms": float(os.getenv("FAKE_LLM_LATENCY_MS", "0")),
+    "latency_jitter_ms": float(os.getenv("FAKE_LLM_LATENCY_JITTER_MS", "0")),
+    "error_rate": float(os.getenv("FAKE_LLM_ERROR_RATE", "0")),
+    "stream_chunk_size": int(os.getenv("FAKE_LLM_CHUNK_SIZE", "16")),
+    "stream_chunk_delay_ms": float(os.getenv("FAKE_LLM_CHUNK_DELAY_MS", "0")),
+    "seed": int(os.getenv("FAKE_LLM_SEED")) if os.getenv("FAKE_LLM_SEED") else None,
+}
+
+# ----------------------------------------------------
+# 💾 Antrean tulis chat (ChatMessage di-batch di background)
+# ----------------------------------------------------
+CHAT_WRITE_QUEUE = {
+    "enabled": os.getenv("CHAT_WRITE_QUEUE_ENABLED", "True").lower() == "true",
+    "batch_size": int(os.getenv("CHAT_WRITE_QUEUE_BATCH_SIZE", "50")),
+    "flush_interval": float(os.getenv("CHAT_WRITE_QUEUE_FLUSH_INTERVAL", "0.5")),
+}
+
+# ----------------------------------------------------
+# 📝 Draft jawaban (autosave di-coalesce per worker, ditulis tiap flush_interval detik)
+# ----------------------------------------------------
+CHAT_DRAFTS = {
+    "enabled": os.getenv("CHAT_DRAFTS_BUFFER_ENABLED", "True").lower() == "true",
+    "flush_interval": float(os.getenv("CHAT_DRAFTS_FLUSH_INTERVAL", "5")),
+}
+
+# ----------------------------------------------------
+# 🚦 Kuota endpoint LLM (token bucket: burst = kapasitas, rate = token/detik)
+# ----------------------------------------------------
+LLM_QUOTA = {
+    "enabled": os.getenv("LLM_QUOTA_ENABLED", "True").lower() == "true",
+    "user": {
+        "burst": int(os.getenv("LLM_QUOTA_USER_BURST", "10")),
+        "rate": float(os.getenv("LLM_QUOTA_USER_RATE", "0.2")),
+    },
+    "ip": {
+        "burst": int(os.getenv("LLM_QUOTA_IP_BURST", "20")),
+        "rate": float(os.getenv("LLM_QUOTA_IP_RATE", "0.5")),
+    },
+    "global": {
+        "burst": int(os.getenv("LLM_QUOTA_GLOBAL_BURST", "300")),
+        "rate": float(os.getenv("LLM_QUOTA_GLOBAL_RATE", "10")),
+    },
+}
+
+# ----------------------------------------------------
+# 🧠 State percakapan LangGraph ("db" dibagi semua worker, "memory" hanya per proses)
+# ----------------------------------------------------
+LANGGRAPH_CHECKPOINTER = {
+    "backend": os.getenv("LANGGRAPH_CHECKPOINTER", "db"),
+    "keep_last": int(os.getenv("LANGGRAPH_CHECKPOINT_KEEP_LAST", "3")),
+    "cache_size": int(os.getenv("LANGGRAPH_CHECKPOINT_CACHE_SIZE", "256")),
+    "cache_ttl": int(os.getenv("LANGGRAPH_CHECKPOINT_CACHE_TTL", "1800")),
+    "idle_ttl": int(os.getenv("LANGGRAPH_CHECKPOINT_IDLE_TTL", str(7 * 24 * 3600))),
+}
+
+# ----------------------------------------------------
+# 📈 Metrics (/api/metrics/; kosongkan token agar bisa di-scrape tanpa auth)
+# ----------------------------------------------------
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+# ----------------------------------------------------
+# 🗃️ Cache (default per proses; set CACHE_BACKEND ke backend bersama untuk multi-worker)
+# ----------------------------------------------------
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.getenv("CACHE_LOCATION", "ecombot"),
+    }
+}
+
+# Overview sesi di-invalidate saat ada tulisan; TTL hanya batas atas basi antar worker
+SESSION_OVERVIEW_CACHE_TTL = int(os.getenv("SESSION_OVERVIEW_CACHE_TTL", "60"))
+
+# ----------------------------------------------------
+# 📡 Realtime push (/ws/chat/<session_id>/; hanya jalan di server ASGI, lihat Procfile)
+# ----------------------------------------------------
+# InProcessBroker hanya menjangkau client di proses yang sama: tanpa REDIS_URL
+# jalankan satu worker (WEB_CONCURRENCY=1). Dengan REDIS_URL event dibagi ke
+# semua worker lewat Redis pub/sub.
+REALTIME = {
+    "broker": os.getenv(
+        "REALTIME_BROKER",
+        "api.utils.realtime.RedisBroker" if os.getenv("REDIS_URL") else "api.utils.realtime.InProcessBroker"
+    ),
+    "redis_url": os.getenv("REDIS_URL", ""),
+    "queue_size": int(os.getenv("REALTIME_QUEUE_SIZE", "256")),
+}
+
+# ----------------------------------------------------
+# 🖼️ Upload gambar jawaban (file di-spool ke disk, diproses pool Pillow di background)
+# ----------------------------------------------------
+# Default Cloudinary jika kredensialnya ada; storage lokal hanya untuk DEBUG
+# (media lokal tidak di-serve di produksi dan filesystem Railway tidak persisten)
+IMAGE_UPLOAD = {
+    "storage": os.getenv(
+        "IMAGE_STORAGE",
+        "api.utils.images.CloudinaryImageStorage"
+        if CLOUD_NAME and CLOUD_API_KEY and CLOUD_API_SECRET
+        else "api.utils.images.LocalImageStorage",
+    ),
+    "staging_dir": os.getenv("IMAGE_STAGING_DIR", str(BASE_DIR / "media" / "staging")),
+    "max_bytes": int(os.getenv("IMAGE_UPLOAD_MAX_BYTES", str(10 * 1024 * 1024))),
+    "max_pixels": int(os.getenv("IMAGE_UPLOAD_MAX_PIXELS", str(40_000_000))),
+    "allowed_formats": ("JPEG", "PNG", "WEBP", "HEIF", "MPO"),
+    "large_size": int(os.getenv("IMAGE_LARGE_SIZE", "1600")),
+    "thumbnail_size": int(os.getenv("IMAGE_THUMBNAIL_SIZE", "400")),
+    "jpeg_quality": int(os.getenv("IMAGE_JPEG_QUALITY", "82")),
+    "workers": int(os.getenv("IMAGE_PIPELINE_WORKERS", "2")),
+    "max_pending": int(os.getenv("IMAGE_PIPELINE_MAX_PENDING", "32")),
+}
+
+# OCR gambar jawaban (tesseract di process pool; nonaktif otomatis jika tesseract tidak ada)
+IMAGE_OCR = {
+    "enabled": os.getenv("IMAGE_OCR_ENABLED", "True").lower() == "true",
+    "lang": os.getenv("IMAGE_OCR_LANG", "ind+eng"),
+    "workers": int(os.getenv("IMAGE_OCR_WORKERS", "1")),
+    "max_pending": int(os.getenv("IMAGE_OCR_MAX_PENDING", "16")),
+    "timeout": int(os.getenv("IMAGE_OCR_TIMEOUT", "30")),
+    # "pending" lebih lama dari ini dianggap ditinggal worker yang mati dan di-OCR ulang
+    "stale_after": int(os.getenv("IMAGE_OCR_STALE_AFTER", "900")),
+}
+
+# ----------------------------------------------------
+# 📦 Arsip sesi idle (python manage.py archive_sessions; codec kosong = zstd jika tersedia)
+# ----------------------------------------------------
+CHAT_ARCHIVE = {
+    "idle_days": float(os.getenv("CHAT_ARCHIVE_IDLE_DAYS", "30")),
+    "codec": os.getenv("CHAT_ARCHIVE_CODEC", ""),
+    "chunk_size": int(os.getenv("CHAT_ARCHIVE_CHUNK_SIZE", "500")),
+}
+
 # ----------------------------------------------------
 # 🪪 Default PK
 # ----------------------------------------------------
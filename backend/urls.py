@@ -1,5 +1,11 @@
+from django.conf import settings
+from django.conf.urls.static import static
 from django.urls import path, include
 
 urlpatterns = [
     path('api/', include('api.urls')),
 ]
+
+# Gambar jawaban di storage lokal (hanya DEBUG; produksi wajib Cloudinary, lihat api/apps.py)
+if settings.DEBUG:
+    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
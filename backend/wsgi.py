@@ -14,3 +14,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
 application = get_wsgi_application()
+
+# Inisialisasi chatbot (Gemini, RAG, LangGraph) berjalan di background
+# supaya worker langsung bisa melayani request
+from api.views import start_background_initialization
+
+start_background_initialization()
@@ -0,0 +1,23 @@
+# Dibaca otomatis oleh `gunicorn backend.asgi:application` (Procfile) dari direktori kerja.
+import os
+import shutil
+import tempfile
+
+# Metric Prometheus dari semua worker ditulis ke direktori bersama lalu
+# digabung saat /api/metrics/ di-scrape. Harus di-set sebelum worker di-fork.
+os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "ecombot_prometheus")
+)
+
+
+def on_starting(server):
+    # Buang file metric dari run sebelumnya agar counter tidak ikut terjumlah
+    metrics_dir = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
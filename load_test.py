@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+End-to-end HTTP load test for the Ecombot chat API.
+
+Seeds users, logs them in through /api/login/ and drives a weighted mix of
+chat, ask, comic-progress and answer-submit traffic at a fixed target rate
+(open loop). Latency is measured from the *scheduled* start of each request,
+so a saturated server shows up as growing latency instead of a silently
+lower request rate.
+
+Run against a local server with the fake LLM backend:
+
+    LLM_BACKEND=fake LLM_QUOTA_ENABLED=false FAKE_LLM_LATENCY_MS=300 python manage.py runserver --noreload
+    python load_test.py --rate 20 --duration 60 --users 50
+
+or let the script start `runserver` itself:
+
+    python load_test.py --spawn-server --rate 20 --duration 60
+"""
+
+import argparse
+import csv
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+
+class Colors:
+    GREEN = '\033[92m'
+    RED = '\033[91m'
+    YELLOW = '\033[93m'
+    BLUE = '\033[94m'
+    END = '\033[0m'
+    BOLD = '\033[1m'
+
+DEFAULT_MIX = "send=50,ask=25,comic=15,submit=10"
+
+CHAT_MESSAGES = [
+    "siap",
+    "sudah",
+    "mulai kegiatan 2",
+    "kembali ke kegiatan 1",
+    "Apa itu kimia hijau?",
+    "Kenapa sampah bisa menyebabkan banjir?",
+    "Bagaimana cara membuat lubang biopori?",
+    "Apa hubungan Mapag Hujan dengan lingkungan?",
+    "terima kasih",
+    "halo aquano",
+]
+
+ACTIVITIES = ["intro", "kimia_hijau", "kegiatan_1", "kegiatan_2", "kegiatan_3", "kegiatan_4"]
+
+QUESTIONS = [
+    ("kegiatan_1", "q_kegiatan_1", "answer:kegiatan_1", "essay"),
+    ("kegiatan_2", "q_kegiatan_2", "answer:kegiatan_2", "essay"),
+    ("kegiatan_3", "q_kegiatan_3", "answer:kegiatan_3", "essay"),
+    ("kegiatan_4", "q_kegiatan_4_1", "answer:kegiatan_4_1", "discussion"),
+    ("kegiatan_4", "q_kegiatan_4_2", "answer:kegiatan_4_2", "discussion"),
+    ("kegiatan_7", "q_kegiatan_7_1", "answer:kegiatan_7_1", "reflective"),
+]
+
+FALLBACK_ASK_QUESTIONS = [
+    "Siapa yang membuat ECOMBOT?",
+    "Apa itu tradisi Mapag Hujan?",
+    "Apa saja prinsip-prinsip kimia hijau?",
+]
+
+def load_ask_questions(csv_path):
+    """Use the knowledge-base questions so /ask/ traffic looks like real usage"""
+    try:
+        with open(csv_path, newline='', encoding='utf-8') as f:
+            questions = [row['question'] for row in csv.DictReader(f) if row.get('question')]
+        return questions or FALLBACK_ASK_QUESTIONS
+    except (OSError, KeyError):
+        return FALLBACK_ASK_QUESTIONS
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint in mix: {name} (choose from {', '.join(ENDPOINTS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100.0 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+class VirtualStudent:
+    """One seeded user with its own JWT and chat session"""
+
+    def __init__(self, base_url, username, password, timeout):
+        self.base_url = base_url
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+        self.http = requests.Session()
+        self.access = None
+        self.session_id = f"loadtest_{username}"
+        self.lock = threading.Lock()
+
+    def url(self, path):
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def seed(self):
+        self.http.post(self.url('register/'), json={'username': self.username, 'password': self.password},
+                       timeout=self.timeout)
+        self.login()
+        response = self.request('POST', 'chat/session/start/',
+                                json={'session_id': self.session_id, 'activity_id': 'intro'})
+        response.raise_for_status()
+
+    def login(self):
+        response = self.http.post(self.url('login/'), json={'username': self.username, 'password': self.password},
+                                  timeout=self.timeout)
+        response.raise_for_status()
+        self.access = response.json()['access']
+
+    def request(self, method, path, **kwargs):
+        headers = {'Authorization': f"Bearer {self.access}"}
+        response = self.http.request(method, self.url(path), headers=headers, timeout=self.timeout, **kwargs)
+        if response.status_code == 401:
+            # Access tokens live 15 minutes; log in again once and retry
+            with self.lock:
+                self.login()
+            headers = {'Authorization': f"Bearer {self.access}"}
+            response = self.http.request(method, self.url(path), headers=headers, timeout=self.timeout, **kwargs)
+        return response
+
+def do_send(student, rng, ctx):
+    return student.request('POST', 'chat/session/send/', json={
+        'session_id': student.session_id,
+        'message_text': rng.choice(CHAT_MESSAGES),
+        'activity_id': rng.choice(ACTIVITIES),
+    })
+
+def do_ask(student, rng, ctx):
+    return student.request('POST', 'ask/', json={'question': rng.choice(ctx['ask_questions'])})
+
+def do_comic(student, rng, ctx):
+    if rng.random() < 0.5:
+        return student.request('GET', 'comic-progress/', params={'comic': 'greenverse', 'episode': 'episode-1'})
+    return student.request('POST', 'comic-progress/', json={
+        'comic': 'greenverse', 'episode': 'episode-1', 'last_page': rng.randint(0, 10)
+    })
+
+def do_submit(student, rng, ctx):
+    activity_id, question_id, storage_key, answer_type = rng.choice(QUESTIONS)
+    return student.request('POST', 'chat/answer/submit/', json={
+        'session_id': student.session_id,
+        'activity_id': activity_id,
+        'question_data': {'id': question_id, 'storage_key': storage_key, 'text': question_id},
+        'answer_text': "Jawaban load test " + "lorem ipsum " * rng.randint(1, 30),
+        'answer_type': answer_type,
+    })
+
+ENDPOINTS = {
+    'send': do_send,
+    'ask': do_ask,
+    'comic': do_comic,
+    'submit': do_submit,
+}
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.status_codes = defaultdict(lambda: defaultdict(int))
+
+    def record(self, endpoint, latency, status_code, ok):
+        with self.lock:
+            self.latencies[endpoint].append(latency)
+            self.status_codes[endpoint][status_code] += 1
+            if not ok:
+                self.errors[endpoint] += 1
+
+    def report(self, elapsed):
+        rows = {}
+        all_latencies = []
+        for endpoint in sorted(self.latencies):
+            values = sorted(self.latencies[endpoint])
+            all_latencies.extend(values)
+            rows[endpoint] = self._row(values, self.errors[endpoint], elapsed)
+            rows[endpoint]['status_codes'] = dict(self.status_codes[endpoint])
+        rows['TOTAL'] = self._row(sorted(all_latencies), sum(self.errors.values()), elapsed)
+        return rows
+
+    @staticmethod
+    def _row(values, errors, elapsed):
+        count = len(values)
+        return {
+            'requests': count,
+            'throughput_rps': round(count / elapsed, 2) if elapsed else 0.0,
+            'p50_ms': round(percentile(values, 50) * 1000, 1),
+            'p95_ms': round(percentile(values, 95) * 1000, 1),
+            'p99_ms': round(percentile(values, 99) * 1000, 1),
+            'error_rate': round(errors / count, 4) if count else 0.0,
+        }
+
+def run_load(students, mix, rate, duration, workers, seed, ctx):
+    stats = Stats()
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    rng = random.Random(seed)
+    interval = 1.0 / rate
+
+    def fire(endpoint, student, scheduled_at, call_seed):
+        call_rng = random.Random(call_seed)
+        try:
+            response = ENDPOINTS[endpoint](student, call_rng, ctx)
+            status_code, ok = response.status_code, response.status_code < 400
+        except requests.RequestException as e:
+            status_code, ok = type(e).__name__, False
+        stats.record(endpoint, time.perf_counter() - scheduled_at, status_code, ok)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        n = 0
+        while True:
+            scheduled_at = started + n * interval
+            if scheduled_at - started >= duration:
+                break
+            delay = scheduled_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            endpoint = rng.choices(names, weights)[0]
+            pool.submit(fire, endpoint, rng.choice(students), scheduled_at, rng.random())
+            n += 1
+    elapsed = time.perf_counter() - started
+    return stats.report(elapsed), elapsed
+
+def print_report(rows, elapsed, rate):
+    print(f"\n{Colors.BOLD}{Colors.BLUE}{'='*86}{Colors.END}")
+    print(f"{Colors.BOLD}📊 Load test result ({elapsed:.1f}s, target {rate} req/s){Colors.END}")
+    print(f"{Colors.BOLD}{Colors.BLUE}{'='*86}{Colors.END}")
+    print(f"{'endpoint':<10}{'requests':>10}{'rps':>10}{'p50 ms':>11}{'p95 ms':>11}{'p99 ms':>11}{'errors':>10}  status")
+    for endpoint, row in rows.items():
+        color = Colors.RED if row['error_rate'] > 0.01 else Colors.GREEN
+        codes = ' '.join(f"{code}:{count}" for code, count in sorted(row.get('status_codes', {}).items(), key=str))
+        print(f"{endpoint:<10}{row['requests']:>10}{row['throughput_rps']:>10}{row['p50_ms']:>11}"
+              f"{row['p95_ms']:>11}{row['p99_ms']:>11}{color}{row['error_rate']:>10.2%}{Colors.END}  {codes}")
+
+def spawn_server(host, port):
+    """Start `manage.py runserver` with the fake LLM backend and wait until it answers"""
+    env = dict(os.environ)
+    env.setdefault('LLM_BACKEND', 'fake')
+    # Every virtual student comes from 127.0.0.1, so the per-IP LLM quota would reject most traffic
+    env.setdefault('LLM_QUOTA_ENABLED', 'false')
+    process = subprocess.Popen(
+        [sys.executable, 'manage.py', 'runserver', '--noreload', f"{host}:{port}"],
+        cwd=Path(__file__).resolve().parent, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("runserver exited during startup")
+        try:
+            requests.get(f"http://{host}:{port}/api/health/", timeout=2)
+            return process
+        except requests.RequestException:
+            time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError("runserver did not become reachable within 60s")
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP load test for the Ecombot chat API")
+    parser.add_argument('--base-url', default='http://127.0.0.1:8000/api')
+    parser.add_argument('--users', type=int, default=20, help="number of seeded students")
+    parser.add_argument('--user-prefix', default='loadtest_user')
+    parser.add_argument('--password', default='loadtest-pass-123')
+    parser.add_argument('--rate', type=float, default=10.0, help="target requests per second (all endpoints)")
+    parser.add_argument('--duration', type=float, default=30.0, help="seconds of traffic")
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f"endpoint weights, default '{DEFAULT_MIX}'")
+    parser.add_argument('--workers', type=int, default=64, help="max concurrent in-flight requests")
+    parser.add_argument('--timeout', type=float, default=30.0)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--spawn-server', action='store_true',
+                        help="start runserver with LLM_BACKEND=fake on --base-url's host/port")
+    parser.add_argument('--json', dest='json_path', help="also write the report as JSON to this path")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    base_url = args.base_url.rstrip('/')
+    server = None
+    if args.spawn_server:
+        hostport = base_url.split('://', 1)[-1].split('/', 1)[0]
+        host, _, port = hostport.partition(':')
+        server = spawn_server(host, port or '8000')
+        print(f"{Colors.GREEN}✅ runserver started (LLM_BACKEND={os.environ.get('LLM_BACKEND', 'fake')}){Colors.END}")
+
+    try:
+        print(f"🌱 Seeding {args.users} users...")
+        students = [VirtualStudent(base_url, f"{args.user_prefix}_{i}", args.password, args.timeout)
+                    for i in range(args.users)]
+        with ThreadPoolExecutor(max_workers=min(16, args.users)) as pool:
+            list(pool.map(lambda s: s.seed(), students))
+
+        ctx = {'ask_questions': load_ask_questions(Path(__file__).resolve().parent / 'data' / 'data.csv')}
+        print(f"🚀 Driving {args.rate} req/s for {args.duration}s (mix: {mix})...")
+        rows, elapsed = run_load(students, mix, args.rate, args.duration, args.workers, args.seed, ctx)
+        print_report(rows, elapsed, args.rate)
+
+        if args.json_path:
+            with open(args.json_path, 'w') as f:
+                json.dump({'target_rps': args.rate, 'elapsed_s': elapsed, 'endpoints': rows}, f, indent=2, default=str)
+    finally:
+        if server:
+            server.terminate()
+            server.wait(timeout=10)
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print(f"\n\n{Colors.YELLOW}Load test interrupted by user{Colors.END}")
+        sys.exit(0)
+    except Exception as e:
+        print(f"\n{Colors.RED}Error: {e}{Colors.END}")
+        sys.exit(1)